@@ -0,0 +1,339 @@
+"""
+END-TO-END PIPELINE BENCHMARK
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Measures every stage of the local pipeline and reports events/sec plus
+p50 / p99 latency per operation as JSON, so revisions can be compared:
+
+- generator_single      generate_realistic_traffic_data(), one event per op
+- generator_batch       generate_traffic_batch(), one batch per op
+- json_serialize        json.dumps per event (the Event Hub payload)
+- wire_encode           compact CTW1 micro-batch encoding, one batch per op
+- sender                BatchingEventSender -> FakeProducer, send() per op
+- dashboard_ingest_<n>  IngestWorker.ingest() of one batch with n events buffered
+- dashboard_render_<n>  Analytics / Map / Alerts render prep with n events buffered
+- tumbling_engine       TumblingAnomalyEngine (Stream Analytics replica), per event
+- sliding_engine        SlidingAnomalyEngine, per event
+- startup_<target>      Fresh-interpreter import of the simulator / replay
+                        modules and the dashboard's first run; also lists
+                        heavy modules that were loaded but should be lazy
+
+Stages without an event rate (render prep, startup) are compared on p50.
+
+Usage:
+    python pipeline_benchmark.py --out results.json
+    python pipeline_benchmark.py --quick --stages generator_batch,sender
+    python pipeline_benchmark.py --compare baseline.json --tolerance 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent
+for folder in (SOURCE_DIR / "Milestone 1",
+               SOURCE_DIR / "Milestone 2" / "Stream Analytics",
+               SOURCE_DIR / "Milestone 3" / "Stramlit"):
+    if str(folder) not in sys.path:
+        sys.path.insert(0, str(folder))
+
+BUFFER_SIZES = (10_000, 100_000, 1_000_000)
+QUICK_BUFFER_SIZES = (10_000, 100_000)
+
+# Startup targets: (PYTHONPATH folder, untimed setup, code timed in a fresh
+# interpreter). The dashboard folder is not put on the path up front: its
+# streamlit.py would shadow the streamlit package
+DASHBOARD_SCRIPT = SOURCE_DIR / "Milestone 3" / "Stramlit" / "streamlit.py"
+STARTUP_TARGETS = {
+    "simulator": (SOURCE_DIR / "Milestone 1", "", "import python_traffic_simulator"),
+    "replay": (SOURCE_DIR / "Milestone 1", "", "import replay"),
+    "dashboard": (None,
+                  "from streamlit.testing.v1 import AppTest\n"
+                  f"sys.path.insert(0, {str(DASHBOARD_SCRIPT.parent)!r})\n"
+                  f"app = AppTest.from_file({str(DASHBOARD_SCRIPT)!r}, default_timeout=120)",
+                  "app.run()"),
+}
+# Dependencies no entry point should load before the mode / tab needing them runs
+LAZY_MODULES = ("azure.eventhub", "pydeck", "plotly", "streamlit_autorefresh")
+STARTUP_PROBE = """
+import json, sys, time
+{setup}
+preloaded = set(sys.modules)   # the test harness itself may pull some in
+started = time.perf_counter()
+{code}
+print(json.dumps({{"seconds": time.perf_counter() - started,
+                  "loaded": [m for m in {lazy!r} if m in sys.modules and m not in preloaded]}}))
+"""
+
+# Measurement Helpers
+# ===================
+
+def summarize(latencies_ns, events, wall_seconds, unit):
+    """Stage result: throughput over the wall time, latency percentiles per op"""
+    latencies_us = np.asarray(latencies_ns, dtype=np.float64) / 1000.0
+    return {
+        "unit": unit,
+        "ops": int(len(latencies_us)),
+        "events": int(events),
+        "seconds": round(wall_seconds, 4),
+        "events_per_sec": round(events / wall_seconds, 1) if events and wall_seconds > 0 else None,
+        "ops_per_sec": round(len(latencies_us) / wall_seconds, 1) if wall_seconds > 0 else None,
+        "p50_us": round(float(np.percentile(latencies_us, 50)), 2) if len(latencies_us) else None,
+        "p99_us": round(float(np.percentile(latencies_us, 99)), 2) if len(latencies_us) else None,
+        "max_us": round(float(latencies_us.max()), 2) if len(latencies_us) else None,
+    }
+
+def timed_ops(op, count, events_per_op=1, unit="event"):
+    """Call op() count times, timing each call"""
+    latencies = np.empty(count, dtype=np.int64)
+    clock = time.perf_counter_ns
+    started = clock()
+    for i in range(count):
+        t0 = clock()
+        op()
+        latencies[i] = clock() - t0
+    return summarize(latencies, count * events_per_op, (clock() - started) / 1e9, unit)
+
+def quietly_import(name):
+    """Import a module whose import prints a banner (the simulator)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return __import__(name)
+
+def sample_events(n, seed=7):
+    sim = quietly_import("python_traffic_simulator")
+    return sim.batch_to_events(sim.generate_traffic_batch(n, rng=seed, interval_seconds=0.05))
+
+# Stages
+# ======
+
+def bench_generator_single(scale):
+    sim = quietly_import("python_traffic_simulator")
+    return timed_ops(sim.generate_realistic_traffic_data, 20_000 * scale)
+
+def bench_generator_batch(scale):
+    sim = quietly_import("python_traffic_simulator")
+    rng = np.random.default_rng(1)
+    batch_size = 10_000
+    return timed_ops(lambda: sim.generate_traffic_batch(batch_size, rng=rng),
+                     20 * scale, batch_size, unit=f"batch of {batch_size}")
+
+def bench_json_serialize(scale):
+    events = sample_events(50_000 * scale)
+    it = iter(events)
+    return timed_ops(lambda: json.dumps(next(it)), len(events))
+
+def bench_wire_encode(scale):
+    sim = quietly_import("python_traffic_simulator")
+    import wire_format
+    batch_size = 10_000
+    batch = sim.generate_traffic_batch(batch_size, rng=3)
+    return timed_ops(lambda: wire_format.encode_batch(batch, sim.LOCATIONS),
+                     50 * scale, batch_size, unit=f"batch of {batch_size}")
+
+def bench_sender(scale):
+    from eventhub_sender import BatchingEventSender, FakeProducer
+
+    payloads = [json.dumps(event) for event in sample_events(50_000 * scale)]
+    producer = FakeProducer(keep_events=False)
+    sender = BatchingEventSender(producer).start()
+    latencies = np.empty(len(payloads), dtype=np.int64)
+    clock = time.perf_counter_ns
+    started = clock()
+    for i, payload in enumerate(payloads):
+        t0 = clock()
+        sender.send(payload)
+        latencies[i] = clock() - t0
+    sender.close()   # throughput includes draining every queued event to the producer
+    result = summarize(latencies, len(payloads), (clock() - started) / 1e9, "send() call")
+    result["events_sent"] = sender.stats()["events_sent"]
+    return result
+
+def _dashboard_worker(capacity):
+    from event_buffer import EventBuffer
+    from ingest import IngestWorker
+    from rollups import Rollups
+    sim = quietly_import("python_traffic_simulator")
+    buffer = EventBuffer(capacity, sim.LOCATIONS, sim.VEHICLE_TYPES,
+                         sim.WEATHER_CONDITIONS, sim.TRAFFIC_INCIDENTS)
+    return IngestWorker(buffer, Rollups(len(sim.LOCATIONS), len(sim.VEHICLE_TYPES)))
+
+def bench_dashboard(scale, sizes):
+    """Ingest and render-prep cost as the buffer fills up to each size"""
+    batch_size = 1000
+    events = sample_events(batch_size * 20)
+    batches = [events[i:i + batch_size] for i in range(0, len(events), batch_size)]
+    worker = _dashboard_worker(max(sizes))
+    results = {}
+    filled = 0
+    for size in sizes:
+        # Fill (untimed) up to the target size, then time a round of ingests
+        while filled < size - batch_size * 10 * scale:
+            worker.ingest(batches[filled // batch_size % len(batches)])
+            filled += batch_size
+        results[f"dashboard_ingest_{size}"] = timed_ops(
+            lambda: worker.ingest(batches[0]), 10 * scale, batch_size,
+            unit=f"ingest of {batch_size}")
+        filled += batch_size * 10 * scale
+
+        # Windows end at the newest buffered event so render-prep aggregates real data
+        now_epoch = worker.buffer.ts()[-1].astype("datetime64[s]").astype(np.int64) + 1
+        assert len(worker.rollups.timeseries(24 * 3600, now_epoch)), "render window is empty"
+        assert worker.rollups.vehicle_mix(24 * 3600, now_epoch).sum() > 0, "render window is empty"
+
+        def render_prep():
+            with worker.lock:
+                worker.rollups.timeseries(24 * 3600, now_epoch)
+                worker.rollups.vehicle_mix(24 * 3600, now_epoch)
+                worker.rollups.location_congestion(24 * 3600, now_epoch)
+                worker.latest.map_frame(worker.buffer.locations)
+                worker.alerts.frame(worker.buffer, last=1000)
+                worker.alerts.type_counts()
+
+        results[f"dashboard_render_{size}"] = timed_ops(render_prep, 20 * scale, 0, unit="rerun")
+        results[f"dashboard_render_{size}"]["buffered_events"] = len(worker.buffer)
+    return results
+
+def bench_tumbling_engine(scale):
+    from anomaly_engine import TumblingAnomalyEngine
+    events = sample_events(100_000 * scale)
+    engine = TumblingAnomalyEngine()
+    it = iter(events)
+    result = timed_ops(lambda: engine.process(next(it)), len(events))
+    result["rows"] = len(engine.flush())
+    return result
+
+def bench_sliding_engine(scale):
+    from sliding_engine import SlidingAnomalyEngine
+    events = sample_events(100_000 * scale)
+    engine = SlidingAnomalyEngine()
+    it = iter(events)
+    return timed_ops(lambda: engine.process(next(it)), len(events))
+
+def bench_startup(scale, repeats=5):
+    """Cold start of each entry point, one fresh interpreter per op"""
+    results = {}
+    for name, (folder, setup, code) in STARTUP_TARGETS.items():
+        env = dict(os.environ, PYTHONPATH=str(folder) if folder else "")
+        probe = STARTUP_PROBE.format(setup=setup, code=code, lazy=LAZY_MODULES)
+        latencies, process_ns, loaded = [], [], set()
+        for _ in range(repeats * scale):
+            t0 = time.perf_counter_ns()
+            out = subprocess.run([sys.executable, "-c", probe], cwd=Path(__file__).parent, env=env,
+                                 capture_output=True, text=True, timeout=300)
+            process_ns.append(time.perf_counter_ns() - t0)
+            if out.returncode != 0:
+                raise RuntimeError(f"startup_{name} failed:\n{out.stderr[-2000:]}")
+            report = json.loads(out.stdout.strip().splitlines()[-1])
+            latencies.append(report["seconds"] * 1e9)
+            loaded.update(report["loaded"])
+        result = summarize(latencies, 0, sum(process_ns) / 1e9, "cold start")
+        result["process_p50_us"] = round(float(np.percentile(process_ns, 50)) / 1000.0, 2)
+        result["lazy_modules_loaded"] = sorted(loaded)
+        results[f"startup_{name}"] = result
+    return results
+
+STAGES = {
+    "generator_single": bench_generator_single,
+    "generator_batch": bench_generator_batch,
+    "json_serialize": bench_json_serialize,
+    "wire_encode": bench_wire_encode,
+    "sender": bench_sender,
+    "dashboard": None,   # expands into dashboard_ingest_<n> / dashboard_render_<n>
+    "tumbling_engine": bench_tumbling_engine,
+    "sliding_engine": bench_sliding_engine,
+    "startup": None,     # expands into startup_<target>
+}
+
+# Reporting
+# =========
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SOURCE_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmarks(stages=None, quick=False):
+    scale = 1
+    sizes = QUICK_BUFFER_SIZES if quick else BUFFER_SIZES
+    results = {}
+    for name in stages or STAGES:
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage {name!r} (choose from {', '.join(STAGES)})")
+        print(f"Running {name}...", file=sys.stderr)
+        if name == "dashboard":
+            results.update(bench_dashboard(scale, sizes))
+        elif name == "startup":
+            results.update(bench_startup(scale))
+        else:
+            results[name] = STAGES[name](scale)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "quick": quick,
+        },
+        "stages": results,
+    }
+
+def compare(current, baseline, tolerance):
+    """
+    Stages whose events/sec fell more than tolerance below the baseline,
+    or (stages without an event rate) whose p50 rose more than tolerance
+    """
+    regressions = []
+    for name, result in current["stages"].items():
+        base = baseline.get("stages", {}).get(name, {})
+        before, after = base.get("events_per_sec"), result.get("events_per_sec")
+        if before and after:
+            if after < before * (1 - tolerance):
+                regressions.append({"stage": name, "metric": "events_per_sec", "baseline": before,
+                                    "current": after, "change": round(after / before - 1, 3)})
+            continue
+        before, after = base.get("p50_us"), result.get("p50_us")
+        if before and after and after > before * (1 + tolerance):
+            regressions.append({"stage": name, "metric": "p50_us", "baseline": before,
+                                "current": after, "change": round(after / before - 1, 3)})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the traffic pipeline stages")
+    parser.add_argument("--stages", help="Comma separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--quick", action="store_true", help="Skip the 1M-event buffer size")
+    parser.add_argument("--out", help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed events/sec drop versus the baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.stages.split(",") if args.stages else None, quick=args.quick)
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            report["regressions"] = compare(report, json.load(handle), args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+        print(f"Report written to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+ASYNC MULTI-PRODUCER SENDER
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Drives the asyncio Event Hub client (azure.eventhub.aio) with several
+concurrent generator and sender tasks. Events are routed to sender tasks
+by LocationID so each location's observations stay in order:
+
+- keyed mode: every batch carries partition_key=LocationID and the hub
+  hashes the key to a partition
+- per-partition mode: one sender task per hub partition, locations are
+  mapped to partitions with a stable hash and sent by partition_id
+
+run_async_producers() returns a throughput report when it finishes.
+"""
+
+import asyncio
+import json
+import time
+import zlib
+
+from eventhub_sender import FakeEventDataBatch, FAKE_MAX_BATCH_BYTES, event_data_class
+
+# Async Defaults
+# ==============
+
+DEFAULT_GENERATOR_TASKS = 4
+DEFAULT_SENDER_TASKS = 4
+DEFAULT_CHUNK_SIZE = 500         # Events produced per generator step
+DEFAULT_QUEUE_SIZE = 20_000      # Per-sender queue bound (backpressure)
+DEFAULT_LINGER_SECONDS = 0.05
+
+# Queue marker that tells a sender task to flush and exit
+_STOP = None
+
+def stable_slot(location_id, slots):
+    """Map a LocationID to a task/partition slot, stable across runs"""
+    return zlib.crc32(location_id.encode("utf-8")) % slots
+
+def _make_event(payload):
+    EventData = event_data_class()
+    if EventData is None:
+        return payload
+    return EventData(payload)
+
+class _SenderTask:
+    """One asyncio sender draining its own queue into per-key batches"""
+
+    def __init__(self, producer, queue_size, linger_seconds, partition_id=None):
+        self.producer = producer
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.linger_seconds = linger_seconds
+        self.partition_id = partition_id
+        self.events_sent = 0
+        self.events_failed = 0
+        self.batches_sent = 0
+
+    async def _new_batch(self, key):
+        if self.partition_id is not None:
+            return await self.producer.create_batch(partition_id=self.partition_id)
+        return await self.producer.create_batch(partition_key=key)
+
+    async def _send(self, batch, count):
+        try:
+            await self.producer.send_batch(batch)
+        except Exception as transmission_error:
+            self.events_failed += count
+            print(f"TRANSMISSION ERROR: {transmission_error}")
+        else:
+            self.events_sent += count
+            self.batches_sent += 1
+
+    async def _add(self, batches, counts, item):
+        location_id, payload = item
+        key = self.partition_id if self.partition_id is not None else location_id
+        if key not in batches:
+            batches[key] = await self._new_batch(key)
+            counts[key] = 0
+        event = _make_event(payload)
+        try:
+            batches[key].add(event)
+        except ValueError:
+            if counts[key] == 0:
+                # A single event larger than the batch limit can never be sent
+                del batches[key], counts[key]
+                self.events_failed += 1
+                print(f"TRANSMISSION ERROR: event of {len(payload)} bytes exceeds the batch size limit")
+                return
+            # Batch is full - ship it and start a fresh one for this key
+            await self._send(batches[key], counts[key])
+            del batches[key], counts[key]
+            return await self._add(batches, counts, item)
+        counts[key] += 1
+
+    async def run(self):
+        # Open batches keyed by LocationID (a single key in per-partition mode)
+        batches = {}
+        counts = {}
+        deadline = None
+        stopping = False
+
+        while not stopping or batches:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = False
+
+            if item is _STOP:
+                stopping = True
+            elif item is not False:
+                await self._add(batches, counts, item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.linger_seconds
+                # Drain whatever is already queued without waiting
+                while not self.queue.empty():
+                    item = self.queue.get_nowait()
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    await self._add(batches, counts, item)
+                if not batches:
+                    deadline = None   # only oversized events: nothing to linger for
+
+            if batches and (stopping or time.monotonic() >= deadline):
+                for key, batch in batches.items():
+                    await self._send(batch, counts[key])
+                batches, counts, deadline = {}, {}, None
+
+async def run_async_producers(producer, make_events, duration=None, max_events=None,
+                              generator_tasks=DEFAULT_GENERATOR_TASKS,
+                              sender_tasks=DEFAULT_SENDER_TASKS,
+                              per_partition=False,
+                              chunk_size=DEFAULT_CHUNK_SIZE,
+                              queue_size=DEFAULT_QUEUE_SIZE,
+                              linger_seconds=DEFAULT_LINGER_SECONDS):
+    """
+    Run concurrent generator and sender tasks against an async producer
+    make_events(n) must return a list of traffic event dicts
+    Stops after duration seconds or max_events events (whichever first)
+    Returns a throughput report dict
+    """
+    if duration is None and max_events is None:
+        raise ValueError("Specify duration and/or max_events")
+
+    if per_partition:
+        partition_ids = await producer.get_partition_ids()
+        senders = [
+            _SenderTask(producer, queue_size, linger_seconds, partition_id=pid)
+            for pid in partition_ids
+        ]
+    else:
+        senders = [
+            _SenderTask(producer, queue_size, linger_seconds)
+            for _ in range(sender_tasks)
+        ]
+
+    started = time.perf_counter()
+    stop_at = None if duration is None else started + duration
+    generated = 0
+
+    def budget_left():
+        if max_events is not None and generated >= max_events:
+            return 0
+        if stop_at is not None and time.perf_counter() >= stop_at:
+            return 0
+        if max_events is None:
+            return chunk_size
+        return min(chunk_size, max_events - generated)
+
+    async def generator():
+        nonlocal generated
+        while True:
+            n = budget_left()
+            if n <= 0:
+                return
+            generated += n
+            for event in make_events(n):
+                location_id = event["LocationID"]
+                sender = senders[stable_slot(location_id, len(senders))]
+                await sender.queue.put((location_id, json.dumps(event)))
+            # Let sender tasks run between chunks
+            await asyncio.sleep(0)
+
+    sender_runs = [asyncio.create_task(sender.run()) for sender in senders]
+    await asyncio.gather(*(generator() for _ in range(generator_tasks)))
+    for sender in senders:
+        await sender.queue.put(_STOP)
+    await asyncio.gather(*sender_runs)
+    elapsed = time.perf_counter() - started
+
+    sent = sum(sender.events_sent for sender in senders)
+    return {
+        "events_generated": generated,
+        "events_sent": sent,
+        "events_failed": sum(sender.events_failed for sender in senders),
+        "batches_sent": sum(sender.batches_sent for sender in senders),
+        "sender_tasks": len(senders),
+        "generator_tasks": generator_tasks,
+        "per_partition": per_partition,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+        "events_per_sender": [sender.events_sent for sender in senders],
+    }
+
+def print_throughput_report(report):
+    """Console summary in the simulator's report style"""
+    print("\n" + "=" * 70)
+    print("ASYNC THROUGHPUT REPORT")
+    print("=" * 70)
+    print(f"Generator tasks: {report['generator_tasks']}, "
+          f"sender tasks: {report['sender_tasks']} "
+          f"({'one per partition' if report['per_partition'] else 'keyed by LocationID'})")
+    print(f"Events generated: {report['events_generated']}")
+    print(f"Events sent: {report['events_sent']} in {report['batches_sent']} batches")
+    print(f"Events failed: {report['events_failed']}")
+    print(f"Elapsed: {report['elapsed_seconds']} s")
+    print(f"Throughput: {report['events_per_second']} events/sec")
+    print("=" * 70)
+
+# Local Fake Async Producer
+# =========================
+
+class FakeAsyncProducer:
+    """In-process stand-in for azure.eventhub.aio.EventHubProducerClient"""
+
+    def __init__(self, partition_ids=("0", "1", "2", "3"),
+                 max_batch_bytes=FAKE_MAX_BATCH_BYTES, send_latency=0.0):
+        self.partition_ids = list(partition_ids)
+        self.max_batch_bytes = max_batch_bytes
+        self.send_latency = send_latency
+        self.sent_batches = 0
+        self.sent_events = 0
+        # Payloads received per partition key / id, in arrival order
+        self.received = {}
+
+    async def get_partition_ids(self):
+        return list(self.partition_ids)
+
+    async def create_batch(self, max_size_in_bytes=None, partition_id=None, partition_key=None):
+        return FakeEventDataBatch(
+            max_size_in_bytes or self.max_batch_bytes, partition_id, partition_key
+        )
+
+    async def send_batch(self, batch, **kwargs):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        key = batch.partition_id if batch.partition_id is not None else batch.partition_key
+        self.received.setdefault(key, []).extend(batch.events)
+        self.sent_batches += 1
+        self.sent_events += len(batch)
+
+    async def close(self):
+        pass
@@ -0,0 +1,228 @@
+"""
+CITY-SCALE SHARDED SIMULATION
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Scales the simulator beyond the 7 seed locations and beyond one CPU core:
+
+- synthesize_locations() scatters thousands of virtual sensors around the
+  seed coordinates, load_locations_sql() reads the dbo.Locations seed file
+- shard_locations() splits the sensor list across worker processes
+- run_sharded_simulation() starts one process per shard, each with its own
+  generator and batched sender, and aggregates per-worker event rates
+"""
+
+import json
+import math
+import multiprocessing
+import queue
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from eventhub_sender import BatchingEventSender
+
+# Location Sources
+# ================
+
+# dbo.Locations seed data shipped with the Milestone 2 schema
+LOCATIONS_SQL_PATH = (
+    Path(__file__).resolve().parent.parent / "Milestone 2" / "Schema" / "Locations.sql"
+)
+
+# ('LOC001', 'Tahrir Square', 30.0444, 31.2357, 120)
+_LOCATION_ROW = re.compile(
+    r"\(\s*'([^']+)'\s*,\s*'([^']+)'\s*,\s*([-\d.]+)\s*,\s*([-\d.]+)\s*,\s*(\d+)\s*\)"
+)
+
+KM_PER_DEGREE_LAT = 111.32
+
+def load_locations_sql(path=LOCATIONS_SQL_PATH):
+    """Parse the INSERT rows of a dbo.Locations seed file into location dicts"""
+    text = Path(path).read_text(encoding="utf-8")
+    return [
+        {"id": loc_id, "name": name, "lat": float(lat), "lon": float(lon), "cap": int(cap)}
+        for loc_id, name, lat, lon, cap in _LOCATION_ROW.findall(text)
+    ]
+
+def synthesize_locations(count, seed_locations, radius_km=3.0, rng=None):
+    """
+    Build `count` sensor locations scattered around the seed locations
+    The seeds themselves come first with their original IDs; synthetic
+    sensors continue the numbering (LOC008, LOC009, ...) and inherit the
+    nearest seed's capacity with +/-30% variation
+    IDs stay within the NVARCHAR(10) LocationID column
+    """
+    rng = np.random.default_rng(rng)
+    locations = [dict(loc) for loc in seed_locations[:count]]
+    extra = count - len(locations)
+    if extra <= 0:
+        return locations
+
+    seed_index = rng.integers(0, len(seed_locations), size=extra)
+    # Uniform scatter inside a disc of radius_km around each seed
+    distance = radius_km * np.sqrt(rng.random(extra))
+    bearing = rng.uniform(0, 2 * math.pi, size=extra)
+    capacity_scale = rng.uniform(0.7, 1.3, size=extra)
+
+    for i in range(extra):
+        seed = seed_locations[seed_index[i]]
+        d_lat = distance[i] * math.cos(bearing[i]) / KM_PER_DEGREE_LAT
+        d_lon = distance[i] * math.sin(bearing[i]) / (
+            KM_PER_DEGREE_LAT * math.cos(math.radians(seed["lat"]))
+        )
+        number = len(seed_locations) + i + 1
+        locations.append({
+            "id": f"LOC{number:03d}",
+            "name": f"{seed['name']} - Sensor {number}",
+            "lat": round(seed["lat"] + d_lat, 6),
+            "lon": round(seed["lon"] + d_lon, 6),
+            "cap": max(10, int(seed["cap"] * capacity_scale[i])),
+        })
+    return locations
+
+def shard_locations(locations, workers):
+    """Split locations into `workers` near-equal round-robin shards"""
+    return [locations[i::workers] for i in range(workers) if locations[i::workers]]
+
+# Worker Process
+# ==============
+
+STATS_INTERVAL_SECONDS = 1.0
+
+def shard_worker(worker_id, shard, generate_batch, to_events, producer_factory,
+                 stats_queue, stop_event, batch_size, seed):
+    """
+    Worker process body: generate events for one shard and send them
+    Posts (worker_id, generated, sent, failed, final) to stats_queue
+    roughly once per second
+    """
+    rng = np.random.default_rng(None if seed is None else seed + worker_id)
+    producer = producer_factory()
+    sender = BatchingEventSender(producer).start()
+    generated = 0
+    last_report = time.monotonic()
+
+    try:
+        while not stop_event.is_set():
+            batch = generate_batch(batch_size, rng=rng, interval_seconds=0.0,
+                                   locations=shard)
+            sender.send_many(json.dumps(event) for event in to_events(batch, shard))
+            generated += batch_size
+
+            now = time.monotonic()
+            if now - last_report >= STATS_INTERVAL_SECONDS:
+                stats = sender.stats()
+                stats_queue.put((worker_id, generated, stats["events_sent"],
+                                 stats["events_failed"], False))
+                last_report = now
+    finally:
+        sender.close()
+        producer.close()
+        stats = sender.stats()
+        stats_queue.put((worker_id, generated, stats["events_sent"],
+                         stats["events_failed"], True))
+
+# Parent Aggregation
+# ==================
+
+def run_sharded_simulation(locations, workers, generate_batch, to_events,
+                           producer_factory, duration=60, batch_size=2000, seed=None):
+    """
+    Run one generator/sender process per location shard for `duration`
+    seconds, printing aggregate rates each second
+    Returns a report with per-worker and total event rates
+    """
+    shards = shard_locations(locations, workers)
+    stats_queue = multiprocessing.Queue()
+    stop_event = multiprocessing.Event()
+
+    processes = [
+        multiprocessing.Process(
+            target=shard_worker, name=f"sim-worker-{worker_id}",
+            args=(worker_id, shard, generate_batch, to_events, producer_factory,
+                  stats_queue, stop_event, batch_size, seed),
+        )
+        for worker_id, shard in enumerate(shards)
+    ]
+
+    print(f"Starting {len(processes)} workers for {len(locations)} locations "
+          f"(~{len(locations) // max(1, len(processes))} per worker)")
+    started = time.monotonic()
+    for process in processes:
+        process.start()
+
+    latest = {worker_id: (0, 0, 0) for worker_id in range(len(processes))}
+    finished = set()
+    last_total = 0
+    last_print = started
+
+    def drain(timeout):
+        try:
+            worker_id, generated, sent, failed, final = stats_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        latest[worker_id] = (generated, sent, failed)
+        if final:
+            finished.add(worker_id)
+
+    try:
+        while time.monotonic() - started < duration:
+            drain(STATS_INTERVAL_SECONDS)
+            now = time.monotonic()
+            if now - last_print >= STATS_INTERVAL_SECONDS:
+                total = sum(generated for generated, _, _ in latest.values())
+                rate = (total - last_total) / (now - last_print)
+                print(f"[{now - started:6.1f}s] {len(processes)} workers | "
+                      f"{rate:,.0f} events/s | {total:,} generated")
+                last_total, last_print = total, now
+    except KeyboardInterrupt:
+        print("\nStopping workers...")
+    finally:
+        stop_event.set()
+        while len(finished) < len(processes):
+            if not any(process.is_alive() for process in processes) and stats_queue.empty():
+                break
+            drain(STATS_INTERVAL_SECONDS)
+        for process in processes:
+            process.join()
+
+    elapsed = time.monotonic() - started
+    per_worker = [
+        {
+            "worker": worker_id,
+            "locations": len(shards[worker_id]),
+            "generated": generated,
+            "sent": sent,
+            "failed": failed,
+            "events_per_second": round(generated / elapsed, 1),
+        }
+        for worker_id, (generated, sent, failed) in sorted(latest.items())
+    ]
+    total_generated = sum(w["generated"] for w in per_worker)
+    return {
+        "workers": per_worker,
+        "locations": len(locations),
+        "elapsed_seconds": round(elapsed, 3),
+        "events_generated": total_generated,
+        "events_sent": sum(w["sent"] for w in per_worker),
+        "events_failed": sum(w["failed"] for w in per_worker),
+        "events_per_second": round(total_generated / elapsed, 1),
+    }
+
+def print_sharded_report(report):
+    """Console summary of a sharded run"""
+    print("\n" + "=" * 70)
+    print("SHARDED SIMULATION REPORT")
+    print("=" * 70)
+    for worker in report["workers"]:
+        print(f"Worker {worker['worker']}: {worker['locations']} locations, "
+              f"{worker['generated']:,} generated, {worker['sent']:,} sent, "
+              f"{worker['events_per_second']:,.0f} events/s")
+    print("-" * 70)
+    print(f"Total: {report['events_generated']:,} generated, "
+          f"{report['events_sent']:,} sent, {report['events_failed']:,} failed "
+          f"in {report['elapsed_seconds']} s")
+    print(f"Aggregate throughput: {report['events_per_second']:,.0f} events/s")
+    print("=" * 70)
@@ -0,0 +1,504 @@
+"""
+BATCHED EVENT HUB SENDER
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Buffers serialized traffic events in a bounded in-memory queue and ships
+them to Azure Event Hub from a dedicated background thread. Events are
+packed into EventDataBatch objects up to the hub's size limit and flushed
+when a batch fills up or when the oldest queued event has waited longer
+than the linger time. Failed sends are retried with exponential backoff.
+
+A FakeProducer is included so the sender can be exercised locally without
+an Event Hub namespace. Pass a metrics.MetricsRegistry to export sent /
+failed / dropped counters, batch size and send latency histograms and the
+queue depth.
+
+Pass a spool.EventSpool to keep batches that exhaust their retries on disk
+instead of dropping them. While the spool holds events, new batches are
+appended behind them so delivery order is preserved, and the flush thread
+drains the spool in producer-sized batches (backing off between failed
+attempts) until it is empty. With a spool the producer may be None: events
+are spooled until a later run with a working connection drains them.
+"""
+
+import queue
+import threading
+import time
+
+# Sender Defaults
+# ===============
+
+DEFAULT_MAX_QUEUE_SIZE = 100_000  # Events held in memory before send() blocks
+DEFAULT_LINGER_SECONDS = 0.05     # Max wait before a partial batch is flushed
+DEFAULT_MAX_RETRIES = 5           # Send attempts after the first failure
+DEFAULT_BACKOFF_SECONDS = 0.1     # First retry delay, doubled on each attempt
+DEFAULT_MAX_BACKOFF_SECONDS = 5.0
+DEFAULT_DRAIN_BATCH_EVENTS = 500  # Spooled events read per drain attempt
+DRAIN_BATCHES_PER_PASS = 20       # Drain batches sent before serving the queue again
+
+# Queue marker that asks the flush thread to drain and exit
+_STOP = object()
+
+_event_data_class = None
+
+def event_data_class():
+    """
+    azure.eventhub.EventData, imported on first use so that modules using
+    the sender start without loading the Azure SDK (None if not installed)
+    """
+    global _event_data_class
+    if _event_data_class is None:
+        try:
+            from azure.eventhub import EventData
+        except ImportError:  # Azure SDK is optional when running against FakeProducer
+            EventData = False
+        _event_data_class = EventData
+    return _event_data_class or None
+
+def _default_event_factory(payload):
+    """Wrap a serialized payload in EventData (raw payload if SDK missing)"""
+    EventData = event_data_class()
+    if EventData is None:
+        return payload
+    return EventData(payload)
+
+class _ListBatch(list):
+    """
+    Unsized batch used when the producer cannot create one (hub unreachable)
+    send_batch() accepts a list of events, so the send is attempted (and
+    retried, spooled or counted as failed) like any other batch
+    """
+
+    def add(self, event):
+        self.append(event)
+
+class BatchingEventSender:
+    """
+    Size-aware batching sender with a background flush thread
+    Call send() from any thread; it blocks when the queue is full so the
+    producer of events slows down instead of exhausting memory
+    """
+
+    def __init__(self, producer, max_queue_size=DEFAULT_MAX_QUEUE_SIZE,
+                 linger_seconds=DEFAULT_LINGER_SECONDS,
+                 max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+                 max_backoff_seconds=DEFAULT_MAX_BACKOFF_SECONDS,
+                 partition_key=None, event_factory=None, on_failure=None,
+                 metrics=None, spool=None,
+                 drain_batch_events=DEFAULT_DRAIN_BATCH_EVENTS):
+        self.producer = producer
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.partition_key = partition_key
+        self.event_factory = event_factory or _default_event_factory
+        # Called with the list of payloads of a batch that exhausted retries
+        self.on_failure = on_failure
+        # Durable overflow for outages; events left from a previous run drain first
+        self.spool = spool
+        self.drain_batch_events = drain_batch_events
+        self._spooling = spool is not None and spool.pending > 0
+        self._next_drain = 0.0
+        self._drain_delay = backoff_seconds
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Running counters (read via stats())
+        self.events_sent = 0
+        self.events_failed = 0
+        self.events_dropped = 0
+        self.batches_sent = 0
+        self.retries = 0
+        self.events_spooled = 0
+        self.error = None   # set if the flush thread died on an unexpected error
+        self._unsent = []   # payloads of the batch being filled (counted as failed if the thread dies)
+
+        self._metrics = _SenderMetrics(metrics, self) if metrics is not None else None
+
+    # Lifecycle
+    # ---------
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="eventhub-sender", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """Flush everything still queued, then stop the flush thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Producer-facing API
+    # -------------------
+
+    def send(self, payload, timeout=None):
+        """
+        Queue one serialized event (str or bytes)
+        Blocks while the queue is full; returns False if timeout expires
+        Raises RuntimeError once the flush thread has died
+        """
+        if self.error is not None:
+            raise RuntimeError(f"Event Hub sender stopped: {self.error}")
+        try:
+            self._queue.put(payload, block=True, timeout=timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.events_dropped += 1
+            if self._metrics is not None:
+                self._metrics.dropped.inc()
+            return False
+
+    def send_many(self, payloads, timeout=None):
+        """Queue several serialized events; returns how many were accepted"""
+        accepted = 0
+        for payload in payloads:
+            if not self.send(payload, timeout):
+                break
+            accepted += 1
+        return accepted
+
+    def queue_depth(self):
+        """Number of events waiting to be batched"""
+        return self._queue.qsize()
+
+    def spool_depth(self):
+        """Number of events waiting in the on-disk spool"""
+        return self.spool.pending if self.spool is not None else 0
+
+    def stats(self):
+        """Snapshot of sender counters"""
+        with self._lock:
+            return {
+                "events_sent": self.events_sent,
+                "events_failed": self.events_failed,
+                "events_dropped": self.events_dropped,
+                "events_spooled": self.events_spooled,
+                "batches_sent": self.batches_sent,
+                "retries": self.retries,
+                "queue_depth": self.queue_depth(),
+                "spool_depth": self.spool_depth(),
+                "error": self.error,
+            }
+
+    # Flush Thread
+    # ------------
+
+    def _new_batch(self):
+        if self.producer is None:
+            return _ListBatch()
+        try:
+            if self.partition_key is not None:
+                return self.producer.create_batch(partition_key=self.partition_key)
+            return self.producer.create_batch()
+        except Exception:
+            # Batch creation needs the hub; the send is retried, then spooled or counted as failed
+            return _ListBatch()
+
+    def _run(self):
+        try:
+            self._flush_loop()
+        except Exception as err:
+            # Never leave a dead thread behind a live queue: record, surface in send()/stats()
+            self.error = f"{type(err).__name__}: {err}"
+            print(f"SENDER ERROR: {self.error}")
+            pending, self._unsent = list(self._unsent), []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    pending.append(item)
+            if pending:
+                self._record_failure(pending, retryable=False)
+
+    def _flush_loop(self):
+        batch = self._new_batch()
+        payloads = []
+        deadline = None
+        stopping = False
+
+        while not stopping:
+            # Wait for the next event, but never past the linger deadline
+            if deadline is None:
+                wait = None
+            else:
+                wait = max(0.0, deadline - time.monotonic())
+            if self._spooling and self.producer is not None:
+                # Wake up for the next drain attempt as well
+                drain_wait = max(0.0, self._next_drain - time.monotonic())
+                wait = drain_wait if wait is None else min(wait, drain_wait)
+            sync_wait = self.spool.sync_wait() if self.spool is not None else None
+            if sync_wait is not None:
+                # ... and to put the last spooled group on disk even if traffic pauses
+                wait = sync_wait if wait is None else min(wait, sync_wait)
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                batch, payloads = self._add(batch, payloads, item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.linger_seconds
+                # Drain whatever is already queued without waiting
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch, payloads = self._add(batch, payloads, item)
+                if not payloads:
+                    # Nothing pending (e.g. only an oversized event): no linger deadline to wait for
+                    deadline = None
+
+            if payloads and (stopping or time.monotonic() >= deadline):
+                self._dispatch(batch, payloads)
+                batch, payloads, deadline = self._new_batch(), [], None
+            if self._spooling:
+                self._drain_spool()
+            if self.spool is not None:
+                self.spool.sync_if_due()
+
+        if self.spool is not None:
+            self.spool.flush()
+
+    def _add(self, batch, payloads, payload):
+        """Add payload to batch, flushing first if the batch is full"""
+        event = self.event_factory(payload)
+        try:
+            batch.add(event)
+        except ValueError:
+            # EventDataBatch raises ValueError once its size limit is reached
+            if not payloads:
+                # A single event larger than the batch limit can never be sent
+                self._record_failure([payload], retryable=False)
+                return batch, payloads
+            self._dispatch(batch, payloads)
+            batch, payloads = self._new_batch(), []
+            return self._add(batch, payloads, payload)
+        payloads.append(payload)
+        self._unsent = payloads
+        return batch, payloads
+
+    def _dispatch(self, batch, payloads):
+        """Send a full or lingering batch, or queue it behind spooled events"""
+        if self.spool is not None and (self._spooling or self.producer is None):
+            self._spool(payloads)
+        else:
+            self._send_with_retry(batch, payloads)
+        self._unsent = []
+
+    def _send_with_retry(self, batch, payloads):
+        delay = self.backoff_seconds
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                self.producer.send_batch(batch)
+            except Exception:
+                if attempt == self.max_retries:
+                    self._record_failure(payloads)
+                    return False
+                with self._lock:
+                    self.retries += 1
+                if self._metrics is not None:
+                    self._metrics.retries.inc()
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff_seconds)
+            else:
+                with self._lock:
+                    self.events_sent += len(payloads)
+                    self.batches_sent += 1
+                self._observe_sent(len(payloads), time.perf_counter() - started)
+                return True
+
+    def _observe_sent(self, count, seconds):
+        if self._metrics is not None:
+            self._metrics.sent.inc(count)
+            self._metrics.batch_size.observe(count)
+            self._metrics.send_latency.observe(seconds)
+
+    def _spool(self, payloads):
+        stored = self.spool.append(payloads)
+        with self._lock:
+            self.events_spooled += stored
+        if self._metrics is not None:
+            self._metrics.spooled.inc(stored)
+        self._spooling = True
+        if stored < len(payloads):
+            # Spool is full and refuses new events ("reject" eviction)
+            self._record_failure(payloads[stored:], retryable=False)
+
+    def _drain_spool(self):
+        """Send the oldest spooled events in order; back off if the hub is still down"""
+        if self.producer is None or time.monotonic() < self._next_drain:
+            return
+        for _ in range(DRAIN_BATCHES_PER_PASS):
+            records = self.spool.read(self.drain_batch_events)
+            if not records:
+                self._spooling = False
+                self._drain_delay = self.backoff_seconds
+                return
+            batch = self._new_batch()
+            positions = []
+            for payload, position in records:
+                try:
+                    batch.add(self.event_factory(payload))
+                except ValueError:
+                    break
+                positions.append(position)
+            if not positions:
+                # Oversized record can never be sent - skip past it
+                self.spool.commit(records[0][1])
+                self._record_failure([records[0][0]], retryable=False)
+                continue
+            started = time.perf_counter()
+            try:
+                self.producer.send_batch(batch)
+            except Exception:
+                with self._lock:
+                    self.retries += 1
+                if self._metrics is not None:
+                    self._metrics.retries.inc()
+                self._next_drain = time.monotonic() + self._drain_delay
+                self._drain_delay = min(self._drain_delay * 2, self.max_backoff_seconds)
+                return
+            self.spool.commit(positions[-1])
+            self._drain_delay = self.backoff_seconds
+            with self._lock:
+                self.events_sent += len(positions)
+                self.batches_sent += 1
+            self._observe_sent(len(positions), time.perf_counter() - started)
+
+    def _record_failure(self, payloads, retryable=True):
+        if retryable and self.spool is not None:
+            self._spool(payloads)
+            return
+        with self._lock:
+            self.events_failed += len(payloads)
+        if self._metrics is not None:
+            self._metrics.failed.inc(len(payloads))
+        if self.on_failure is not None:
+            self.on_failure(payloads)
+
+class _SenderMetrics:
+    """Instruments a BatchingEventSender registers in a MetricsRegistry"""
+
+    def __init__(self, registry, sender):
+        from metrics import BATCH_SIZE_BUCKETS
+        self.sent = registry.counter("traffic_events_sent_total", "Events delivered to Event Hub")
+        self.failed = registry.counter("traffic_events_failed_total",
+                                       "Events given up on after all retries")
+        self.dropped = registry.counter("traffic_events_dropped_total",
+                                        "Events rejected because the send queue stayed full")
+        self.retries = registry.counter("traffic_send_retries_total", "Batch send retries")
+        self.batch_size = registry.histogram("traffic_batch_size_events", "Events per sent batch",
+                                             buckets=BATCH_SIZE_BUCKETS)
+        self.send_latency = registry.histogram("traffic_send_latency_seconds",
+                                               "Duration of successful send_batch calls")
+        registry.gauge("traffic_sender_queue_depth", "Events waiting to be batched",
+                       callback=sender.queue_depth)
+        self.spooled = registry.counter("traffic_events_spooled_total",
+                                        "Events written to the on-disk outage spool")
+        if sender.spool is not None:
+            registry.gauge("traffic_spool_depth", "Events waiting in the on-disk spool",
+                           callback=sender.spool_depth)
+
+# Local Fake Producer
+# ===================
+
+FAKE_MAX_BATCH_BYTES = 1024 * 1024  # Standard tier Event Hub message limit
+FAKE_EVENT_OVERHEAD_BYTES = 24      # Rough per-event AMQP framing cost
+
+class FakeEventDataBatch:
+    """In-memory stand-in for azure.eventhub.EventDataBatch"""
+
+    def __init__(self, max_size_in_bytes=FAKE_MAX_BATCH_BYTES, partition_id=None,
+                 partition_key=None):
+        self.max_size_in_bytes = max_size_in_bytes
+        self.partition_id = partition_id
+        self.partition_key = partition_key
+        self.size_in_bytes = 0
+        self.events = []
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        body = event.body_as_str() if hasattr(event, "body_as_str") else event
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        size = len(body) + FAKE_EVENT_OVERHEAD_BYTES
+        if self.size_in_bytes + size > self.max_size_in_bytes:
+            raise ValueError("EventDataBatch has reached its size limit")
+        self.events.append(body)
+        self.size_in_bytes += size
+
+class FakeProducer:
+    """
+    In-process stand-in for EventHubProducerClient
+    fail_sends makes the next N send_batch calls raise, send_latency adds a
+    fixed delay per call to mimic a network round trip
+    """
+
+    def __init__(self, partition_ids=("0",), max_batch_bytes=FAKE_MAX_BATCH_BYTES,
+                 fail_sends=0, send_latency=0.0, keep_events=True):
+        self.partition_ids = list(partition_ids)
+        self.max_batch_bytes = max_batch_bytes
+        self.fail_sends = fail_sends
+        self.send_latency = send_latency
+        self.keep_events = keep_events
+        self.sent_batches = 0
+        self.sent_events = 0
+        self.events = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def get_partition_ids(self):
+        return list(self.partition_ids)
+
+    def create_batch(self, max_size_in_bytes=None, partition_id=None, partition_key=None):
+        return FakeEventDataBatch(
+            max_size_in_bytes or self.max_batch_bytes, partition_id, partition_key
+        )
+
+    def send_batch(self, batch, **kwargs):
+        if self.send_latency:
+            time.sleep(self.send_latency)
+        with self._lock:
+            if self.fail_sends > 0:
+                self.fail_sends -= 1
+                raise ConnectionError("Simulated Event Hub outage")
+            if isinstance(batch, FakeEventDataBatch):
+                events = batch.events
+            else:
+                events = list(batch)
+            self.sent_batches += 1
+            self.sent_events += len(events)
+            if self.keep_events:
+                self.events.extend(events)
+
+    def close(self):
+        self.closed = True
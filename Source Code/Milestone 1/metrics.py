@@ -0,0 +1,263 @@
+"""
+SIMULATOR METRICS
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Lightweight in-process telemetry for the simulator and sender hot paths:
+counters, gauges and fixed-bucket histograms that cost a lock and a few
+additions per update. Metrics can be scraped from a local Prometheus-style
+HTTP endpoint (/metrics, text exposition format) and/or printed as one
+summary line every few seconds, replacing per-event console output.
+
+Usage:
+    metrics = MetricsRegistry()
+    sent = metrics.counter("traffic_events_sent_total", "Events delivered")
+    sent.inc(500)
+    MetricsServer(metrics, port=9108).start()      # curl localhost:9108/metrics
+    SummaryReporter(metrics, interval=10).start()  # one line per 10 s
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default histogram buckets
+LATENCY_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Metric Types
+# ============
+
+class Counter:
+    """Monotonically increasing value"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        return [(self.name, {}, self._value)]
+
+class Gauge:
+    """Value that goes up and down; pass a callback to read it at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text="", callback=None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self.callback() if self.callback is not None else self._value
+
+    def samples(self):
+        return [(self.name, {}, self.value)]
+
+class Histogram:
+    """Cumulative-bucket histogram with sum and count (Prometheus semantics)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text="", buckets=LATENCY_BUCKETS_SECONDS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)   # last slot = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[slot] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """Context manager observing the elapsed seconds of a block"""
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._sum / self._count if self._count else 0.0
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (estimate)"""
+        with self._lock:
+            counts, total = list(self._counts), self._count
+        if total == 0:
+            return 0.0
+        rank, running = q * total, 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            if running >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        with self._lock:
+            counts, total, value_sum = list(self._counts), self._count, self._sum
+        samples, running = [], 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            samples.append((self.name + "_bucket", {"le": _format_value(bound)}, running))
+        samples.append((self.name + "_bucket", {"le": "+Inf"}, total))
+        samples.append((self.name + "_sum", {}, value_sum))
+        samples.append((self.name + "_count", {}, total))
+        return samples
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Registry
+# ========
+
+class MetricsRegistry:
+    """Named metrics; asking twice for the same name returns the same object"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text="", callback=None):
+        gauge = self._get(Gauge, name, help_text)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name, help_text="", buckets=LATENCY_BUCKETS_SECONDS):
+        return self._get(Histogram, name, help_text, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text
+                             else f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Exporters
+# =========
+
+class MetricsServer:
+    """Serve /metrics on a local port from a daemon thread"""
+
+    def __init__(self, registry, port=9108, host="127.0.0.1"):
+        self.registry = registry
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_ref.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # keep scrapes off the console
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class SummaryReporter:
+    """
+    Print one throughput line every interval seconds
+    format_line(registry, elapsed_seconds) builds the text
+    """
+
+    def __init__(self, registry, format_line, interval=10.0, print_fn=print):
+        self.registry = registry
+        self.format_line = format_line
+        self.interval = interval
+        self.print_fn = print_fn
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-summary", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            self.print_fn(self.format_line(self.registry, now - last))
+            last = now
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
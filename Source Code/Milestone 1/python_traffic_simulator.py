@@ -4,17 +4,21 @@ Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
 
 This simulator generates realistic traffic data for 7 major Cairo locations
 and streams it to Azure Event Hub for real-time processing and analysis.
+
+Importing the module is cheap: the Azure SDK, the Event Hub producer and
+the mode-specific helpers (asyncio load test, city-scale workers, spool,
+metrics) are loaded only when the mode that needs them runs, so short-lived
+workers and replay jobs that only use the generators start quickly.
 """
 
+import argparse
 import random
+import sys
 import time
 import json
 from datetime import datetime, timezone
-from azure.eventhub import EventHubProducerClient, EventData
-
-print("=" * 70)
-print("CAIRO TRAFFIC DATA SIMULATOR")
-print("=" * 70)
+from pathlib import Path
+import numpy as np
 
 # Configuration Section
 # ====================
@@ -101,23 +105,49 @@ TRAFFIC_INCIDENTS = [
     "Vehicle Breakdown", "Road Construction", "Police Checkpoint"
 ]
 
-# Initialize Azure Event Hub Connection
-# =====================================
-print("\nInitializing Azure Services Connection...")
+# Reference tables (SpeedImpactFactor, MaxCapacity) from the Milestone 2 schema
+SCHEMA_DIR = Path(__file__).resolve().parent.parent / "Milestone 2" / "Schema"
+_reference_data = None
+
+def reference_data():
+    """
+    Shared ReferenceData cache keyed by the simulator's code lists
+    Loaded on first use and reloaded after its TTL
+    """
+    global _reference_data
+    if _reference_data is None:
+        if str(SCHEMA_DIR) not in sys.path:
+            sys.path.insert(0, str(SCHEMA_DIR))
+        from reference_data import ReferenceData
+        _reference_data = ReferenceData(WEATHER_CONDITIONS, TRAFFIC_INCIDENTS)
+    return _reference_data
+
+# Azure Event Hub Connection (created on first use)
+# =================================================
 
 producer = None
-try:
-    # Create Event Hub producer client for data streaming
-    producer = EventHubProducerClient.from_connection_string(
-        conn_str=CONNECTION_STR,
-        eventhub_name=EVENTHUB_NAME
-    )
-    print("SUCCESS: Connected to Azure Event Hub")
-    print("Data will be streamed to cloud for real-time processing")
-except Exception as connection_error:
-    print(f"WARNING: Event Hub connection failed - {connection_error}")
-    print("System will run in local mode - data displayed only on console")
-    producer = None
+_producer_initialized = False
+
+def get_producer():
+    """
+    Shared Event Hub producer for the console simulation
+    Created on first call; None if the connection could not be set up
+    """
+    global producer, _producer_initialized
+    if _producer_initialized:
+        return producer
+    _producer_initialized = True
+    print("\nInitializing Azure Services Connection...")
+    try:
+        # Create Event Hub producer client for data streaming
+        producer = create_producer()
+        print("SUCCESS: Connected to Azure Event Hub")
+        print("Data will be streamed to cloud for real-time processing")
+    except Exception as connection_error:
+        print(f"WARNING: Event Hub connection failed - {connection_error}")
+        print("System will run in local mode - data displayed only on console")
+        producer = None
+    return producer
 
 # Traffic Pattern Calculation Functions
 # =====================================
@@ -157,23 +187,35 @@ def generate_realistic_traffic_data():
     """
     # Select random monitoring location
     location = random.choice(LOCATIONS)
+    reference = reference_data()
+    capacity = int(reference.capacity(LOCATIONS)[LOCATIONS.index(location)])
     
     # Get current traffic intensity factor
     rush_factor = calculate_rush_hour_factor()
     
     # Calculate vehicle count with rush hour consideration
     # Ensures minimum 5 vehicles and respects location capacity limits
-    min_vehicles = max(5, int(location["cap"] * 0.3 * rush_factor))
-    max_vehicles = min(location["cap"], int(location["cap"] * 1.2 * rush_factor))
+    min_vehicles = max(5, int(capacity * 0.3 * rush_factor))
+    max_vehicles = min(capacity, int(capacity * 1.2 * rush_factor))
     vehicle_count = random.randint(min_vehicles, max_vehicles)
     
     # Simulate occasional traffic congestion (5% probability)
     if random.random() < 0.05:
-        vehicle_count = min(location["cap"] * 1.5, vehicle_count * 1.8)
+        vehicle_count = min(capacity * 1.5, vehicle_count * 1.8)
     
     # Select dominant vehicle type for this observation
     vehicle_type = random.choice(VEHICLE_TYPES)
     
+    # Current weather and traffic incidents (10% probability)
+    weather = random.choice(WEATHER_CONDITIONS)
+    if random.random() < 0.1:
+        incident = random.choice([
+            "Minor Accident", "Major Accident", 
+            "Vehicle Breakdown", "Road Construction"
+        ])
+    else:
+        incident = "None"
+    
     # Calculate speed with realistic variations
     # Includes occasional extreme values for anomaly detection testing
     if random.random() < 0.05:
@@ -187,20 +229,14 @@ def generate_realistic_traffic_data():
         base_speed = random.uniform(20, 80)
         # Reduce speeds during high traffic periods
         adjusted_speed = base_speed * (0.8 if rush_factor > 1.0 else 1.2)
+        # Slow down for the weather and any incident (SpeedImpactFactor)
+        adjusted_speed *= float(reference.impact(WEATHER_CONDITIONS.index(weather),
+                                                 TRAFFIC_INCIDENTS.index(incident)))
         speed = max(5, min(90, round(adjusted_speed, 1)))
     
     # Calculate congestion percentage
     # Represents road capacity utilization
-    congestion_percentage = round(vehicle_count / location["cap"] * 100, 1)
-    
-    # Simulate traffic incidents (10% probability)
-    if random.random() < 0.1:
-        incident = random.choice([
-            "Minor Accident", "Major Accident", 
-            "Vehicle Breakdown", "Road Construction"
-        ])
-    else:
-        incident = "None"
+    congestion_percentage = round(vehicle_count / capacity * 100, 1)
     
     # Generate ISO 8601 timestamp for data consistency
     current_time = datetime.now(timezone.utc)
@@ -216,7 +252,7 @@ def generate_realistic_traffic_data():
         "VehicleCount": int(vehicle_count),
         "AverageSpeedKMH": round(speed, 2),  # Matches DECIMAL(5,2) in SQL
         "DominantVehicleType": vehicle_type,
-        "WeatherCondition": random.choice(WEATHER_CONDITIONS),
+        "WeatherCondition": weather,
         "TrafficIncident": incident,
         "CongestionPercentage": round(congestion_percentage, 2),  # DECIMAL(5,2)
         "IsRushHour": rush_factor > 1.0,
@@ -225,26 +261,273 @@ def generate_realistic_traffic_data():
     
     return traffic_event
 
+# Vectorized Batch Generation
+# ===========================
+# Load-testing helpers that produce many observations at once as NumPy
+# columns. Distributions mirror generate_realistic_traffic_data() exactly,
+# but categorical fields are carried as integer codes (indexes into
+# LOCATIONS, VEHICLE_TYPES, WEATHER_CONDITIONS and TRAFFIC_INCIDENTS).
+
+# Rush hour multiplier for every hour of the day (same bands as above)
+RUSH_FACTOR_BY_HOUR = np.array(
+    [1.5 if 7 <= h <= 10 else 1.4 if 18 <= h <= 21 else 0.4 if h <= 6 or h >= 22 else 1.0
+     for h in range(24)]
+)
+
+# Per-location lookup arrays so location attributes can be gathered by code
+LOCATION_LATITUDE = np.array([loc["lat"] for loc in LOCATIONS])
+LOCATION_LONGITUDE = np.array([loc["lon"] for loc in LOCATIONS])
+
+# Incidents the simulator actually injects (a subset of TRAFFIC_INCIDENTS)
+SIMULATED_INCIDENT_CODES = np.array([
+    TRAFFIC_INCIDENTS.index(name) for name in
+    ["Minor Accident", "Major Accident", "Vehicle Breakdown", "Road Construction"]
+])
+
+def generate_traffic_batch(n, start_time=None, rng=None, interval_seconds=5.0,
+                           locations=None, reference=None):
+    """
+    Generate N traffic observations as columnar NumPy arrays
+    Event i is stamped start_time + i * interval_seconds, so the rush hour
+    band follows the simulated clock rather than the wall clock
+    Pass an integer seed or a numpy Generator as rng for reproducible runs
+    locations overrides the monitored sites (LocationCode indexes into it)
+    reference supplies MaxCapacity and SpeedImpactFactor (default: reference_data())
+    Returns a dict of equal-length arrays (see batch_to_events for JSON)
+    """
+    rng = np.random.default_rng(rng)
+    if locations is None:
+        locations = LOCATIONS
+    if reference is None:
+        reference = reference_data()
+    location_capacity = reference.capacity(locations)
+    if start_time is None:
+        start_time = datetime.now(timezone.utc)
+    if start_time.tzinfo is None:
+        start_time = start_time.astimezone()
+
+    # Event timestamps in whole UTC seconds, matching isoformat(timespec='seconds')
+    offsets = np.arange(n) * float(interval_seconds)
+    epoch_seconds = np.floor(start_time.timestamp() + offsets).astype(np.int64)
+
+    # Rush hour factor uses local hour of day, like datetime.now().hour
+    utc_offset = start_time.astimezone().utcoffset().total_seconds()
+    local_hours = ((epoch_seconds + int(utc_offset)) // 3600) % 24
+    rush_factor = RUSH_FACTOR_BY_HOUR[local_hours]
+
+    # Random monitoring location per event
+    location_code = rng.integers(0, len(locations), size=n)
+    capacity = location_capacity[location_code]
+
+    # Vehicle count bounded by rush hour band and location capacity
+    min_vehicles = np.maximum(5, (capacity * 0.3 * rush_factor).astype(np.int64))
+    max_vehicles = np.minimum(capacity, (capacity * 1.2 * rush_factor).astype(np.int64))
+    vehicle_count = rng.integers(min_vehicles, max_vehicles + 1).astype(np.float64)
+
+    # Occasional traffic congestion (5% probability)
+    congested = rng.random(n) < 0.05
+    vehicle_count = np.where(
+        congested, np.minimum(capacity * 1.5, vehicle_count * 1.8), vehicle_count
+    )
+
+    vehicle_type_code = rng.integers(0, len(VEHICLE_TYPES), size=n)
+
+    # Speed: 5% anomalies split evenly between severe congestion and high speed
+    speed_anomaly = rng.random(n) < 0.05
+    low_speed_anomaly = rng.random(n) < 0.5
+    anomaly_speed = np.where(
+        low_speed_anomaly, rng.uniform(5, 15, size=n), rng.uniform(85, 110, size=n)
+    )
+    base_speed = rng.uniform(20, 80, size=n)
+
+    # Traffic incidents (10% probability)
+    has_incident = rng.random(n) < 0.1
+    incident_code = np.where(
+        has_incident,
+        SIMULATED_INCIDENT_CODES[rng.integers(0, len(SIMULATED_INCIDENT_CODES), size=n)],
+        TRAFFIC_INCIDENTS.index("None"),
+    )
+
+    weather_code = rng.integers(0, len(WEATHER_CONDITIONS), size=n)
+
+    # Weather and incident slowdowns joined by code lookup (SpeedImpactFactor)
+    adjusted_speed = (base_speed * np.where(rush_factor > 1.0, 0.8, 1.2)
+                      * reference.impact(weather_code, incident_code))
+    normal_speed = np.clip(np.round(adjusted_speed, 1), 5, 90)
+    speed = np.where(speed_anomaly, anomaly_speed, normal_speed)
+
+    congestion_percentage = np.round(vehicle_count / capacity * 100, 1)
+
+    return {
+        "EpochSeconds": epoch_seconds,
+        "LocationCode": location_code.astype(np.int32),
+        "VehicleCount": vehicle_count.astype(np.int32),
+        "AverageSpeedKMH": np.round(speed, 2),
+        "VehicleTypeCode": vehicle_type_code.astype(np.int8),
+        "WeatherCode": weather_code.astype(np.int8),
+        "IncidentCode": incident_code.astype(np.int8),
+        "CongestionPercentage": np.round(congestion_percentage, 2),
+        "IsRushHour": rush_factor > 1.0,
+        "RushFactor": np.round(rush_factor, 2),
+    }
+
+def scenario_engine(scenario=None, locations=None, reference=None):
+    """
+    Precomputed scenario profiles (scenarios.py) over the simulator's code lists
+    scenario is a scenario dict or JSON path (default: built-in Cairo week)
+    """
+    from scenarios import ScenarioEngine, load_scenario
+    if scenario is None or isinstance(scenario, (str, Path)):
+        scenario = load_scenario(scenario)
+    return ScenarioEngine(locations or LOCATIONS, VEHICLE_TYPES, WEATHER_CONDITIONS,
+                          TRAFFIC_INCIDENTS, reference or reference_data(), scenario)
+
+def batch_to_events(batch, locations=None):
+    """
+    Expand a columnar batch into traffic event dicts
+    Output matches generate_realistic_traffic_data() field for field
+    Pass the same locations list that was given to generate_traffic_batch
+    """
+    if locations is None:
+        locations = LOCATIONS
+    events = []
+    columns = zip(
+        batch["EpochSeconds"].tolist(), batch["LocationCode"].tolist(),
+        batch["VehicleCount"].tolist(), batch["AverageSpeedKMH"].tolist(),
+        batch["VehicleTypeCode"].tolist(), batch["WeatherCode"].tolist(),
+        batch["IncidentCode"].tolist(), batch["CongestionPercentage"].tolist(),
+        batch["IsRushHour"].tolist(), batch["RushFactor"].tolist(),
+    )
+    for (epoch, loc, vehicles, speed, vtype, weather,
+         incident, congestion, is_rush, rush) in columns:
+        location = locations[loc]
+        events.append({
+            "Timestamp": datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec='seconds'),
+            "LocationID": location["id"],
+            "LocationName": location["name"],
+            "Latitude": float(location["lat"]),
+            "Longitude": float(location["lon"]),
+            "VehicleCount": vehicles,
+            "AverageSpeedKMH": speed,
+            "DominantVehicleType": VEHICLE_TYPES[vtype],
+            "WeatherCondition": WEATHER_CONDITIONS[weather],
+            "TrafficIncident": TRAFFIC_INCIDENTS[incident],
+            "CongestionPercentage": congestion,
+            "IsRushHour": is_rush,
+            "RushFactor": rush
+        })
+    return events
+
 # Main Simulation Execution
 # =========================
 
-def run_traffic_simulation():
+def print_event_details(event_counter, traffic_data):
+    """Full multi-line console record of one observation (verbosity 3)"""
+    print(f"\nEVENTS #{event_counter}")
+    print(f"Location: {traffic_data['LocationName']} ({traffic_data['LocationID']})")
+    print(f"Coordinates: {traffic_data['Latitude']}, {traffic_data['Longitude']}")
+    print(f"Traffic Metrics: {traffic_data['VehicleCount']} vehicles, "
+          f"{traffic_data['AverageSpeedKMH']} km/h")
+    print(f"Road Conditions: {traffic_data['CongestionPercentage']}% congestion, "
+          f"{traffic_data['DominantVehicleType']} dominant")
+    print(f"Environment: {traffic_data['WeatherCondition']} weather, "
+          f"{traffic_data['TrafficIncident']} incident")
+    print(f"Time Analysis: Rush Hour: {traffic_data['IsRushHour']}, "
+          f"Intensity Factor: {traffic_data['RushFactor']}")
+    print(f"Timestamp: {traffic_data['Timestamp']}")
+    print("-" * 70)
+
+def summary_formatter():
+    """
+    Build the periodic status line: rates since the previous line plus
+    totals, batch size and send latency from the metrics registry
+    """
+    previous = {"generated": 0, "sent": 0}
+
+    def value(registry, name):
+        metric = registry.get(name)
+        return metric.value if metric is not None else 0
+
+    def format_line(registry, elapsed):
+        generated = value(registry, "traffic_events_generated_total")
+        sent = value(registry, "traffic_events_sent_total")
+        line = (f"[metrics] generated {generated:,} ({(generated - previous['generated']) / elapsed:,.1f}/s) | "
+                f"sent {sent:,} ({(sent - previous['sent']) / elapsed:,.1f}/s) | "
+                f"failed {value(registry, 'traffic_events_failed_total'):,} | "
+                f"queue {value(registry, 'traffic_sender_queue_depth'):,}")
+        if registry.get("traffic_spool_depth") is not None:
+            line += f" | spooled {value(registry, 'traffic_spool_depth'):,}"
+        latency = registry.get("traffic_send_latency_seconds")
+        batch_size = registry.get("traffic_batch_size_events")
+        if latency is not None and latency.count:
+            line += (f" | batch avg {batch_size.mean:,.0f} events | "
+                     f"send p50 <= {latency.quantile(0.5) * 1000:g} ms, "
+                     f"p99 <= {latency.quantile(0.99) * 1000:g} ms")
+        previous["generated"], previous["sent"] = generated, sent
+        return line
+
+    return format_line
+
+def run_traffic_simulation(interval_seconds=5.0, verbosity=1, metrics_port=None,
+                           summary_interval=10.0, spool_dir=None, spool_max_mb=1024,
+                           spool_eviction="drop_oldest", scenario=None):
     """
     Execute continuous traffic data simulation
-    Generates new traffic observations at 5-second intervals
+    Generates new traffic observations every interval_seconds (default 5)
     Streams data to Azure Event Hub for cloud processing
+    Telemetry goes to counters/histograms instead of per-event prints:
+    verbosity 0 = banners only, 1 = periodic summary line,
+    2 = plus one line per event, 3 = plus the full per-event record
+    metrics_port serves the metrics at http://127.0.0.1:<port>/metrics
+    spool_dir keeps events on disk while Event Hub is unreachable (also when
+    the connection failed at startup) and drains them once it is back
+    scenario ("default" or a JSON path) draws events from precomputed
+    scenario profiles instead of the rush hour step function
     """
+    from eventhub_sender import BatchingEventSender
+    from metrics import MetricsRegistry, MetricsServer, SummaryReporter
+
+    producer = get_producer()
+    engine = None
+    if scenario:
+        engine = scenario_engine(None if scenario == "default" else scenario)
+        rng = np.random.default_rng()
     event_counter = 0
+    metrics = MetricsRegistry()
+    generated = metrics.counter("traffic_events_generated_total", "Traffic observations generated")
+    
+    # Batched background sender - events are queued and shipped in
+    # size-limited batches with retry instead of one round trip each
+    spool = None
+    if spool_dir:
+        from spool import EventSpool
+        spool = EventSpool(spool_dir, max_bytes=int(spool_max_mb * 1024 * 1024),
+                           eviction=spool_eviction)
+    sender = None
+    if producer or spool:
+        sender = BatchingEventSender(producer, metrics=metrics, spool=spool).start()
+    server = MetricsServer(metrics, port=metrics_port).start() if metrics_port is not None else None
+    reporter = None
+    if verbosity >= 1:
+        reporter = SummaryReporter(metrics, summary_formatter(), interval=summary_interval).start()
     
     print("\n" + "=" * 70)
     print("TRAFFIC SIMULATION INITIATED")
     print("=" * 70)
     print("Simulation Parameters:")
     print("- Monitoring 7 Cairo traffic locations")
-    print("- Data generation interval: 5 seconds")
+    print(f"- Data generation interval: {interval_seconds:g} seconds")
     print("- Realistic rush hour modeling enabled")
     print("- Anomaly scenarios included for testing")
     print("- Data format: Azure SQL Database compatible")
+    if not sender:
+        print("- Local mode active - data generated but not sent")
+    if spool:
+        print(f"- Outage spool: {spool_dir} ({spool.pending:,} events waiting)")
+    if engine:
+        print(f"- Scenario: {engine.scenario['name']}")
+    if server:
+        print(f"- Metrics endpoint: http://127.0.0.1:{server.port}/metrics")
     print("\nStarting data generation...")
     print("-" * 70)
     
@@ -254,42 +537,29 @@ def run_traffic_simulation():
             event_counter += 1
             
             # Generate new traffic observation
-            traffic_data = generate_realistic_traffic_data()
-            
-            # Display observation details
-            print(f"\nEVENTS #{event_counter}")
-            print(f"Location: {traffic_data['LocationName']} ({traffic_data['LocationID']})")
-            print(f"Coordinates: {traffic_data['Latitude']}, {traffic_data['Longitude']}")
-            print(f"Traffic Metrics: {traffic_data['VehicleCount']} vehicles, "
-                  f"{traffic_data['AverageSpeedKMH']} km/h")
-            print(f"Road Conditions: {traffic_data['CongestionPercentage']}% congestion, "
-                  f"{traffic_data['DominantVehicleType']} dominant")
-            print(f"Environment: {traffic_data['WeatherCondition']} weather, "
-                  f"{traffic_data['TrafficIncident']} incident")
-            print(f"Time Analysis: Rush Hour: {traffic_data['IsRushHour']}, "
-                  f"Intensity Factor: {traffic_data['RushFactor']}")
-            print(f"Timestamp: {traffic_data['Timestamp']}")
+            if engine:
+                traffic_data = batch_to_events(engine.batch(1, rng=rng))[0]
+            else:
+                traffic_data = generate_realistic_traffic_data()
+            generated.inc()
             
             # Stream data to Azure Event Hub if connected
-            if producer:
-                try:
-                    # Convert data to JSON format for transmission
-                    event_data = EventData(json.dumps(traffic_data))
-                    
-                    # Send to Event Hub for Stream Analytics processing
-                    producer.send_batch([event_data])
-                    print("STATUS: Data successfully streamed to Azure cloud")
-                except Exception as transmission_error:
-                    print(f"TRANSMISSION ERROR: {transmission_error}")
-                    print("Data retained locally - transmission will retry")
-            else:
-                print("STATUS: Local mode active - data displayed only")
+            if sender:
+                # Convert data to JSON format and queue for batched transmission
+                sender.send(json.dumps(traffic_data))
             
-            print("-" * 70)
+            # Per-event console output only when explicitly requested
+            if verbosity >= 3:
+                print_event_details(event_counter, traffic_data)
+            elif verbosity == 2:
+                print(f"#{event_counter} {traffic_data['Timestamp']} {traffic_data['LocationID']} "
+                      f"{traffic_data['VehicleCount']} veh {traffic_data['AverageSpeedKMH']} km/h "
+                      f"{traffic_data['CongestionPercentage']}% {traffic_data['TrafficIncident']}")
             
-            # Maintain 5-second observation interval
-            # Matches project specification for data frequency
-            time.sleep(5)
+            # Maintain the observation interval
+            # (5 seconds matches the project specification for data frequency)
+            if interval_seconds > 0:
+                time.sleep(interval_seconds)
             
     except KeyboardInterrupt:
         # Graceful shutdown on user interruption
@@ -297,7 +567,19 @@ def run_traffic_simulation():
         print("SIMULATION TERMINATED BY USER")
         print(f"Total observations generated: {event_counter}")
         
-        # Clean up Azure connection
+        # Flush queued events, then clean up Azure connection
+        if reporter:
+            reporter.close()
+        if sender:
+            sender.close()
+            stats = sender.stats()
+            print(f"Events delivered: {stats['events_sent']}, "
+                  f"failed after retries: {stats['events_failed']}")
+        if spool:
+            print(f"Events left in spool for the next run: {spool.pending:,}")
+            spool.close()
+        if server:
+            server.close()
         if producer:
             producer.close()
             print("Azure Event Hub connection closed securely")
@@ -305,16 +587,175 @@ def run_traffic_simulation():
         print("Simulation shutdown complete")
         print("=" * 70)
 
+# Async Load-Test Mode
+# ====================
+
+def run_async_traffic_simulation(duration=60, max_events=None, generator_tasks=4,
+                                 sender_tasks=4, per_partition=False, seed=None):
+    """
+    Saturate the Event Hub from one host using the asyncio client
+    Concurrent generator tasks feed sender tasks keyed by LocationID
+    Prints a throughput report when the run completes
+    """
+    from azure.eventhub.aio import EventHubProducerClient as AsyncEventHubProducerClient
+    from async_sender import run_async_producers, print_throughput_report
+
+    rng = np.random.default_rng(seed)
+
+    def make_events(n):
+        # Load-test events are all stamped "now" rather than 5 seconds apart
+        return batch_to_events(generate_traffic_batch(n, rng=rng, interval_seconds=0.0))
+
+    async def main():
+        async_producer = AsyncEventHubProducerClient.from_connection_string(
+            conn_str=CONNECTION_STR,
+            eventhub_name=EVENTHUB_NAME
+        )
+        async with async_producer:
+            return await run_async_producers(
+                async_producer, make_events,
+                duration=duration, max_events=max_events,
+                generator_tasks=generator_tasks, sender_tasks=sender_tasks,
+                per_partition=per_partition
+            )
+
+    print("\n" + "=" * 70)
+    print("ASYNC LOAD TEST INITIATED")
+    print("=" * 70)
+    import asyncio
+    report = asyncio.run(main())
+    print_throughput_report(report)
+    return report
+
+# Multi-Process City-Scale Mode
+# ==============================
+
+def create_producer():
+    """Event Hub producer for a worker process (clients are per-process)"""
+    from azure.eventhub import EventHubProducerClient
+    return EventHubProducerClient.from_connection_string(
+        conn_str=CONNECTION_STR,
+        eventhub_name=EVENTHUB_NAME
+    )
+
+def create_dry_run_producer():
+    """Local fake producer that counts events without a network round trip"""
+    from eventhub_sender import FakeProducer
+    return FakeProducer(keep_events=False)
+
+def run_sharded_traffic_simulation(workers, location_count=None, locations_sql=None,
+                                   duration=60, batch_size=2000, seed=None,
+                                   dry_run=False):
+    """
+    Simulate thousands of sensors across a pool of worker processes
+    Locations come from a dbo.Locations seed file or are synthesized
+    around the 7 Cairo seed sites; each worker owns one shard
+    """
+    from city_scale import (
+        load_locations_sql, synthesize_locations,
+        run_sharded_simulation, print_sharded_report
+    )
+
+    seed_locations = load_locations_sql(locations_sql) if locations_sql else LOCATIONS
+    locations = synthesize_locations(location_count or len(seed_locations),
+                                     seed_locations, rng=seed)
+
+    print("\n" + "=" * 70)
+    print("CITY-SCALE SIMULATION INITIATED")
+    print("=" * 70)
+    report = run_sharded_simulation(
+        locations, workers, generate_traffic_batch, batch_to_events,
+        create_dry_run_producer if dry_run else create_producer,
+        duration=duration, batch_size=batch_size, seed=seed
+    )
+    print_sharded_report(report)
+    return report
+
 # Application Entry Point
 # =======================
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cairo traffic data simulator")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run the asyncio multi-producer load test instead "
+                             "of the 5-second console simulation")
+    parser.add_argument("--duration", type=float, default=60,
+                        help="Async/worker modes: seconds to run (default 60)")
+    parser.add_argument("--max-events", type=int, default=None,
+                        help="Async mode: stop after this many events")
+    parser.add_argument("--generators", type=int, default=4,
+                        help="Async mode: concurrent generator tasks")
+    parser.add_argument("--senders", type=int, default=4,
+                        help="Async mode: concurrent sender tasks (keyed mode)")
+    parser.add_argument("--per-partition", action="store_true",
+                        help="Async mode: one sender task per Event Hub partition")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run N generator/sender processes, sharded by location")
+    parser.add_argument("--locations", type=int, default=None,
+                        help="Worker mode: total simulated sensors (synthetic "
+                             "sites are scattered around the seed locations)")
+    parser.add_argument("--locations-sql", default=None,
+                        help="Worker mode: load seed locations from a "
+                             "dbo.Locations SQL seed file")
+    parser.add_argument("--batch-size", type=int, default=2000,
+                        help="Worker mode: events generated per batch")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Worker mode: send to a local fake producer")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for reproducible generated data")
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="Console mode: seconds between observations (0 = no pause)")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="Console mode: -v one line per event, -vv full event records")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="Console mode: no periodic summary lines")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Console mode: serve Prometheus metrics on this local port")
+    parser.add_argument("--summary-interval", type=float, default=10.0,
+                        help="Console mode: seconds between summary lines")
+    parser.add_argument("--spool-dir", default=None,
+                        help="Console mode: spool events to this directory during "
+                             "Event Hub outages and drain them when it recovers")
+    parser.add_argument("--spool-max-mb", type=float, default=1024,
+                        help="Console mode: disk cap for the spool in MB")
+    parser.add_argument("--spool-eviction", choices=("drop_oldest", "reject"),
+                        default="drop_oldest",
+                        help="Console mode: what to do when the spool is full")
+    parser.add_argument("--scenario", nargs="?", const="default", default=None,
+                        help="Console mode: generate from precomputed scenario profiles "
+                             "(built-in Cairo week, or a scenario JSON file)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
     """
     Main execution block - starts the traffic simulation
     Press Ctrl+C to stop the simulation gracefully
     """
+    args = parse_args()
+    print("=" * 70)
+    print("CAIRO TRAFFIC DATA SIMULATOR")
+    print("=" * 70)
     try:
-        run_traffic_simulation()
+        if args.workers:
+            run_sharded_traffic_simulation(
+                args.workers, location_count=args.locations,
+                locations_sql=args.locations_sql, duration=args.duration,
+                batch_size=args.batch_size, seed=args.seed, dry_run=args.dry_run
+            )
+        elif args.use_async:
+            run_async_traffic_simulation(
+                duration=args.duration, max_events=args.max_events,
+                generator_tasks=args.generators, sender_tasks=args.senders,
+                per_partition=args.per_partition, seed=args.seed
+            )
+        else:
+            run_traffic_simulation(
+                interval_seconds=args.interval,
+                verbosity=0 if args.quiet else 1 + args.verbose,
+                metrics_port=args.metrics_port, summary_interval=args.summary_interval,
+                spool_dir=args.spool_dir, spool_max_mb=args.spool_max_mb,
+                spool_eviction=args.spool_eviction, scenario=args.scenario
+            )
     except Exception as critical_error:
         print(f"CRITICAL ERROR: Simulation failed - {critical_error}")
         if producer:
@@ -0,0 +1,305 @@
+"""
+TRAFFIC EVENT REPLAY ENGINE
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Replays recorded traffic events (the exact JSON shape the simulator emits)
+from JSON-lines or Parquet captures. Events are read in chunks - JSONL
+through a memory map, Parquet by record batch - so multi-GB day captures
+never need to fit in RAM. Playback follows the recorded timestamps with a
+configurable speed-up factor (1x real time, 60x, or unbounded) and hands
+each due slice of events to a sink:
+
+- SenderSink: the batched Event Hub sender (eventhub_sender.py)
+- AnomalyEngineSink: the local Stream Analytics replica (anomaly_engine.py)
+  or the adaptive sliding/hopping detector (sliding_engine.py)
+- any callable taking a list of events, e.g. the dashboard ingest worker
+
+Usage:
+    python replay.py capture.jsonl --speedup 60 --to anomalies
+    python replay.py capture.parquet --speedup 0 --to eventhub --dry-run
+    python replay.py capture.jsonl --speedup 0 --to anomalies --sqlite anomalies.db
+"""
+
+import argparse
+import json
+import mmap
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+DEFAULT_CHUNK_SIZE = 10_000
+MAX_SLEEP_SECONDS = 0.5  # Upper bound on one pacing sleep (keeps Ctrl+C responsive)
+
+# Capture Readers
+# ===============
+
+def read_jsonl_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of events from a JSON-lines file via a read-only memory map"""
+    with open(path, "rb") as handle:
+        if Path(path).stat().st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            chunk = []
+            for line in iter(mapped.readline, b""):
+                line = line.strip()
+                if not line:
+                    continue
+                chunk.append(json.loads(line))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+def read_parquet_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of events from a Parquet file one record batch at a time"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as missing:
+        raise ImportError("Parquet replay requires pyarrow (pip install pyarrow)") from missing
+
+    parquet_file = pq.ParquetFile(path)
+    for record_batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield record_batch.to_pylist()
+
+def read_event_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Pick the reader from the file extension (.parquet / .jsonl / .json)"""
+    if Path(path).suffix.lower() in (".parquet", ".pq"):
+        return read_parquet_chunks(path, chunk_size)
+    return read_jsonl_chunks(path, chunk_size)
+
+def write_jsonl(events, path, append=False):
+    """Record events as JSON lines (the format read_jsonl_chunks expects)"""
+    with open(path, "a" if append else "w", encoding="utf-8") as handle:
+        for event in events:
+            handle.write(json.dumps(event, default=str))
+            handle.write("\n")
+
+def event_epoch(event):
+    """Event Timestamp (ISO 8601 string or datetime) as UTC epoch seconds"""
+    value = event["Timestamp"]
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+# Paced Playback
+# ==============
+
+def paced(chunks, speedup=1.0, stats=None, clock=time.monotonic, sleep=time.sleep, stop=None):
+    """
+    Yield slices of event chunks as their recorded time comes due
+    speedup=60 plays an hour of traffic per minute; None or 0 disables
+    pacing and yields whole chunks as fast as they are consumed
+    Pass a dict as stats to have it filled with a playback summary
+    Pass a threading.Event as stop to end playback once it is set, even
+    while waiting for the next event to come due
+    """
+    unbounded = not speedup or speedup == float("inf")
+    stats = {} if stats is None else stats
+    started = clock()
+    first_event_time = None
+    last_event_time = None
+    events = 0
+    deliveries = 0
+
+    def summarize():
+        wall = clock() - started
+        span = 0.0
+        if first_event_time is not None and last_event_time is not None:
+            span = last_event_time - first_event_time
+        stats.update({
+            "events": events,
+            "deliveries": deliveries,
+            "wall_seconds": round(wall, 3),
+            "event_span_seconds": round(span, 3),
+            "events_per_second": round(events / wall, 1) if wall > 0 else 0.0,
+        })
+
+    try:
+        for chunk in chunks:
+            if stop is not None and stop.is_set():
+                return
+            if not chunk:
+                continue
+            if unbounded:
+                events += len(chunk)
+                deliveries += 1
+                yield chunk
+                continue
+
+            times = [event_epoch(event) for event in chunk]
+            if first_event_time is None:
+                first_event_time = times[0]
+                started = clock()
+
+            i = 0
+            while i < len(chunk):
+                elapsed = clock() - started
+                due_until = first_event_time + elapsed * speedup
+                j = i
+                while j < len(chunk) and times[j] <= due_until:
+                    j += 1
+                if j > i:
+                    events += j - i
+                    deliveries += 1
+                    last_event_time = times[j - 1]
+                    yield chunk[i:j]
+                    i = j
+                else:
+                    wait = (times[i] - first_event_time) / speedup - elapsed
+                    pause = min(max(wait, 0.0), MAX_SLEEP_SECONDS)
+                    if stop is None:
+                        sleep(pause)
+                    elif stop.wait(pause):
+                        return
+    finally:
+        summarize()
+
+def replay(chunks, sink, speedup=1.0):
+    """
+    Stream event chunks into sink(list_of_events) following recorded time
+    Returns a summary dict (see paced)
+    """
+    stats = {}
+    for events in paced(chunks, speedup, stats):
+        sink(events)
+    return stats
+
+def replay_file(path, sink, speedup=1.0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Replay a JSONL/Parquet capture into sink"""
+    return replay(read_event_chunks(path, chunk_size), sink, speedup=speedup)
+
+# Sinks
+# =====
+
+class SenderSink:
+    """Serialize events to JSON and queue them on a BatchingEventSender"""
+
+    def __init__(self, sender):
+        self.sender = sender
+
+    def __call__(self, events):
+        self.sender.send_many(json.dumps(event) for event in events)
+
+class AnomalyEngineSink:
+    """Feed events to an anomaly engine (process_many / flush) and collect the rows"""
+
+    def __init__(self, engine, on_rows=None):
+        self.engine = engine
+        self.on_rows = on_rows
+        self.rows = []
+
+    def __call__(self, events):
+        rows = self.engine.process_many(events)
+        self._emit(rows)
+
+    def finish(self):
+        self._emit(self.engine.flush())
+
+    def _emit(self, rows):
+        if not rows:
+            return
+        if self.on_rows is not None:
+            self.on_rows(rows)
+        else:
+            self.rows.extend(rows)
+
+class CountingSink:
+    """Discard events, only count them (measures read + pacing throughput)"""
+
+    def __init__(self):
+        self.events = 0
+
+    def __call__(self, events):
+        self.events += len(events)
+
+def anomaly_engine_module():
+    """Import anomaly_engine from the Milestone 2 Stream Analytics folder"""
+    stream_analytics = Path(__file__).resolve().parent.parent / "Milestone 2" / "Stream Analytics"
+    if str(stream_analytics) not in sys.path:
+        sys.path.insert(0, str(stream_analytics))
+    import anomaly_engine
+    return anomaly_engine
+
+def anomalies_sink_module():
+    """Import the dbo.Anomalies bulk loader from the Milestone 2 Schema folder"""
+    schema = Path(__file__).resolve().parent.parent / "Milestone 2" / "Schema"
+    if str(schema) not in sys.path:
+        sys.path.insert(0, str(schema))
+    import anomalies_sink
+    return anomalies_sink
+
+# Command Line
+# ============
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded traffic events")
+    parser.add_argument("capture", help="JSONL or Parquet capture of traffic events")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="Time compression factor (1 = real time, 0 = unbounded)")
+    parser.add_argument("--to", choices=["count", "eventhub", "anomalies"], default="count",
+                        help="Where replayed events go")
+    parser.add_argument("--out", help="anomalies target: write rows to this CSV")
+    parser.add_argument("--sqlite", help="anomalies target: upsert rows into this SQLite database")
+    parser.add_argument("--dated-ids", action=argparse.BooleanOptionalAction, default=True,
+                        help="anomalies target: upsert with EVT_<LocationID>_<yyyymmddhhmmss> EventIDs so "
+                             "multi-day backfills do not overwrite each other (default: on)")
+    parser.add_argument("--detector", choices=["tumbling", "sliding", "hopping"], default="tumbling",
+                        help="anomalies target: cloud query replica or adaptive window detector")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="eventhub target: send to the local FakeProducer")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    print(f"Replaying {args.capture} at "
+          f"{'unbounded speed' if not args.speedup else f'{args.speedup:g}x'} -> {args.to}")
+
+    if args.to == "eventhub":
+        from eventhub_sender import BatchingEventSender, FakeProducer
+        if args.dry_run:
+            producer = FakeProducer(keep_events=False)
+        else:
+            from python_traffic_simulator import create_producer
+            producer = create_producer()
+        with BatchingEventSender(producer) as sender:
+            summary = replay_file(args.capture, SenderSink(sender), args.speedup, args.chunk_size)
+        producer.close()
+        print(f"Sender: {sender.stats()}")
+    elif args.to == "anomalies":
+        engine_module = anomaly_engine_module()
+        loader = None
+        if args.sqlite:
+            loader_module = anomalies_sink_module()
+            loader = loader_module.AnomaliesSink(loader_module.sqlite_pool(args.sqlite),
+                                                 dated_event_ids=args.dated_ids)
+        if args.detector == "tumbling":
+            engine = engine_module.TumblingAnomalyEngine()
+        else:
+            from sliding_engine import SlidingAnomalyEngine
+            engine = SlidingAnomalyEngine(mode=args.detector)
+        sink = AnomalyEngineSink(engine)
+        summary = replay_file(args.capture, sink, args.speedup, args.chunk_size)
+        sink.finish()
+        print(f"Anomalies detected: {len(sink.rows)}")
+        if args.out:
+            engine_module.write_csv(sink.rows, args.out)
+            print(f"Rows written to {args.out}")
+        if loader is not None:
+            loader(sink.rows)
+            loader.close()
+            loader.pool.close()
+            print(f"Upserted into {args.sqlite}: {loader.stats()}")
+    else:
+        summary = replay_file(args.capture, CountingSink(), args.speedup, args.chunk_size)
+
+    print(f"Replayed {summary['events']} events in {summary['wall_seconds']} s "
+          f"({summary['events_per_second']} events/sec)")
+    if args.speedup:
+        print(f"Recorded traffic covered: {summary['event_span_seconds']} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+SCENARIO-DRIVEN TRAFFIC MODEL
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Precomputes per-location, per-minute traffic profiles for a simulated day
+or week, so generating an observation is an array lookup plus noise
+instead of re-deriving the rush hour band from the wall clock per event.
+
+A scenario (JSON, see DEFAULT_SCENARIO) describes:
+
+- rush_curve       demand multiplier control points over the hour of day,
+                   linearly interpolated to every minute
+- weekday_demand   demand multiplier per weekday (Monday first)
+- weather          scheduled conditions, optionally per location
+- incidents        injected incidents, e.g. a major accident on the
+                   6th October Bridge during the morning rush
+
+Each minute of the profile gets a volume/capacity ratio, a weather and an
+incident code, and a mean speed from a BPR volume-delay curve scaled by
+the SpeedImpactFactor reference data. Batches come out in the simulator's
+columnar layout (batch_to_events / wire_format work unchanged), so days of
+traffic can be produced far ahead of wall-clock time for capacity testing.
+
+Usage:
+    python scenarios.py profile --location LOC003
+    python scenarios.py run --days 7 --per-minute 12 --out week.jsonl
+    python scenarios.py run --scenario my_scenario.json --days 1 --count
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+MINUTES_PER_DAY = 1440
+
+# Default Scenario
+# ================
+
+# One simulated Cairo week (Friday / Saturday weekend) with scheduled
+# weather and a few incidents; days count from the scenario start date
+DEFAULT_SCENARIO = {
+    "name": "Cairo week - 6th October Bridge accident in the day 6 morning rush",
+    "start": None,              # ISO date/time of day 0 (default: today, local midnight)
+    "days": 7,
+    "rush_curve": [
+        [0, 0.4], [5, 0.4], [6.5, 0.9], [8, 1.5], [10, 1.2], [12, 1.0],
+        [15, 1.1], [17, 1.3], [19, 1.4], [21, 1.2], [22.5, 0.6], [24, 0.4],
+    ],
+    "rush_threshold": 1.0,      # IsRushHour when the rush factor exceeds this
+    "weekday_demand": [1.0, 1.0, 1.0, 1.0, 0.7, 0.8, 1.05],
+    "location_demand": {},      # LocationID -> extra demand multiplier
+    "free_flow_kmh": 70.0,
+    "location_free_flow_kmh": {"LOC003": 85.0, "LOC006": 80.0},
+    "default_weather": "Clear",
+    "weather": [
+        {"day": 0, "start": "04:30", "end": "08:30", "condition": "Foggy"},
+        {"day": 2, "start": "13:00", "end": "17:00", "condition": "Sandstorm"},
+        {"day": 5, "start": "15:00", "end": "18:00", "condition": "Light Rain",
+         "locations": ["LOC006", "LOC007"]},
+    ],
+    "incidents": [
+        {"day": 6, "start": "08:15", "duration_minutes": 45,
+         "type": "Major Accident", "location": "LOC003"},
+        {"day": 1, "start": "18:30", "duration_minutes": 20,
+         "type": "Vehicle Breakdown", "location": "LOC002"},
+        {"day": 3, "start": "09:00", "duration_minutes": 240,
+         "type": "Road Construction", "location": "LOC004"},
+    ],
+    "vehicle_noise": 0.15,      # Relative standard deviation of VehicleCount
+    "speed_noise": 0.10,        # Relative standard deviation of AverageSpeedKMH
+    "anomaly_rate": 0.02,       # Share of events with an extreme speed reading
+}
+
+# Queueing behind an incident raises the observed vehicle count
+INCIDENT_VOLUME_FACTOR = {
+    "None": 1.0, "Minor Accident": 1.15, "Major Accident": 1.4,
+    "Vehicle Breakdown": 1.1, "Road Construction": 1.2, "Police Checkpoint": 1.1,
+}
+
+# Volume-delay (BPR) curve: speed = free_flow / (1 + ALPHA * (v/c) ** BETA)
+BPR_ALPHA = 1.0
+BPR_BETA = 4.0
+MEAN_VOLUME_RATIO = 0.75        # Mean of the simulator's 0.3x - 1.2x capacity band
+
+def load_scenario(path=None):
+    """Default scenario, with the keys of a JSON scenario file layered on top"""
+    scenario = json.loads(json.dumps(DEFAULT_SCENARIO))
+    if path is not None:
+        scenario.update(json.loads(Path(path).read_text(encoding="utf-8")))
+    return scenario
+
+def _minute_of_day(text):
+    hours, minutes = text.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def _scenario_start(value):
+    """Day 0 of the profile as an aware datetime (local midnight by default)"""
+    if value is None:
+        now = datetime.now().astimezone()
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start = datetime.fromisoformat(value)
+    return start if start.tzinfo is not None else start.astimezone()
+
+# Scenario Engine
+# ===============
+
+class ScenarioEngine:
+    """
+    Per-location, per-minute profile arrays built once from a scenario
+    Times outside the simulated span wrap around it (a 1-day scenario
+    repeats daily, a 7-day one weekly)
+    """
+
+    def __init__(self, locations, vehicle_types, weather_conditions, traffic_incidents,
+                 reference, scenario=None):
+        self.scenario = scenario if scenario is not None else load_scenario()
+        self.locations = locations
+        self.vehicle_types = vehicle_types
+        self.weather_conditions = weather_conditions
+        self.traffic_incidents = traffic_incidents
+        self.reference = reference
+        self.start = _scenario_start(self.scenario.get("start"))
+        self.start_epoch = int(self.start.timestamp())
+        self.minutes = int(self.scenario["days"]) * MINUTES_PER_DAY
+        self._build()
+
+    # Profile Construction
+    # --------------------
+
+    def location_index(self, key):
+        for i, loc in enumerate(self.locations):
+            if key in (loc["id"], loc["name"]):
+                return i
+        return None
+
+    def _span(self, entry, end_key="end"):
+        day_start = int(entry.get("day", 0)) * MINUTES_PER_DAY
+        first = day_start + _minute_of_day(entry["start"])
+        if "duration_minutes" in entry:
+            last = first + int(entry["duration_minutes"])
+        else:
+            last = day_start + _minute_of_day(entry[end_key])
+        return max(0, first), min(self.minutes, last)
+
+    def _rows(self, entry):
+        """Location rows an entry applies to (all when it names none)"""
+        keys = entry.get("locations") or ([entry["location"]] if "location" in entry else None)
+        if keys is None:
+            return slice(None)
+        rows = [self.location_index(key) for key in keys]
+        return [row for row in rows if row is not None]
+
+    def _build(self):
+        scenario = self.scenario
+        n_loc, minutes = len(self.locations), self.minutes
+        minute = np.arange(minutes)
+        hour_of_day = (minute % MINUTES_PER_DAY) / 60.0
+
+        # Rush factor per minute: interpolated daily curve x weekday demand
+        curve = np.asarray(scenario["rush_curve"], dtype=np.float64)
+        weekday = (self.start.weekday() + minute // MINUTES_PER_DAY) % 7
+        self.rush = (np.interp(hour_of_day, curve[:, 0], curve[:, 1])
+                     * np.asarray(scenario["weekday_demand"], dtype=np.float64)[weekday])
+
+        # Scheduled weather and injected incidents as code grids
+        self.weather_code = np.full((n_loc, minutes),
+                                    self.weather_conditions.index(scenario["default_weather"]),
+                                    dtype=np.int8)
+        for entry in scenario.get("weather", []):
+            first, last = self._span(entry)
+            self.weather_code[self._rows(entry), first:last] = \
+                self.weather_conditions.index(entry["condition"])
+        self.incident_code = np.full((n_loc, minutes), self.traffic_incidents.index("None"),
+                                     dtype=np.int8)
+        for entry in scenario.get("incidents", []):
+            first, last = self._span(entry)
+            self.incident_code[self._rows(entry), first:last] = \
+                self.traffic_incidents.index(entry["type"])
+
+        # Volume/capacity ratio per location and minute
+        demand = np.array([scenario["location_demand"].get(loc["id"], 1.0)
+                           for loc in self.locations], dtype=np.float64)
+        volume_factor = np.array([INCIDENT_VOLUME_FACTOR.get(name, 1.0)
+                                  for name in self.traffic_incidents])
+        self.volume_ratio = (MEAN_VOLUME_RATIO * demand[:, None] * self.rush[None, :]
+                             * volume_factor[self.incident_code])
+
+        # Mean speed: volume-delay curve, then weather / incident slowdown
+        free_flow = np.array([scenario["location_free_flow_kmh"].get(loc["id"],
+                                                                     scenario["free_flow_kmh"])
+                              for loc in self.locations], dtype=np.float64)
+        self.speed = (free_flow[:, None] / (1 + BPR_ALPHA * self.volume_ratio ** BPR_BETA)
+                      * self.reference.impact(self.weather_code, self.incident_code))
+        self.capacity = self.reference.capacity(self.locations).astype(np.float64)
+
+    # Generation
+    # ----------
+
+    def minute_index(self, epoch_seconds):
+        """Profile column for UTC epoch seconds (wrapping around the span)"""
+        return ((np.asarray(epoch_seconds, dtype=np.int64) - self.start_epoch) // 60) % self.minutes
+
+    def observe(self, epoch_seconds, location_code, rng=None):
+        """Columnar observations for given timestamps and location codes"""
+        rng = np.random.default_rng(rng)
+        epoch_seconds = np.asarray(epoch_seconds, dtype=np.int64)
+        location_code = np.asarray(location_code, dtype=np.int64)
+        n = len(epoch_seconds)
+        scenario = self.scenario
+        minute = self.minute_index(epoch_seconds)
+        capacity = self.capacity[location_code]
+
+        # Profile lookup plus multiplicative noise
+        vehicles = (capacity * self.volume_ratio[location_code, minute]
+                    * (1 + scenario["vehicle_noise"] * rng.standard_normal(n)))
+        vehicle_count = np.clip(np.round(vehicles), 5, np.floor(capacity * 1.5))
+        speed = (self.speed[location_code, minute]
+                 * (1 + scenario["speed_noise"] * rng.standard_normal(n)))
+        speed = np.clip(np.round(speed, 1), 5, 90)
+
+        # Occasional extreme readings keep the anomaly detectors exercised
+        anomaly = rng.random(n) < scenario["anomaly_rate"]
+        anomaly_speed = np.where(rng.random(n) < 0.5, rng.uniform(5, 15, size=n),
+                                 rng.uniform(85, 110, size=n))
+        speed = np.where(anomaly, anomaly_speed, speed)
+
+        rush_factor = self.rush[minute]
+        return {
+            "EpochSeconds": epoch_seconds,
+            "LocationCode": location_code.astype(np.int32),
+            "VehicleCount": vehicle_count.astype(np.int32),
+            "AverageSpeedKMH": np.round(speed, 2),
+            "VehicleTypeCode": rng.integers(0, len(self.vehicle_types), size=n).astype(np.int8),
+            "WeatherCode": self.weather_code[location_code, minute],
+            "IncidentCode": self.incident_code[location_code, minute],
+            "CongestionPercentage": np.round(vehicle_count / capacity * 100, 1),
+            "IsRushHour": rush_factor > scenario["rush_threshold"],
+            "RushFactor": np.round(rush_factor, 2),
+        }
+
+    def batch(self, n, start_time=None, rng=None, interval_seconds=5.0):
+        """
+        N observations at random locations, event i stamped
+        start_time + i * interval_seconds (same contract as generate_traffic_batch)
+        """
+        rng = np.random.default_rng(rng)
+        if start_time is None:
+            start_time = datetime.now(timezone.utc)
+        offsets = np.arange(n) * float(interval_seconds)
+        epoch_seconds = np.floor(start_time.timestamp() + offsets).astype(np.int64)
+        return self.observe(epoch_seconds, rng.integers(0, len(self.locations), size=n), rng)
+
+    def iter_batches(self, days=None, per_minute=12, chunk_minutes=60, rng=None):
+        """
+        Simulate the scenario ahead of wall-clock time
+        Every location reports per_minute times a minute; yields one columnar
+        batch (time ordered) per chunk_minutes of simulated time
+        """
+        rng = np.random.default_rng(rng)
+        total = self.minutes if days is None else int(days * MINUTES_PER_DAY)
+        n_loc = len(self.locations)
+        step = 60.0 / per_minute
+        for first in range(0, total, chunk_minutes):
+            minutes = min(chunk_minutes, total - first)
+            ticks = self.start_epoch + first * 60 + np.floor(
+                np.arange(minutes * per_minute) * step).astype(np.int64)
+            yield self.observe(np.repeat(ticks, n_loc), np.tile(np.arange(n_loc), len(ticks)), rng)
+
+    def hourly_profile(self, location_code, day=0):
+        """Mean vehicles, speed and the dominant weather / incident per hour"""
+        days = self.minutes // MINUTES_PER_DAY
+        if not 0 <= day < days:
+            raise ValueError(f"day must be in 0..{days - 1}, got {day}")
+        rows = []
+        for hour in range(24):
+            cols = slice(day * MINUTES_PER_DAY + hour * 60, day * MINUTES_PER_DAY + hour * 60 + 60)
+            weather = np.bincount(self.weather_code[location_code, cols]).argmax()
+            incident = np.bincount(self.incident_code[location_code, cols]).argmax()
+            rows.append({
+                "hour": hour,
+                "rush_factor": round(float(self.rush[cols].mean()), 2),
+                "vehicles": round(float((self.capacity[location_code]
+                                         * self.volume_ratio[location_code, cols]).mean()), 1),
+                "speed_kmh": round(float(self.speed[location_code, cols].mean()), 1),
+                "weather": self.weather_conditions[weather],
+                "incident": self.traffic_incidents[incident],
+            })
+        return rows
+
+# Command Line
+# ============
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precomputed scenario traffic model")
+    parser.add_argument("--scenario", help="Scenario JSON file (default: built-in Cairo week)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    profile = sub.add_parser("profile", help="Print one location's hourly profile")
+    profile.add_argument("--location", default="LOC003", help="LocationID or name")
+    profile.add_argument("--day", type=int, default=0)
+    run = sub.add_parser("run", help="Simulate days of traffic as fast as possible")
+    run.add_argument("--days", type=float, default=None, help="Simulated days (default: whole scenario)")
+    run.add_argument("--per-minute", type=int, default=12, help="Readings per location per minute")
+    run.add_argument("--seed", type=int, default=None)
+    target = run.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="Write events to a JSON-lines capture (for replay.py)")
+    target.add_argument("--count", action="store_true", help="Only generate and count")
+    args = parser.parse_args(argv)
+
+    import python_traffic_simulator as sim
+    engine = sim.scenario_engine(load_scenario(args.scenario))
+
+    if args.command == "profile":
+        code = engine.location_index(args.location)
+        if code is None:
+            parser.error(f"Unknown location {args.location!r}")
+        if not 0 <= args.day < engine.scenario["days"]:
+            parser.error(f"--day must be in 0..{engine.scenario['days'] - 1}")
+        print(f"{engine.locations[code]['name']} - day {args.day} of '{engine.scenario['name']}'")
+        for row in engine.hourly_profile(code, args.day):
+            print(f"{row['hour']:02d}:00  rush {row['rush_factor']:.2f}  "
+                  f"{row['vehicles']:6.1f} veh  {row['speed_kmh']:5.1f} km/h  "
+                  f"{row['weather']:<10} {row['incident']}")
+        return 0
+
+    if args.out:
+        from replay import write_jsonl
+        Path(args.out).write_text("", encoding="utf-8")
+    started = time.perf_counter()
+    events = 0
+    for batch in engine.iter_batches(args.days, args.per_minute, rng=args.seed):
+        events += len(batch["EpochSeconds"])
+        if args.out:
+            write_jsonl(sim.batch_to_events(batch, engine.locations), args.out, append=True)
+    elapsed = time.perf_counter() - started
+    simulated = (args.days or engine.scenario["days"]) * 86400
+    print(f"{events:,} events ({simulated / 86400:g} simulated days) in {elapsed:.2f} s - "
+          f"{events / elapsed:,.0f} events/s, {simulated / elapsed:,.0f}x real time")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+"""
+DURABLE EVENT SPOOL
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Append-only on-disk buffer for serialized events that could not reach
+Azure Event Hub. Events are written as length-prefixed, CRC-checked records
+into fixed-size segment files; a small cursor file remembers how far the
+spool has been drained, so nothing is lost or re-sent across restarts.
+
+- Writes go through a buffered file and are fsync'ed in groups (at most
+  every fsync_interval seconds), so spooling keeps up with the live rate;
+  callers that go idle call sync_if_due() by sync_wait() so the last group
+  is on disk within fsync_interval even when no further append comes
+- Reads return events strictly in the order they were appended
+- max_bytes caps the disk used; when full either the oldest segments are
+  evicted ("drop_oldest") or new events are refused ("reject")
+- A torn record at the end of the last segment (crash mid-write) is
+  truncated on open
+
+Usage:
+    spool = EventSpool("spool", max_bytes=512 * 1024 * 1024)
+    spool.append(payloads)
+    records = spool.read(500)           # [(payload_bytes, position), ...]
+    spool.commit(records[-1][1])        # after the events were delivered
+
+    python spool.py stats spool
+    python spool.py bench --events 200000
+"""
+
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+
+# Spool Defaults
+# ==============
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024    # Roll to a new segment file after this size
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024      # Disk cap across all segments
+DEFAULT_FSYNC_INTERVAL = 0.5                # Seconds between fsyncs (0 = every append)
+EVICTION_POLICIES = ("drop_oldest", "reject")
+
+RECORD_HEADER = struct.Struct("<II")        # payload length, crc32(payload)
+SEGMENT_SUFFIX = ".seg"
+CURSOR_FILE = "cursor"
+
+def _segment_name(seq):
+    return f"{seq:012d}{SEGMENT_SUFFIX}"
+
+class _Segment:
+    """Bookkeeping for one segment file"""
+
+    def __init__(self, seq, path, size=0, events=0):
+        self.seq = seq
+        self.path = path
+        self.size = size
+        self.events = events
+
+def _scan_segment(path):
+    """(valid bytes, record count) of a segment, stopping at the first bad record"""
+    valid, events = 0, 0
+    with open(path, "rb") as handle:
+        data = handle.read()
+    while valid + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, valid)
+        end = valid + RECORD_HEADER.size + length
+        if end > len(data) or zlib.crc32(data[valid + RECORD_HEADER.size:end]) != crc:
+            break
+        valid, events = end, events + 1
+    return valid, len(data), events
+
+# Event Spool
+# ===========
+
+class EventSpool:
+    """
+    Segment-based durable FIFO of serialized events
+    Thread safe; intended for one writer and one draining reader
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES,
+                 max_bytes=DEFAULT_MAX_BYTES, eviction="drop_oldest",
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"eviction must be one of {EVICTION_POLICIES}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Keep several segments under the cap so eviction frees space in steps
+        self.segment_bytes = max(RECORD_HEADER.size + 1, min(segment_bytes, max_bytes // 4))
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+
+        # Running counters (read via stats())
+        self.events_appended = 0
+        self.events_drained = 0
+        self.events_evicted = 0
+        self.events_rejected = 0
+
+        self._segments = []
+        self._writer = None
+        self._reader = None
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self._open()
+
+    # Recovery
+    # --------
+
+    def _open(self):
+        for path in sorted(self.directory.glob("*" + SEGMENT_SUFFIX)):
+            valid, size, events = _scan_segment(path)
+            if valid < size:
+                # Torn tail from a crash mid-append: drop the partial record
+                with open(path, "r+b") as handle:
+                    handle.truncate(valid)
+            self._segments.append(_Segment(int(path.stem), path, valid, events))
+
+        # Cursor = (segment seq, byte offset, records consumed in that segment)
+        self._read_seq, self._read_offset, self._read_events = 0, 0, 0
+        cursor = self.directory / CURSOR_FILE
+        if cursor.exists():
+            parts = cursor.read_text(encoding="ascii").split()
+            if len(parts) == 3:
+                self._read_seq, self._read_offset, self._read_events = map(int, parts)
+
+        # Segments fully behind the cursor were drained before the restart
+        while self._segments and (self._segments[0].seq < self._read_seq):
+            self._remove(self._segments.pop(0))
+        if not self._segments or self._segments[0].seq != self._read_seq:
+            self._read_offset, self._read_events = 0, 0
+            self._read_seq = self._segments[0].seq if self._segments else 0
+        elif self._read_offset > self._segments[0].size:
+            self._read_offset, self._read_events = self._segments[0].size, self._segments[0].events
+
+        if not self._segments:
+            self._segments.append(_Segment(self._read_seq, self.directory / _segment_name(self._read_seq)))
+        self._writer = open(self._segments[-1].path, "ab")
+
+    # Writer
+    # ------
+
+    def append(self, payloads):
+        """
+        Append serialized events (str or bytes) in order
+        Returns how many were stored ("reject" policy may refuse some)
+        """
+        stored = 0
+        with self._lock:
+            for payload in payloads:
+                if isinstance(payload, str):
+                    payload = payload.encode("utf-8")
+                record_size = RECORD_HEADER.size + len(payload)
+                if not self._make_room(record_size):
+                    self.events_rejected += len(payloads) - stored
+                    break
+                tail = self._segments[-1]
+                if tail.size and tail.size + record_size > self.segment_bytes:
+                    tail = self._roll()
+                self._writer.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+                self._writer.write(payload)
+                tail.size += record_size
+                tail.events += 1
+                stored += 1
+            self.events_appended += stored
+            self._dirty = self._dirty or stored > 0
+            self._maybe_fsync()
+        return stored
+
+    def _roll(self):
+        self._sync()
+        self._writer.close()
+        seq = self._segments[-1].seq + 1
+        segment = _Segment(seq, self.directory / _segment_name(seq))
+        self._segments.append(segment)
+        self._writer = open(segment.path, "ab")
+        return segment
+
+    def _make_room(self, record_size):
+        """Evict or refuse so that record_size more bytes fit under max_bytes"""
+        while self._total_bytes() + record_size > self.max_bytes:
+            if self.eviction == "reject":
+                return False
+            if len(self._segments) == 1:
+                if self._segments[0].size == 0:
+                    return record_size <= self.max_bytes
+                # Only the active segment is left: roll so it can be evicted
+                self._roll()
+            self._evict_oldest()
+        return True
+
+    def _evict_oldest(self):
+        segment = self._segments.pop(0)
+        if segment.seq == self._read_seq:
+            self.events_evicted += segment.events - self._read_events
+            self._close_reader()
+            self._read_seq, self._read_offset, self._read_events = self._segments[0].seq, 0, 0
+            self._write_cursor()
+        else:
+            self.events_evicted += segment.events
+        self._remove(segment)
+
+    def _maybe_fsync(self):
+        if self._dirty and (self.fsync_interval is not None and
+                            time.monotonic() - self._last_fsync >= self.fsync_interval):
+            self._sync()
+
+    def _sync(self):
+        self._writer.flush()
+        if self.fsync_interval is not None:
+            os.fsync(self._writer.fileno())
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    def sync_wait(self):
+        """Seconds until buffered appends are due for sync_if_due(), or None if nothing is buffered"""
+        if not self._dirty or self.fsync_interval is None:
+            return None
+        return max(0.0, self._last_fsync + self.fsync_interval - time.monotonic())
+
+    def sync_if_due(self):
+        """Flush and fsync appends once they have waited fsync_interval"""
+        with self._lock:
+            self._maybe_fsync()
+
+    def flush(self):
+        """Force buffered appends to disk"""
+        with self._lock:
+            self._sync()
+
+    # Reader
+    # ------
+
+    def read(self, max_events=500, max_bytes=None):
+        """
+        Oldest undrained events without removing them
+        Returns [(payload_bytes, position)]; pass a position to commit()
+        """
+        records = []
+        total = 0
+        with self._lock:
+            self._writer.flush()
+            seq, offset, consumed = self._read_seq, self._read_offset, self._read_events
+            for segment in self._segments:
+                if segment.seq < seq:
+                    continue
+                if segment.seq > seq:
+                    offset, consumed = 0, 0
+                handle = self._reader_for(segment, offset)
+                while len(records) < max_events and offset < segment.size:
+                    length, _crc = RECORD_HEADER.unpack(handle.read(RECORD_HEADER.size))
+                    if max_bytes is not None and records and total + length > max_bytes:
+                        return records
+                    payload = handle.read(length)
+                    offset += RECORD_HEADER.size + length
+                    consumed += 1
+                    total += length
+                    records.append((payload, (segment.seq, offset, consumed)))
+                if len(records) >= max_events:
+                    break
+        return records
+
+    def _reader_for(self, segment, offset):
+        if self._reader is None or self._reader.name != str(segment.path):
+            self._close_reader()
+            self._reader = open(segment.path, "rb")
+        self._reader.seek(offset)
+        return self._reader
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def commit(self, position):
+        """Mark every event up to and including position as delivered"""
+        seq, offset, consumed = position
+        with self._lock:
+            if (seq, offset) <= (self._read_seq, self._read_offset):
+                return  # already evicted or committed
+            drained = 0
+            while self._segments[0].seq < seq:
+                segment = self._segments.pop(0)
+                drained += segment.events - (self._read_events if segment.seq == self._read_seq else 0)
+                self._close_reader()
+                self._remove(segment)
+            previous = self._read_events if self._read_seq == seq else 0
+            drained += consumed - previous
+            self._read_seq, self._read_offset, self._read_events = seq, offset, consumed
+            self.events_drained += drained
+            head = self._segments[0]
+            if head.size == offset and len(self._segments) > 1:
+                # Head segment fully drained and no longer written to
+                self._segments.pop(0)
+                self._close_reader()
+                self._remove(head)
+                self._read_seq, self._read_offset, self._read_events = self._segments[0].seq, 0, 0
+            self._write_cursor()
+
+    def _write_cursor(self):
+        tmp = self.directory / (CURSOR_FILE + ".tmp")
+        tmp.write_text(f"{self._read_seq} {self._read_offset} {self._read_events}\n",
+                       encoding="ascii")
+        os.replace(tmp, self.directory / CURSOR_FILE)
+
+    # Housekeeping
+    # ------------
+
+    def _remove(self, segment):
+        try:
+            segment.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _total_bytes(self):
+        return sum(segment.size for segment in self._segments)
+
+    def _pending(self):
+        return sum(segment.events for segment in self._segments) - self._read_events
+
+    @property
+    def pending(self):
+        """Events appended but not yet committed"""
+        with self._lock:
+            return self._pending()
+
+    def __len__(self):
+        return self.pending
+
+    def stats(self):
+        """Snapshot of spool counters"""
+        with self._lock:
+            return {
+                "pending_events": self._pending(),
+                "bytes": self._total_bytes(),
+                "segments": len(self._segments),
+                "events_appended": self.events_appended,
+                "events_drained": self.events_drained,
+                "events_evicted": self.events_evicted,
+                "events_rejected": self.events_rejected,
+            }
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._writer.close()
+            self._close_reader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Command Line
+# ============
+
+def benchmark(n_events=200_000, payload_bytes=350, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+    """Sustained append and drain rates for typical-size JSON events"""
+    payload = b"x" * payload_bytes
+    batch = [payload] * 500
+    with tempfile.TemporaryDirectory() as directory:
+        spool = EventSpool(directory, segment_bytes=16 * 1024 * 1024, fsync_interval=fsync_interval)
+        started = time.perf_counter()
+        for _ in range(n_events // len(batch)):
+            spool.append(batch)
+        spool.flush()
+        append_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        drained = 0
+        while True:
+            records = spool.read(500)
+            if not records:
+                break
+            spool.commit(records[-1][1])
+            drained += len(records)
+        drain_seconds = time.perf_counter() - started
+        spool.close()
+    return {
+        "events": drained,
+        "append_events_per_sec": round(drained / append_seconds),
+        "drain_events_per_sec": round(drained / drain_seconds),
+        "append_mb_per_sec": round(drained * (payload_bytes + RECORD_HEADER.size) / append_seconds / 1e6, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or benchmark an event spool")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stats = sub.add_parser("stats", help="Show pending events in a spool directory")
+    stats.add_argument("directory")
+    bench = sub.add_parser("bench", help="Measure append/drain throughput")
+    bench.add_argument("--events", type=int, default=200_000)
+    bench.add_argument("--payload-bytes", type=int, default=350)
+    bench.add_argument("--fsync-interval", type=float, default=DEFAULT_FSYNC_INTERVAL)
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        with EventSpool(args.directory) as spool:
+            for key, value in spool.stats().items():
+                print(f"{key}: {value}")
+    else:
+        for key, value in benchmark(args.events, args.payload_bytes, args.fsync_interval).items():
+            print(f"{key}: {value}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+COMPACT BINARY WIRE FORMAT
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Optional alternative to one JSON document per event. Events are packed
+into micro-batches of fixed 19-byte records that carry only the numeric
+part of LocationID and small integer codes for the categorical fields;
+LocationName / Latitude / Longitude are restored on decode from the
+location table. Decimal fields keep the precision of the SQL schema
+(DECIMAL(5,2) speeds and congestion, DECIMAL(3,2) rush factor).
+
+Micro-batch layout (little endian):
+    header  : magic b"CTW1" | uint32 record count
+    record  : uint32 epoch seconds | uint32 location number (LOC001 -> 1)
+              uint16 vehicle count | uint16 speed x100 | uint16 congestion x100
+              uint8 vehicle type   | uint8 weather     | uint8 incident
+              uint8 rush factor x100 | uint8 flags (bit 0 = IsRushHour)
+
+Usage:
+    python wire_format.py encode capture.jsonl capture.ctw
+    python wire_format.py decode capture.ctw capture.jsonl
+    python wire_format.py bench --events 200000
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+MAGIC = b"CTW1"
+HEADER = struct.Struct("<4sI")
+
+RECORD_DTYPE = np.dtype([
+    ("epoch", "<u4"),
+    ("location", "<u4"),
+    ("vehicles", "<u2"),
+    ("speed", "<u2"),
+    ("congestion", "<u2"),
+    ("vehicle_type", "u1"),
+    ("weather", "u1"),
+    ("incident", "u1"),
+    ("rush_factor", "u1"),
+    ("flags", "u1"),
+])
+RECORD_SIZE = RECORD_DTYPE.itemsize  # 19 bytes
+
+FLAG_RUSH_HOUR = 1
+
+# Code tables are part of the wire format: only ever append new values
+VEHICLE_TYPE_CODES = [
+    "Car", "Taxi", "Bus", "Microbus",
+    "Truck", "Motorcycle", "Delivery Van"
+]
+WEATHER_CODES = [
+    "Clear", "Cloudy", "Light Rain",
+    "Heavy Rain", "Foggy", "Sandstorm"
+]
+INCIDENT_CODES = [
+    "None", "Minor Accident", "Major Accident",
+    "Vehicle Breakdown", "Road Construction", "Police Checkpoint"
+]
+
+_VEHICLE_TYPE_INDEX = {name: i for i, name in enumerate(VEHICLE_TYPE_CODES)}
+_WEATHER_INDEX = {name: i for i, name in enumerate(WEATHER_CODES)}
+_INCIDENT_INDEX = {name: i for i, name in enumerate(INCIDENT_CODES)}
+
+# Location Table
+# ==============
+
+def location_number(location_id):
+    """'LOC001' -> 1"""
+    if not location_id.startswith("LOC") or not location_id[3:].isdigit():
+        raise ValueError(f"LocationID {location_id!r} is not in LOC<digits> form")
+    return int(location_id[3:])
+
+class LocationTable:
+    """Restores LocationID, name and coordinates from the location number"""
+
+    def __init__(self, locations):
+        self.by_number = {
+            location_number(loc["id"]): loc for loc in locations
+        }
+        self.id_width = max((len(loc["id"]) - 3 for loc in locations), default=3)
+
+    def lookup(self, number):
+        location = self.by_number.get(number)
+        if location is None:
+            # Unknown sensor: keep the ID, leave the static fields empty
+            return {"id": f"LOC{number:0{self.id_width}d}", "name": None, "lat": None, "lon": None}
+        return location
+
+# Encoding
+# ========
+
+def _iso_to_epoch(timestamp):
+    return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+
+def encode_events(events):
+    """Pack a list of traffic event dicts into one micro-batch"""
+    records = np.empty(len(events), dtype=RECORD_DTYPE)
+    for i, event in enumerate(events):
+        records[i] = (
+            _iso_to_epoch(event["Timestamp"]),
+            location_number(event["LocationID"]),
+            event["VehicleCount"],
+            round(event["AverageSpeedKMH"] * 100),
+            round(event["CongestionPercentage"] * 100),
+            _VEHICLE_TYPE_INDEX[event["DominantVehicleType"]],
+            _WEATHER_INDEX[event["WeatherCondition"]],
+            _INCIDENT_INDEX[event["TrafficIncident"]],
+            round(event["RushFactor"] * 100),
+            FLAG_RUSH_HOUR if event["IsRushHour"] else 0,
+        )
+    return HEADER.pack(MAGIC, len(records)) + records.tobytes()
+
+def encode_batch(batch, locations):
+    """
+    Pack a columnar batch from generate_traffic_batch() without building
+    per-event dicts; locations is the list the batch's LocationCode indexes
+    """
+    numbers = np.array([location_number(loc["id"]) for loc in locations], dtype=np.uint32)
+    records = np.empty(len(batch["EpochSeconds"]), dtype=RECORD_DTYPE)
+    records["epoch"] = batch["EpochSeconds"]
+    records["location"] = numbers[batch["LocationCode"]]
+    records["vehicles"] = batch["VehicleCount"]
+    records["speed"] = np.rint(batch["AverageSpeedKMH"] * 100)
+    records["congestion"] = np.rint(batch["CongestionPercentage"] * 100)
+    records["vehicle_type"] = batch["VehicleTypeCode"]
+    records["weather"] = batch["WeatherCode"]
+    records["incident"] = batch["IncidentCode"]
+    records["rush_factor"] = np.rint(batch["RushFactor"] * 100)
+    records["flags"] = np.where(batch["IsRushHour"], FLAG_RUSH_HOUR, 0)
+    return HEADER.pack(MAGIC, len(records)) + records.tobytes()
+
+# Decoding
+# ========
+
+def decode_records(data):
+    """Zero-copy view of a micro-batch as a NumPy structured array"""
+    magic, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a CTW1 micro-batch")
+    expected = HEADER.size + count * RECORD_SIZE
+    if len(data) < expected:
+        raise ValueError(f"Truncated micro-batch: {len(data)} of {expected} bytes")
+    return np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+
+def decode_events(data, location_table):
+    """Expand a micro-batch back into the simulator's JSON event shape"""
+    records = decode_records(data)
+    iso_cache = {}
+    events = []
+    columns = zip(
+        records["epoch"].tolist(), records["location"].tolist(),
+        records["vehicles"].tolist(), (records["speed"] / 100).tolist(),
+        (records["congestion"] / 100).tolist(), records["vehicle_type"].tolist(),
+        records["weather"].tolist(), records["incident"].tolist(),
+        (records["rush_factor"] / 100).tolist(), records["flags"].tolist(),
+    )
+    for epoch, number, vehicles, speed, congestion, vtype, weather, incident, rush, flags in columns:
+        timestamp = iso_cache.get(epoch)
+        if timestamp is None:
+            timestamp = datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec='seconds')
+            iso_cache[epoch] = timestamp
+        location = location_table.lookup(number)
+        events.append({
+            "Timestamp": timestamp,
+            "LocationID": location["id"],
+            "LocationName": location["name"],
+            "Latitude": location["lat"],
+            "Longitude": location["lon"],
+            "VehicleCount": vehicles,
+            "AverageSpeedKMH": speed,
+            "DominantVehicleType": VEHICLE_TYPE_CODES[vtype],
+            "WeatherCondition": WEATHER_CODES[weather],
+            "TrafficIncident": INCIDENT_CODES[incident],
+            "CongestionPercentage": congestion,
+            "IsRushHour": bool(flags & FLAG_RUSH_HOUR),
+            "RushFactor": rush
+        })
+    return events
+
+def iter_micro_batches(data):
+    """Split a byte string of concatenated micro-batches"""
+    offset = 0
+    while offset < len(data):
+        _, count = HEADER.unpack_from(data, offset)
+        end = offset + HEADER.size + count * RECORD_SIZE
+        yield data[offset:end]
+        offset = end
+
+# Benchmark
+# =========
+
+def benchmark(n_events=200_000, seed=7):
+    """Compare bytes/event and encode/decode throughput against JSON"""
+    from python_traffic_simulator import LOCATIONS, generate_traffic_batch, batch_to_events
+
+    batch = generate_traffic_batch(n_events, rng=seed)
+    events = batch_to_events(batch)
+    table = LocationTable(LOCATIONS)
+
+    def timed(fn):
+        started = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - started
+
+    json_payloads, json_encode = timed(lambda: [json.dumps(e) for e in events])
+    _, json_decode = timed(lambda: [json.loads(p) for p in json_payloads])
+    json_bytes = sum(len(p.encode("utf-8")) for p in json_payloads)
+
+    packed, dict_encode = timed(lambda: encode_events(events))
+    _, dict_decode = timed(lambda: decode_events(packed, table))
+    packed_columns, column_encode = timed(lambda: encode_batch(batch, LOCATIONS))
+    _, column_decode = timed(lambda: decode_records(packed_columns))
+
+    def rate(seconds):
+        return round(n_events / seconds) if seconds > 0 else float("inf")
+
+    return {
+        "events": n_events,
+        "json": {
+            "bytes_per_event": round(json_bytes / n_events, 1),
+            "encode_events_per_sec": rate(json_encode),
+            "decode_events_per_sec": rate(json_decode),
+        },
+        "binary_from_dicts": {
+            "bytes_per_event": round(len(packed) / n_events, 2),
+            "encode_events_per_sec": rate(dict_encode),
+            "decode_events_per_sec": rate(dict_decode),
+        },
+        "binary_columnar": {
+            "bytes_per_event": round(len(packed_columns) / n_events, 2),
+            "encode_events_per_sec": rate(column_encode),
+            "decode_events_per_sec": rate(column_decode),
+        },
+    }
+
+# Command Line
+# ============
+
+def _default_location_table():
+    from city_scale import load_locations_sql
+    return LocationTable(load_locations_sql())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CTW1 compact traffic wire format")
+    commands = parser.add_subparsers(dest="command", required=True)
+    encode = commands.add_parser("encode", help="JSONL capture -> CTW1 micro-batches")
+    encode.add_argument("source")
+    encode.add_argument("target")
+    encode.add_argument("--batch-size", type=int, default=1000)
+    decode = commands.add_parser("decode", help="CTW1 micro-batches -> JSONL (current JSON shape)")
+    decode.add_argument("source")
+    decode.add_argument("target")
+    bench = commands.add_parser("bench", help="Compare against per-event JSON")
+    bench.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    if args.command == "encode":
+        from replay import read_jsonl_chunks
+        with open(args.target, "wb") as out:
+            for chunk in read_jsonl_chunks(args.source, args.batch_size):
+                out.write(encode_events(chunk))
+    elif args.command == "decode":
+        table = _default_location_table()
+        with open(args.source, "rb") as source:
+            data = source.read()
+        with open(args.target, "w", encoding="utf-8") as out:
+            for micro_batch in iter_micro_batches(data):
+                for event in decode_events(micro_batch, table):
+                    out.write(json.dumps(event))
+                    out.write("\n")
+    else:
+        print(json.dumps(benchmark(args.events), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
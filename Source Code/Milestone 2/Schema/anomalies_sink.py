@@ -0,0 +1,347 @@
+"""
+ANOMALIES BULK LOADER
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Writes anomaly rows (dbo.Anomalies shape, as produced by the local
+anomaly engine or a replay) in large idempotent batches instead of one
+INSERT per row:
+
+- SQLite (local testing): executemany of INSERT ... ON CONFLICT(EventID)
+  DO UPDATE inside one transaction per batch
+- Azure SQL / SQL Server (pyodbc): fast_executemany into a #staging temp
+  table, then a single MERGE on EventID
+
+Re-running a load with the same rows updates them in place, so backfills
+can be restarted safely. Duplicate EventIDs inside one batch keep the
+last row. Connections come from a small pool and are reused across
+batches.
+
+The cloud query builds EventID from the time of day only
+(EVT_<LocationID>_<hhmmss>); pass dated_event_ids=True to use
+EVT_<LocationID>_<yyyymmddhhmmss> so multi-day backfills do not
+overwrite each other. The command line uses dated EventIDs by default,
+like replay.py; pass --no-dated-ids to match the cloud query.
+
+The pool is safe to share between threads: each connection is handed
+to one caller at a time.
+
+Usage:
+    python anomalies_sink.py anomalies.csv --sqlite anomalies.db
+    python anomalies_sink.py capture.jsonl --sqlite anomalies.db --no-dated-ids
+    python anomalies_sink.py anomalies.csv --odbc "Driver={ODBC Driver 18 for SQL Server};..."
+"""
+
+import argparse
+import csv
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+ANOMALY_COLUMNS = [
+    "EventID", "LocationID", "LocationName", "Latitude", "Longitude",
+    "AnomalyType", "Severity", "Value", "Incident",
+    "AvgSpeed", "MaxSpeed", "MinSpeed", "MaxCongestion", "DetectedAt",
+]
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_POOL_SIZE = 2
+
+# SQLite stand-in for dbo.Anomalies (same columns, key and indexes)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Anomalies (
+    EventID       TEXT PRIMARY KEY,
+    LocationID    TEXT NOT NULL,
+    LocationName  TEXT NOT NULL,
+    Latitude      REAL NOT NULL,
+    Longitude     REAL NOT NULL,
+    AnomalyType   TEXT NOT NULL,
+    Severity      TEXT NOT NULL,
+    Value         REAL,
+    Incident      TEXT,
+    AvgSpeed      REAL NOT NULL,
+    MaxSpeed      REAL NOT NULL,
+    MinSpeed      REAL NOT NULL,
+    MaxCongestion REAL NOT NULL,
+    DetectedAt    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS IX_Anomalies_DetectedAt ON Anomalies (DetectedAt DESC);
+CREATE INDEX IF NOT EXISTS IX_Anomalies_Severity ON Anomalies (Severity);
+"""
+
+# Connection Pool
+# ===============
+
+class ConnectionPool:
+    """Fixed-size pool; connections are created lazily and reused"""
+
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._all = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self.factory()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                with self._lock:
+                    self._all.append(conn)
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._created = 0
+            self._idle = queue.LifoQueue()
+
+def sqlite_pool(path, size=1):
+    """Pool of SQLite connections with the Anomalies table created"""
+    def connect():
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SQLITE_SCHEMA)
+        return conn
+    return ConnectionPool(connect, size)
+
+def odbc_pool(connection_string, size=DEFAULT_POOL_SIZE):
+    """Pool of pyodbc connections to Azure SQL / SQL Server"""
+    try:
+        import pyodbc
+    except ImportError as missing:
+        raise ImportError("SQL Server loading requires pyodbc (pip install pyodbc)") from missing
+    return ConnectionPool(lambda: pyodbc.connect(connection_string, autocommit=False), size)
+
+# Upsert Dialects
+# ===============
+
+_COLUMN_LIST = ", ".join(ANOMALY_COLUMNS)
+_PLACEHOLDERS = ", ".join("?" for _ in ANOMALY_COLUMNS)
+
+SQLITE_UPSERT = (
+    f"INSERT INTO Anomalies ({_COLUMN_LIST}) VALUES ({_PLACEHOLDERS}) "
+    "ON CONFLICT(EventID) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in ANOMALY_COLUMNS[1:])
+)
+
+SQLSERVER_STAGING = (
+    "IF OBJECT_ID('tempdb..#AnomaliesStaging') IS NULL "
+    "SELECT TOP 0 * INTO #AnomaliesStaging FROM dbo.Anomalies"
+)
+SQLSERVER_STAGE = f"INSERT INTO #AnomaliesStaging ({_COLUMN_LIST}) VALUES ({_PLACEHOLDERS})"
+SQLSERVER_MERGE = (
+    "MERGE dbo.Anomalies WITH (HOLDLOCK) AS target "
+    "USING #AnomaliesStaging AS source ON target.EventID = source.EventID "
+    "WHEN MATCHED THEN UPDATE SET "
+    + ", ".join(f"{c} = source.{c}" for c in ANOMALY_COLUMNS[1:])
+    + f" WHEN NOT MATCHED THEN INSERT ({_COLUMN_LIST}) VALUES ("
+    + ", ".join(f"source.{c}" for c in ANOMALY_COLUMNS) + ");"
+    " TRUNCATE TABLE #AnomaliesStaging;"
+)
+
+def _upsert_sqlite(conn, params):
+    with conn:  # one transaction per batch
+        conn.executemany(SQLITE_UPSERT, params)
+
+def _upsert_sqlserver(conn, params):
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    try:
+        cursor.execute(SQLSERVER_STAGING)
+        cursor.executemany(SQLSERVER_STAGE, params)
+        cursor.execute(SQLSERVER_MERGE)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+DIALECTS = {"sqlite": _upsert_sqlite, "sqlserver": _upsert_sqlserver}
+
+# Row Conversion
+# ==============
+
+def dated_event_id(row):
+    """EVT_<LocationID>_<yyyymmddhhmmss> (the dbo.Anomalies column comment format)"""
+    return f"EVT_{row['LocationID']}_{_as_datetime(row['DetectedAt']):%Y%m%d%H%M%S}"
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+def _optional_float(value):
+    return None if value is None or value == "" else float(value)
+
+# Sink
+# ====
+
+class AnomaliesSink:
+    """
+    Buffer anomaly rows and upsert them in batches of batch_size
+    Call it with a list of rows (replay / engine on_rows hook), then close()
+    """
+
+    def __init__(self, pool, dialect="sqlite", batch_size=DEFAULT_BATCH_SIZE,
+                 dated_event_ids=False):
+        if dialect not in DIALECTS:
+            raise ValueError(f"Unknown dialect {dialect!r} (expected one of {sorted(DIALECTS)})")
+        self.pool = pool
+        self.dialect = dialect
+        self.batch_size = batch_size
+        self.dated_event_ids = dated_event_ids
+        self._pending = {}  # EventID -> parameter tuple (last row wins)
+        self.rows_received = 0
+        self.rows_written = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+
+    def __call__(self, rows):
+        self.write(rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _params(self, row):
+        detected_at = _as_datetime(row["DetectedAt"])
+        event_id = dated_event_id(row) if self.dated_event_ids else row["EventID"]
+        return (
+            event_id, row["LocationID"], row["LocationName"],
+            float(row["Latitude"]), float(row["Longitude"]),
+            row["AnomalyType"], row["Severity"], _optional_float(row["Value"]),
+            row["Incident"] or None,
+            float(row["AvgSpeed"]), float(row["MaxSpeed"]), float(row["MinSpeed"]),
+            float(row["MaxCongestion"]),
+            # DATETIME2 for SQL Server, sortable ISO text for SQLite
+            detected_at if self.dialect == "sqlserver" else detected_at.isoformat(sep=" "),
+        )
+
+    def write(self, rows):
+        for row in rows:
+            params = self._params(row)
+            if params[0] in self._pending:
+                self.duplicates += 1
+            self._pending[params[0]] = params
+            self.rows_received += 1
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return 0
+        params = list(self._pending.values())
+        started = time.perf_counter()
+        with self.pool.connection() as conn:
+            DIALECTS[self.dialect](conn, params)
+        self.write_seconds += time.perf_counter() - started
+        self._pending.clear()
+        self.rows_written += len(params)
+        self.batches += 1
+        return len(params)
+
+    def close(self):
+        self.flush()
+
+    def stats(self):
+        return {
+            "rows_received": self.rows_received,
+            "rows_written": self.rows_written,
+            "duplicates_in_batch": self.duplicates,
+            "batches": self.batches,
+            "write_seconds": round(self.write_seconds, 3),
+        }
+
+# Command Line
+# ============
+
+def read_anomaly_csv(path):
+    """Rows from an anomaly_engine.write_csv export (or a cloud CSV export)"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        yield from csv.DictReader(handle)
+
+def _engine_rows(capture, chunk_size):
+    """Run a JSONL/Parquet capture through the local anomaly engine"""
+    milestones = Path(__file__).resolve().parent.parent.parent
+    sys.path.insert(0, str(milestones / "Milestone 1"))
+    sys.path.insert(0, str(milestones / "Milestone 2" / "Stream Analytics"))
+    from anomaly_engine import TumblingAnomalyEngine
+    from replay import read_event_chunks
+
+    engine = TumblingAnomalyEngine()
+    for chunk in read_event_chunks(capture, chunk_size):
+        yield from engine.process_many(chunk)
+    yield from engine.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk upsert anomaly rows into dbo.Anomalies")
+    parser.add_argument("source", help="Anomaly CSV, or a JSONL/Parquet event capture to detect on")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--sqlite", help="SQLite database file (created if missing)")
+    target.add_argument("--odbc", help="pyodbc connection string for Azure SQL")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dated-ids", action=argparse.BooleanOptionalAction, default=True,
+                        help="Use EVT_<LocationID>_<yyyymmddhhmmss> EventIDs so multi-day "
+                             "backfills do not overwrite each other (default: on)")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        pool, dialect = sqlite_pool(args.sqlite), "sqlite"
+    else:
+        pool, dialect = odbc_pool(args.odbc), "sqlserver"
+
+    if Path(args.source).suffix.lower() == ".csv":
+        rows = read_anomaly_csv(args.source)
+    else:
+        rows = _engine_rows(args.source, chunk_size=10_000)
+
+    started = time.perf_counter()
+    with AnomaliesSink(pool, dialect, args.batch_size, args.dated_ids) as sink:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= args.batch_size:
+                sink(batch)
+                batch = []
+        sink(batch)
+    pool.close()
+
+    stats = sink.stats()
+    elapsed = time.perf_counter() - started
+    print(f"Upserted {stats['rows_written']} rows in {stats['batches']} batches "
+          f"({elapsed:.2f} s total, {stats['write_seconds']} s in the database)")
+    if stats["duplicates_in_batch"]:
+        print(f"Duplicate EventIDs collapsed within batches: {stats['duplicates_in_batch']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
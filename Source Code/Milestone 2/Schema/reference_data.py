@@ -0,0 +1,237 @@
+"""
+REFERENCE DATA CACHE
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Loads the static reference tables once and serves them as integer-indexed
+NumPy arrays so generators and detectors can join whole batches with a
+single fancy-indexing step:
+
+- dbo.WeatherReference  -> weather_factor[weather_code]
+- dbo.IncidentReference -> incident_factor[incident_code]
+- dbo.Locations         -> capacity(locations) (MaxCapacity per location)
+
+Tables come from the SQL seed files next to this module or from a local
+SQLite stand-in with the same table and column names (see write_sqlite).
+Loaded tables are kept for ttl_seconds; the next access after that
+reloads them, and a failed reload keeps serving the previous copy.
+
+Usage:
+    python reference_data.py                   # print the loaded tables
+    python reference_data.py --sqlite ref.db   # build the SQLite stand-in
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCHEMA_DIR = Path(__file__).resolve().parent
+DEFAULT_TTL_SECONDS = 300
+NEUTRAL_FACTOR = 1.0  # Conditions missing from the tables do not change speed
+
+# Seed File Parsing
+# =================
+
+# One VALUES tuple: ('Clear', 1.000) or ('LOC001', 'Tahrir Square', 30.0444, 31.2357, 120)
+_VALUES_ROW = re.compile(r"\(((?:\s*(?:'[^']*'|[-\d.]+)\s*,?)+)\)")
+_VALUE = re.compile(r"'([^']*)'|([-\d.]+)")
+
+def parse_insert_rows(sql_text):
+    """Rows of every INSERT ... VALUES statement as tuples of str/float"""
+    rows = []
+    for statement in re.split(r"INSERT\s+INTO", sql_text, flags=re.IGNORECASE)[1:]:
+        values = statement.split("VALUES", 1)[-1].split(";")[0].split("\nGO")[0]
+        for match in _VALUES_ROW.finditer(values):
+            rows.append(tuple(
+                text if number == "" else float(number)
+                for text, number in _VALUE.findall(match.group(1))
+            ))
+    return rows
+
+def load_seed_tables(schema_dir=SCHEMA_DIR):
+    """Reference tables from WeatherReference.sql, IncidentReference.sql and Locations.sql"""
+    schema_dir = Path(schema_dir)
+
+    def rows(name):
+        return parse_insert_rows((schema_dir / name).read_text(encoding="utf-8"))
+
+    return {
+        "weather": {name: factor for name, factor in rows("WeatherReference.sql")},
+        "incidents": {name: factor for name, factor in rows("IncidentReference.sql")},
+        "capacity": {row[0]: int(row[4]) for row in rows("Locations.sql")},
+    }
+
+def load_sqlite_tables(path):
+    """Same tables from a SQLite database (WeatherReference, IncidentReference, Locations)"""
+    with sqlite3.connect(path) as connection:
+        return {
+            "weather": dict(connection.execute(
+                "SELECT WeatherCondition, SpeedImpactFactor FROM WeatherReference")),
+            "incidents": dict(connection.execute(
+                "SELECT IncidentType, SpeedImpactFactor FROM IncidentReference")),
+            "capacity": dict(connection.execute(
+                "SELECT LocationID, MaxCapacity FROM Locations")),
+        }
+
+def write_sqlite(path, schema_dir=SCHEMA_DIR):
+    """Create a SQLite stand-in for the reference tables from the seed files"""
+    schema_dir = Path(schema_dir)
+    locations = parse_insert_rows((schema_dir / "Locations.sql").read_text(encoding="utf-8"))
+    tables = load_seed_tables(schema_dir)
+    with sqlite3.connect(path) as connection:
+        connection.executescript("""
+            DROP TABLE IF EXISTS WeatherReference;
+            DROP TABLE IF EXISTS IncidentReference;
+            DROP TABLE IF EXISTS Locations;
+            CREATE TABLE WeatherReference (
+                WeatherCondition TEXT PRIMARY KEY, SpeedImpactFactor REAL NOT NULL);
+            CREATE TABLE IncidentReference (
+                IncidentType TEXT PRIMARY KEY, SpeedImpactFactor REAL NOT NULL);
+            CREATE TABLE Locations (
+                LocationID TEXT PRIMARY KEY, LocationName TEXT NOT NULL,
+                Latitude REAL NOT NULL, Longitude REAL NOT NULL, MaxCapacity INTEGER NOT NULL);
+        """)
+        connection.executemany("INSERT INTO WeatherReference VALUES (?, ?)",
+                               tables["weather"].items())
+        connection.executemany("INSERT INTO IncidentReference VALUES (?, ?)",
+                               tables["incidents"].items())
+        connection.executemany("INSERT INTO Locations VALUES (?, ?, ?, ?, ?)",
+                               [(r[0], r[1], r[2], r[3], int(r[4])) for r in locations])
+
+# Lookup Cache
+# ============
+
+class ReferenceData:
+    """
+    Integer-indexed reference lookups with a reload-after-TTL policy
+    weather_codes / incident_codes fix the code order (e.g. the simulator's
+    WEATHER_CONDITIONS list); by default the table's own row order is used
+    version increases on every successful reload
+    """
+
+    def __init__(self, weather_codes=None, incident_codes=None, schema_dir=SCHEMA_DIR,
+                 sqlite_path=None, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.schema_dir = schema_dir
+        self.sqlite_path = sqlite_path
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.version = 0
+        self.last_error = None
+        self._weather_codes = list(weather_codes) if weather_codes is not None else None
+        self._incident_codes = list(incident_codes) if incident_codes is not None else None
+        self._lock = threading.Lock()
+        self._capacity_memo = {}
+        self._loaded_at = None
+        self.refresh()
+
+    # ---- loading ----
+    def _load_tables(self):
+        if self.sqlite_path is not None:
+            return load_sqlite_tables(self.sqlite_path)
+        return load_seed_tables(self.schema_dir)
+
+    def refresh(self):
+        """Reload now; keeps the previous tables if the source cannot be read or parsed"""
+        with self._lock:
+            try:
+                tables = self._load_tables()
+                weather_codes = self._weather_codes or list(tables["weather"])
+                incident_codes = self._incident_codes or list(tables["incidents"])
+                weather_factor = np.array(
+                    [float(tables["weather"].get(name, NEUTRAL_FACTOR)) for name in weather_codes])
+                incident_factor = np.array(
+                    [float(tables["incidents"].get(name, NEUTRAL_FACTOR)) for name in incident_codes])
+                capacity = tables["capacity"]
+            except (OSError, sqlite3.Error, ValueError, KeyError, TypeError) as load_error:
+                if self._loaded_at is None:
+                    raise
+                self.last_error = load_error
+                self._loaded_at = self.clock()  # retry after another TTL
+                return False
+
+            self.weather_codes, self.incident_codes = weather_codes, incident_codes
+            self.weather_factor, self.incident_factor = weather_factor, incident_factor
+            self._weather_index = {name: i for i, name in enumerate(self.weather_codes)}
+            self._incident_index = {name: i for i, name in enumerate(self.incident_codes)}
+            self._capacity = capacity
+            self._capacity_memo.clear()
+            self.last_error = None
+            self._loaded_at = self.clock()
+            self.version += 1
+            return True
+
+    def _check_ttl(self):
+        if self.ttl_seconds is not None and self.clock() - self._loaded_at >= self.ttl_seconds:
+            self.refresh()
+
+    # ---- lookups ----
+    def impact(self, weather_code, incident_code):
+        """Combined speed multiplier for integer code arrays (or scalars)"""
+        self._check_ttl()
+        return self.weather_factor[weather_code] * self.incident_factor[incident_code]
+
+    def impact_for_names(self, weather_names, incident_names):
+        """
+        Combined speed multiplier for arrays of condition names
+        Each distinct name is resolved once; unknown names map to 1.0
+        """
+        self._check_ttl()
+        weather = self._factors_for_names(weather_names, self._weather_index, self.weather_factor)
+        incident = self._factors_for_names(incident_names, self._incident_index, self.incident_factor)
+        return weather * incident
+
+    @staticmethod
+    def _factors_for_names(names, index, factors):
+        unique, inverse = np.unique(np.asarray(names, dtype=object).astype(str), return_inverse=True)
+        lookup = np.array([factors[index[name]] if name in index else NEUTRAL_FACTOR
+                           for name in unique.tolist()])
+        return lookup[inverse.ravel()]
+
+    def capacity(self, locations):
+        """
+        MaxCapacity per entry of a locations list (dicts with "id" / "cap")
+        Locations missing from dbo.Locations keep their own "cap" value
+        The array is memoized per list object until the next reload
+        """
+        self._check_ttl()
+        memo = self._capacity_memo.get(id(locations))
+        if memo is not None and memo[0] is locations and memo[1] == len(locations):
+            return memo[2]
+        values = np.array([self._capacity.get(loc["id"], loc.get("cap")) for loc in locations])
+        self._capacity_memo[id(locations)] = (locations, len(locations), values)
+        return values
+
+    def summary(self):
+        return {
+            "version": self.version,
+            "source": str(self.sqlite_path or self.schema_dir),
+            "weather": dict(zip(self.weather_codes, self.weather_factor.tolist())),
+            "incidents": dict(zip(self.incident_codes, self.incident_factor.tolist())),
+            "capacity": dict(self._capacity),
+        }
+
+# Command Line
+# ============
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Traffic reference data tables")
+    parser.add_argument("--sqlite", help="Write the SQLite stand-in to this path")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        write_sqlite(args.sqlite)
+        print(f"Reference tables written to {args.sqlite}")
+        reference = ReferenceData(sqlite_path=args.sqlite)
+    else:
+        reference = ReferenceData()
+    for table, values in reference.summary().items():
+        print(f"{table}: {values}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""
+LOCAL ANOMALY ENGINE
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Python replica of Anomally_Detector.sql for offline replay. Runs the same
+5-minute tumbling window aggregation per location and the same CASE
+classification, emitting rows shaped like dbo.Anomalies so local results
+can be diffed against the Stream Analytics output.
+
+Each event costs O(1): it updates the running aggregate of its location's
+open window. Windows close when a later event for the location arrives or
+when the stream's watermark (latest event time minus the out-of-order
+tolerance) passes the window end.
+
+Optionally the engine joins dbo.WeatherReference / dbo.IncidentReference
+(Milestone 2/Schema/reference_data.py): speeds are divided by the combined
+SpeedImpactFactor before classification, so a slow window in a sandstorm
+is judged against what the weather allows. Reported AvgSpeed / MaxSpeed /
+MinSpeed stay the observed values; Value carries the adjusted speed.
+Without reference data the output matches the cloud query exactly.
+
+Usage:
+    python anomaly_engine.py events.jsonl --out anomalies.csv
+    python anomaly_engine.py events.jsonl --compare cloud_anomalies.csv
+    python anomaly_engine.py events.jsonl --reference --out adjusted.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Query Constants (mirroring Anomally_Detector.sql)
+# =================================================
+
+WINDOW_SECONDS = 300  # TumblingWindow(minute, 5)
+CRITICAL_INCIDENTS = ("Major Accident", "Road Closure")
+
+SCHEMA_DIR = Path(__file__).resolve().parent.parent / "Schema"
+CHUNK_EVENTS = 5000   # process_many() reads and scores events in blocks of this size
+
+ANOMALY_COLUMNS = [
+    "EventID", "LocationID", "LocationName", "Latitude", "Longitude",
+    "AnomalyType", "Severity", "Value", "Incident",
+    "AvgSpeed", "MaxSpeed", "MinSpeed", "MaxCongestion", "DetectedAt",
+]
+
+# Classification
+# ==============
+
+def classify_window(avg_speed, max_speed, min_speed, max_congestion, incident):
+    """
+    Apply the AnomalyType / Severity / Value CASE expressions
+    Returns (anomaly_type, severity, value)
+    """
+    speed_range = max_speed - min_speed
+
+    if incident in CRITICAL_INCIDENTS:
+        anomaly_type = "critical_incident"
+    elif avg_speed < 15:
+        anomaly_type = "severe_congestion"
+    elif max_congestion > 100:
+        anomaly_type = "high_congestion"
+    elif max_speed > 90:
+        anomaly_type = "high_speed"
+    elif speed_range > 30:
+        anomaly_type = "volatile_traffic"
+    elif incident != "None":
+        anomaly_type = "minor_incident"
+    else:
+        anomaly_type = "normal"
+
+    if incident in CRITICAL_INCIDENTS:
+        severity = "critical"
+    elif avg_speed < 15 or max_congestion > 100:
+        severity = "high"
+    elif max_speed > 90 or speed_range > 30:
+        severity = "medium"
+    elif incident != "None":
+        severity = "low"
+    else:
+        severity = "normal"
+
+    if incident in CRITICAL_INCIDENTS:
+        value = 100.0
+    elif avg_speed < 15:
+        value = avg_speed
+    elif max_congestion > 100:
+        value = max_congestion
+    elif max_speed > 90:
+        value = max_speed
+    elif speed_range > 30:
+        value = speed_range
+    else:
+        value = None
+
+    return anomaly_type, severity, value
+
+def make_event_id(location_id, detected_at):
+    """EVT_<LocationID>_<hhmmss> built from the window end time"""
+    return f"EVT_{location_id}_{detected_at:%H%M%S}"
+
+def parse_timestamp(value):
+    """Event Timestamp (ISO 8601) to UTC epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+# Streaming Engine
+# ================
+
+class _WindowState:
+    """Running aggregate of one location's open tumbling window"""
+
+    __slots__ = ("window_end", "count", "speed_sum", "max_speed", "min_speed",
+                 "max_congestion", "max_incident",
+                 "adjusted_sum", "adjusted_max", "adjusted_min")
+
+    def __init__(self, window_end, speed, congestion, incident, adjusted):
+        self.window_end = window_end
+        self.count = 1
+        self.speed_sum = speed
+        self.max_speed = speed
+        self.min_speed = speed
+        self.max_congestion = congestion
+        self.max_incident = incident
+        # Speed divided by its weather/incident impact factor (== speed without reference data)
+        self.adjusted_sum = adjusted
+        self.adjusted_max = adjusted
+        self.adjusted_min = adjusted
+
+    def add(self, speed, congestion, incident, adjusted):
+        self.count += 1
+        self.speed_sum += speed
+        if speed > self.max_speed:
+            self.max_speed = speed
+        if speed < self.min_speed:
+            self.min_speed = speed
+        self.adjusted_sum += adjusted
+        if adjusted > self.adjusted_max:
+            self.adjusted_max = adjusted
+        if adjusted < self.adjusted_min:
+            self.adjusted_min = adjusted
+        if congestion > self.max_congestion:
+            self.max_congestion = congestion
+        # MAX() over NVARCHAR compares strings, exactly like the SQL
+        if incident > self.max_incident:
+            self.max_incident = incident
+
+class TumblingAnomalyEngine:
+    """
+    Incremental tumbling-window anomaly detector
+    process(event) returns the anomaly rows of any windows it closed
+    Call flush() at end of stream to close the remaining windows
+    Pass a ReferenceData as reference to classify impact-adjusted speeds
+    """
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, out_of_order_seconds=0,
+                 emit_normal=False, reference=None):
+        self.window_seconds = window_seconds
+        self.out_of_order_seconds = out_of_order_seconds
+        self.emit_normal = emit_normal
+        self.reference = reference
+        # Group key (LocationID, LocationName, Latitude, Longitude) -> _WindowState
+        self._open = {}
+        # Window end -> group keys with an open window ending then
+        self._by_end = {}
+        # Group key -> end of the last window already emitted
+        self._closed_end = {}
+        self.watermark = float("-inf")
+        self.events_processed = 0
+        self.events_late = 0
+
+    def _impacts(self, events):
+        """Combined SpeedImpactFactor per event, resolved in one vectorized join"""
+        return self.reference.impact_for_names(
+            [event.get("WeatherCondition", "") for event in events],
+            [event.get("TrafficIncident", "") for event in events],
+        ).tolist()
+
+    def process(self, event):
+        """Add one traffic event; returns rows for windows that closed"""
+        impact = 1.0 if self.reference is None else self._impacts([event])[0]
+        return self._process(event, impact)
+
+    def _process(self, event, impact):
+        ts = parse_timestamp(event["Timestamp"])
+        key = (event["LocationID"], event["LocationName"],
+               float(event["Latitude"]), float(event["Longitude"]))
+        # TumblingWindow intervals are (end - size, end]: an event stamped on a
+        # boundary (12:05:00) belongs to the window that ends there
+        window_end = math.ceil(ts / self.window_seconds) * self.window_seconds
+
+        # Windows already emitted (or superseded) for this group cannot be reopened
+        state = self._open.get(key)
+        if (window_end <= self._closed_end.get(key, float("-inf"))
+                or (state is not None and window_end < state.window_end)):
+            self.events_late += 1
+            return []
+        self.events_processed += 1
+
+        rows = []
+        speed = float(event["AverageSpeedKMH"])
+        congestion = float(event["CongestionPercentage"])
+        incident = event["TrafficIncident"]
+        adjusted = speed / impact if impact > 0 else speed
+
+        if state is not None and state.window_end < window_end:
+            rows.extend(self._close(key))
+            state = None
+        if state is None:
+            self._open[key] = _WindowState(window_end, speed, congestion, incident, adjusted)
+            self._by_end.setdefault(window_end, set()).add(key)
+        else:
+            state.add(speed, congestion, incident, adjusted)
+
+        # Advance the watermark and close every window that ended before it
+        # (a window ending exactly at the watermark can still receive events)
+        watermark = ts - self.out_of_order_seconds
+        if watermark > self.watermark:
+            self.watermark = watermark
+            for end in sorted(end for end in self._by_end if end < watermark):
+                for group in list(self._by_end.get(end, ())):
+                    rows.extend(self._close(group))
+        return rows
+
+    def process_many(self, events):
+        """Process any iterable in bounded chunks (impacts are looked up per chunk)"""
+        rows = []
+        for chunk in iter_chunks(events):
+            impacts = [1.0] * len(chunk) if self.reference is None else self._impacts(chunk)
+            for event, impact in zip(chunk, impacts):
+                rows.extend(self._process(event, impact))
+        return rows
+
+    def flush(self):
+        """Close all open windows (end of stream)"""
+        rows = []
+        for end in sorted(self._by_end):
+            for group in list(self._by_end.get(end, ())):
+                rows.extend(self._close(group))
+        return rows
+
+    def _close(self, key):
+        state = self._open.pop(key)
+        groups = self._by_end[state.window_end]
+        groups.discard(key)
+        if not groups:
+            del self._by_end[state.window_end]
+        self._closed_end[key] = state.window_end
+
+        location_id, location_name, latitude, longitude = key
+        avg_speed = state.speed_sum / state.count
+        anomaly_type, severity, value = classify_window(
+            state.adjusted_sum / state.count, state.adjusted_max, state.adjusted_min,
+            state.max_congestion, state.max_incident
+        )
+        if anomaly_type == "normal" and not self.emit_normal:
+            return []
+
+        # DATETIME2 has no offset; store the UTC window end as naive time
+        detected_at = datetime.fromtimestamp(state.window_end, timezone.utc).replace(tzinfo=None)
+        return [{
+            "EventID": make_event_id(location_id, detected_at),
+            "LocationID": location_id,
+            "LocationName": location_name,
+            "Latitude": latitude,
+            "Longitude": longitude,
+            "AnomalyType": anomaly_type,
+            "Severity": severity,
+            "Value": value,
+            "Incident": state.max_incident,
+            "AvgSpeed": avg_speed,
+            "MaxSpeed": state.max_speed,
+            "MinSpeed": state.min_speed,
+            "MaxCongestion": state.max_congestion,
+            "DetectedAt": detected_at,
+        }]
+
+def load_reference_data(sqlite_path=None):
+    """ReferenceData from the Milestone 2 schema seeds (or a SQLite stand-in)"""
+    if str(SCHEMA_DIR) not in sys.path:
+        sys.path.insert(0, str(SCHEMA_DIR))
+    from reference_data import ReferenceData
+    return ReferenceData(sqlite_path=sqlite_path)
+
+def replay_events(events, **engine_options):
+    """Run a finite event stream through the engine and return all rows"""
+    engine = TumblingAnomalyEngine(**engine_options)
+    rows = engine.process_many(events)
+    rows.extend(engine.flush())
+    return rows
+
+# File Helpers
+# ============
+
+def iter_chunks(events, size=CHUNK_EVENTS):
+    """Lists of at most `size` events, without materializing the whole iterable"""
+    events = iter(events)
+    while True:
+        chunk = list(itertools.islice(events, size))
+        if not chunk:
+            return
+        yield chunk
+
+def read_jsonl(path):
+    """Yield traffic events from a JSON-lines capture"""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def write_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=ANOMALY_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({
+                **row, "DetectedAt": row["DetectedAt"].isoformat(sep=" ")
+            })
+
+def compare_with_cloud(rows, cloud_csv_path, tolerance=1e-6):
+    """
+    Diff local rows against a CSV export of the cloud dbo.Anomalies table
+    Rows are matched on (EventID, DetectedAt date) since EventID only
+    carries the time of day
+    """
+    def key(event_id, detected_at):
+        return event_id, str(detected_at)[:10]
+
+    local = {key(r["EventID"], r["DetectedAt"]): r for r in rows}
+    with open(cloud_csv_path, newline="", encoding="utf-8") as handle:
+        cloud = {key(r["EventID"], r["DetectedAt"]): r for r in csv.DictReader(handle)}
+
+    mismatched = []
+    for k in local.keys() & cloud.keys():
+        ours, theirs = local[k], cloud[k]
+        if ours["AnomalyType"] != theirs["AnomalyType"] or ours["Severity"] != theirs["Severity"]:
+            mismatched.append(k)
+            continue
+        for column in ("AvgSpeed", "MaxSpeed", "MinSpeed", "MaxCongestion"):
+            if abs(float(ours[column]) - float(theirs[column])) > tolerance:
+                mismatched.append(k)
+                break
+
+    return {
+        "matched": len(local.keys() & cloud.keys()) - len(mismatched),
+        "mismatched": sorted(mismatched),
+        "missing_locally": sorted(cloud.keys() - local.keys()),
+        "extra_locally": sorted(local.keys() - cloud.keys()),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay traffic events through "
+                                                 "the local anomaly query")
+    parser.add_argument("events", help="JSON-lines file of traffic events")
+    parser.add_argument("--out", help="Write anomaly rows to this CSV file")
+    parser.add_argument("--compare", help="Cloud dbo.Anomalies CSV export to diff against")
+    parser.add_argument("--out-of-order", type=float, default=0,
+                        help="Out-of-order tolerance in seconds")
+    parser.add_argument("--reference", action="store_true",
+                        help="Classify speeds adjusted by weather/incident SpeedImpactFactor")
+    parser.add_argument("--reference-sqlite",
+                        help="Read the reference tables from this SQLite file (implies --reference)")
+    args = parser.parse_args(argv)
+
+    reference = None
+    if args.reference or args.reference_sqlite:
+        reference = load_reference_data(args.reference_sqlite)
+    engine = TumblingAnomalyEngine(out_of_order_seconds=args.out_of_order,
+                                   reference=reference)
+    rows = engine.process_many(read_jsonl(args.events))
+    rows.extend(engine.flush())
+    print(f"Events processed: {engine.events_processed} "
+          f"(late/dropped: {engine.events_late})")
+    print(f"Anomalies detected: {len(rows)}")
+
+    if args.out:
+        write_csv(rows, args.out)
+        print(f"Rows written to {args.out}")
+    if args.compare:
+        diff = compare_with_cloud(rows, args.compare)
+        print(f"Matched: {diff['matched']}, mismatched: {len(diff['mismatched'])}, "
+              f"missing locally: {len(diff['missing_locally'])}, "
+              f"extra locally: {len(diff['extra_locally'])}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
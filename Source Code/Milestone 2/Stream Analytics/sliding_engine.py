@@ -0,0 +1,374 @@
+"""
+ADAPTIVE SLIDING-WINDOW ANOMALY ENGINE
+Digital Egypt Pioneers Initiative - Real-Time Traffic Analytics Project
+
+Lower-latency companion to anomaly_engine.py (the TumblingWindow replica).
+Instead of one verdict per location every 5 minutes against fixed
+thresholds, every location keeps:
+
+- a sliding window of its last window_seconds of speeds with a running
+  sum and monotonic deques for min / max (amortized O(1) per event)
+- an exponentially weighted baseline (EWMA mean and variance) of speed
+  and congestion, learned per location, so Maadi Corniche and Ramses
+  Square are each judged against their own normal
+
+Windows are evaluated either on every event (sliding mode, detection on
+the event that causes it) or at every hop_seconds boundary (hopping mode,
+HoppingWindow(second, window, hop) semantics). Deviations are scored as
+z-scores against the baseline; the baseline is updated after scoring so
+an anomaly cannot hide itself.
+
+Output rows have the dbo.Anomalies shape. Value carries the z-score that
+triggered the row (100 for critical incidents, like the cloud query);
+AvgSpeed / MaxSpeed / MinSpeed are the observed speeds even when scoring
+uses impact-adjusted ones (--reference), and a location re-reports the
+same AnomalyType only after cooldown_seconds.
+
+Usage:
+    python sliding_engine.py events.jsonl --mode sliding --window 60
+    python sliding_engine.py events.jsonl --mode hopping --window 300 --hop 30 --out rows.csv
+"""
+
+import argparse
+import math
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from anomaly_engine import (
+    CRITICAL_INCIDENTS, iter_chunks, load_reference_data, parse_timestamp, read_jsonl, write_csv
+)
+
+# Detector Defaults
+# =================
+
+WINDOW_SECONDS = 60          # Sliding window length
+HOP_SECONDS = 10             # Hopping mode evaluation period
+BASELINE_SPAN_EVENTS = 500   # EWMA span: alpha = 2 / (span + 1)
+WARMUP_EVENTS = 50           # Baseline samples required before z-scores are used
+MIN_WINDOW_EVENTS = 3        # Window samples required before scoring
+Z_THRESHOLD = 3.0            # |z| at which a deviation becomes an anomaly
+Z_SEVERE = 5.0               # |z| at which severity is raised to "high"
+MIN_STD = 1.0                # Floor for baseline std (km/h or %) to avoid 0-variance blowups
+
+# Running Statistics
+# ==================
+
+class _Ewma:
+    """Exponentially weighted mean and variance"""
+
+    __slots__ = ("alpha", "mean", "var", "count")
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, value):
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = self.alpha * diff
+            self.mean += increment
+            self.var = (1.0 - self.alpha) * (self.var + diff * increment)
+        self.count += 1
+
+    @property
+    def std(self):
+        return max(math.sqrt(self.var), MIN_STD)
+
+class _SlidingWindow:
+    """Time-based window with running sum and monotonic min/max deques"""
+
+    __slots__ = ("seconds", "items", "total", "minima", "maxima")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.items = deque()    # (ts, value) in time order
+        self.total = 0.0
+        self.minima = deque()   # increasing values: front is the window min
+        self.maxima = deque()   # decreasing values: front is the window max
+
+    def add(self, ts, value):
+        self.items.append((ts, value))
+        self.total += value
+        while self.minima and self.minima[-1][1] > value:
+            self.minima.pop()
+        self.minima.append((ts, value))
+        while self.maxima and self.maxima[-1][1] < value:
+            self.maxima.pop()
+        self.maxima.append((ts, value))
+
+    def expire(self, now):
+        """Drop samples older than now - seconds"""
+        cutoff = now - self.seconds
+        items = self.items
+        while items and items[0][0] <= cutoff:
+            ts, value = items.popleft()
+            self.total -= value
+            if self.minima and self.minima[0][0] == ts and self.minima[0][1] == value:
+                self.minima.popleft()
+            if self.maxima and self.maxima[0][0] == ts and self.maxima[0][1] == value:
+                self.maxima.popleft()
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def mean(self):
+        return self.total / len(self.items)
+
+    @property
+    def min(self):
+        return self.minima[0][1]
+
+    @property
+    def max(self):
+        return self.maxima[0][1]
+
+class _LocationState:
+    """Window, baselines and cooldowns for one location"""
+
+    __slots__ = ("key", "speed_window", "observed_window", "congestion_window", "speed_baseline",
+                 "congestion_baseline", "incident", "incident_ts", "last_ts",
+                 "next_hop", "last_reported")
+
+    def __init__(self, key, window_seconds, alpha, adjusted=False):
+        self.key = key
+        self.speed_window = _SlidingWindow(window_seconds)
+        # Observed speeds for the reported AvgSpeed / MaxSpeed / MinSpeed when
+        # speed_window holds impact-adjusted ones (same window otherwise)
+        self.observed_window = _SlidingWindow(window_seconds) if adjusted else self.speed_window
+        self.congestion_window = _SlidingWindow(window_seconds)
+        self.speed_baseline = _Ewma(alpha)
+        self.congestion_baseline = _Ewma(alpha)
+        self.incident = "None"
+        self.incident_ts = float("-inf")
+        self.last_ts = float("-inf")
+        self.next_hop = None
+        self.last_reported = {}  # AnomalyType -> ts of the last row emitted
+
+# Streaming Engine
+# ================
+
+class SlidingAnomalyEngine:
+    """
+    Per-location sliding / hopping window detector with adaptive baselines
+    process(event) returns the dbo.Anomalies rows the event triggered
+    Same interface as TumblingAnomalyEngine (process_many, flush)
+    """
+
+    def __init__(self, mode="sliding", window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS,
+                 z_threshold=Z_THRESHOLD, baseline_span=BASELINE_SPAN_EVENTS,
+                 warmup_events=WARMUP_EVENTS, cooldown_seconds=None, reference=None):
+        if mode not in ("sliding", "hopping"):
+            raise ValueError(f"mode must be 'sliding' or 'hopping', got {mode!r}")
+        self.mode = mode
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.z_threshold = z_threshold
+        self.alpha = 2.0 / (baseline_span + 1)
+        self.warmup_events = warmup_events
+        self.cooldown_seconds = window_seconds if cooldown_seconds is None else cooldown_seconds
+        self.reference = reference
+        self._locations = {}
+        self.events_processed = 0
+        self.events_late = 0
+
+    # ---- ingest ----
+    def process(self, event):
+        impact = 1.0
+        if self.reference is not None:
+            impact = float(self.reference.impact_for_names(
+                [event.get("WeatherCondition", "")], [event.get("TrafficIncident", "")])[0])
+        return self._process(event, impact)
+
+    def process_many(self, events):
+        """Process any iterable in bounded chunks (impacts are looked up per chunk)"""
+        rows = []
+        for chunk in iter_chunks(events):
+            if self.reference is None:
+                impacts = [1.0] * len(chunk)
+            else:
+                impacts = self.reference.impact_for_names(
+                    [event.get("WeatherCondition", "") for event in chunk],
+                    [event.get("TrafficIncident", "") for event in chunk],
+                ).tolist()
+            for event, impact in zip(chunk, impacts):
+                rows.extend(self._process(event, impact))
+        return rows
+
+    def flush(self):
+        """Evaluate the pending hop of every location (hopping mode); sliding has nothing pending"""
+        rows = []
+        if self.mode == "hopping":
+            for state in self._locations.values():
+                if state.next_hop is not None and len(state.speed_window):
+                    rows.extend(self._evaluate(state, state.next_hop))
+                    state.next_hop = None
+        return rows
+
+    def _process(self, event, impact):
+        ts = parse_timestamp(event["Timestamp"])
+        key = (event["LocationID"], event["LocationName"],
+               float(event["Latitude"]), float(event["Longitude"]))
+        state = self._locations.get(key)
+        if state is None:
+            state = _LocationState(key, self.window_seconds, self.alpha, self.reference is not None)
+            self._locations[key] = state
+        if ts < state.last_ts:
+            self.events_late += 1
+            return []
+        self.events_processed += 1
+
+        rows = []
+        if self.mode == "hopping":
+            if state.next_hop is None:
+                state.next_hop = (math.floor(ts / self.hop_seconds) + 1) * self.hop_seconds
+            # Close every hop boundary this event has moved past (window as of the boundary)
+            while ts >= state.next_hop:
+                state.speed_window.expire(state.next_hop)
+                state.observed_window.expire(state.next_hop)
+                state.congestion_window.expire(state.next_hop)
+                if len(state.speed_window):
+                    rows.extend(self._evaluate(state, state.next_hop))
+                    state.next_hop += self.hop_seconds
+                else:
+                    state.next_hop = (math.floor(ts / self.hop_seconds) + 1) * self.hop_seconds
+
+        speed = float(event["AverageSpeedKMH"])
+        adjusted = speed / impact if impact > 0 else speed
+        congestion = float(event["CongestionPercentage"])
+        state.last_ts = ts
+        state.speed_window.expire(ts)
+        state.observed_window.expire(ts)
+        state.congestion_window.expire(ts)
+        state.speed_window.add(ts, adjusted)
+        if state.observed_window is not state.speed_window:
+            state.observed_window.add(ts, speed)
+        state.congestion_window.add(ts, congestion)
+        if event["TrafficIncident"] != "None":
+            state.incident = event["TrafficIncident"]
+            state.incident_ts = ts
+        elif ts - state.incident_ts > self.window_seconds:
+            state.incident = "None"
+
+        if self.mode == "sliding":
+            rows.extend(self._evaluate(state, ts))
+
+        # Learn after scoring so an anomalous reading cannot mask itself
+        state.speed_baseline.update(adjusted)
+        state.congestion_baseline.update(congestion)
+        return rows
+
+    # ---- scoring ----
+    def _scores(self, state):
+        """z-scores of the current window against the location baselines"""
+        speed, congestion = state.speed_window, state.congestion_window
+        speed_base, congestion_base = state.speed_baseline, state.congestion_baseline
+        n = len(speed)
+        std = speed_base.std
+        return {
+            # Window mean of n samples has standard error std / sqrt(n)
+            "avg": (speed.mean - speed_base.mean) / (std / math.sqrt(n)),
+            "max": (speed.max - speed_base.mean) / std,
+            "range": (speed.max - speed.min) / std,
+            "congestion": (congestion.max - congestion_base.mean) / congestion_base.std,
+        }
+
+    def _classify(self, state):
+        """(anomaly_type, severity, value) for the current window, or None"""
+        if state.incident in CRITICAL_INCIDENTS:
+            return "critical_incident", "critical", 100.0
+        warmed = (state.speed_baseline.count >= self.warmup_events
+                  and len(state.speed_window) >= MIN_WINDOW_EVENTS)
+        if warmed:
+            z = self._scores(state)
+            z_limit = self.z_threshold
+            if z["avg"] <= -z_limit:
+                return "speed_drop", "high" if z["avg"] <= -Z_SEVERE else "medium", round(z["avg"], 2)
+            if z["congestion"] >= z_limit:
+                return "congestion_spike", "high" if z["congestion"] >= Z_SEVERE else "medium", \
+                    round(z["congestion"], 2)
+            if z["max"] >= z_limit:
+                return "speed_spike", "medium", round(z["max"], 2)
+            # Spread of a normal window is ~4 sigma; flag well beyond that
+            if z["range"] >= 2 * z_limit:
+                return "volatile_traffic", "medium", round(z["range"], 2)
+        if state.incident != "None":
+            return "minor_incident", "low", None
+        return None
+
+    def _evaluate(self, state, at):
+        verdict = self._classify(state)
+        if verdict is None:
+            return []
+        anomaly_type, severity, value = verdict
+        last = state.last_reported.get(anomaly_type)
+        if last is not None and at - last < self.cooldown_seconds:
+            return []
+        state.last_reported[anomaly_type] = at
+
+        location_id, location_name, latitude, longitude = state.key
+        speed = state.observed_window
+        detected_at = datetime.fromtimestamp(at, timezone.utc).replace(tzinfo=None)
+        return [{
+            # Sliding detections can land on any second of any day
+            "EventID": f"EVT_{location_id}_{detected_at:%Y%m%d%H%M%S}_{anomaly_type}",
+            "LocationID": location_id,
+            "LocationName": location_name,
+            "Latitude": latitude,
+            "Longitude": longitude,
+            "AnomalyType": anomaly_type,
+            "Severity": severity,
+            "Value": value,
+            "Incident": state.incident,
+            "AvgSpeed": speed.mean,
+            "MaxSpeed": speed.max,
+            "MinSpeed": speed.min,
+            "MaxCongestion": state.congestion_window.max,
+            "DetectedAt": detected_at,
+        }]
+
+# Command Line
+# ============
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adaptive sliding/hopping window anomaly detection")
+    parser.add_argument("events", help="JSON-lines file of traffic events")
+    parser.add_argument("--mode", choices=["sliding", "hopping"], default="sliding")
+    parser.add_argument("--window", type=float, default=WINDOW_SECONDS, help="Window length in seconds")
+    parser.add_argument("--hop", type=float, default=HOP_SECONDS, help="Hopping mode: hop in seconds")
+    parser.add_argument("--z", type=float, default=Z_THRESHOLD, help="z-score threshold")
+    parser.add_argument("--reference", action="store_true",
+                        help="Score speeds adjusted by weather/incident SpeedImpactFactor")
+    parser.add_argument("--out", help="Write anomaly rows to this CSV file")
+    args = parser.parse_args(argv)
+
+    engine = SlidingAnomalyEngine(
+        mode=args.mode, window_seconds=args.window, hop_seconds=args.hop, z_threshold=args.z,
+        reference=load_reference_data() if args.reference else None,
+    )
+    started = time.perf_counter()
+    rows = engine.process_many(read_jsonl(args.events))
+    rows.extend(engine.flush())
+    elapsed = time.perf_counter() - started
+
+    print(f"Events processed: {engine.events_processed} (late/dropped: {engine.events_late})")
+    print(f"Processing rate: {engine.events_processed / elapsed:,.0f} events/sec "
+          f"({elapsed / max(engine.events_processed, 1) * 1e6:.1f} us per event)")
+    counts = {}
+    for row in rows:
+        counts[row["AnomalyType"]] = counts.get(row["AnomalyType"], 0) + 1
+    print(f"Anomalies detected: {len(rows)} {counts}")
+
+    if args.out:
+        write_csv(rows, args.out)
+        print(f"Rows written to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
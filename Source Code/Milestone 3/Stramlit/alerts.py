@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Vectorized alert detection + compact alert log
+# ----------------------------
+# detect_batch() applies the dashboard thresholds to whole columns at once
+# and returns one bit-flag byte per event. AlertLog stores only the events
+# that raised something, in typed NumPy columns with an increasing sequence
+# number, so "what is new since my last rerun" is O(new alerts).
+
+LOW_SPEED_KMH = 10
+HIGH_SPEED_KMH = 100
+OVER_CAPACITY_PCT = 120
+HIGH_CONGESTION_PCT = 85
+
+LOW_SPEED = 1
+HIGH_SPEED = 2
+OVER_CAPACITY = 4
+HIGH_CONGESTION = 8
+INCIDENT = 16
+
+# Order in which alert texts are listed (matches the old per-event checks)
+FLAG_LABELS = [
+    (LOW_SPEED, "Low speed"),
+    (HIGH_SPEED, "High speed"),
+    (OVER_CAPACITY, "Over capacity"),
+    (HIGH_CONGESTION, "High congestion"),
+    (INCIDENT, "Incident"),
+]
+
+
+def detect_batch(speed, congestion, incident_code, none_code):
+    """Alert flags (uint8 per event); 0 means nothing to report"""
+    flags = np.zeros(len(speed), dtype=np.uint8)
+    flags[speed < LOW_SPEED_KMH] |= LOW_SPEED
+    flags[speed > HIGH_SPEED_KMH] |= HIGH_SPEED
+    over = congestion > OVER_CAPACITY_PCT
+    flags[over] |= OVER_CAPACITY
+    flags[~over & (congestion > HIGH_CONGESTION_PCT)] |= HIGH_CONGESTION
+    flags[incident_code != none_code] |= INCIDENT
+    return flags
+
+
+def describe(flags, incident):
+    """Alert text for one flag byte, e.g. 'Low speed, Incident: Major Accident'"""
+    parts = []
+    for bit, label in FLAG_LABELS:
+        if flags & bit:
+            parts.append(f"Incident: {incident}" if bit == INCIDENT else label)
+    return ", ".join(parts)
+
+
+def first_label(flags):
+    for bit, label in FLAG_LABELS:
+        if flags & bit:
+            return label
+    return None
+
+
+class AlertLog:
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        size = 2 * self.capacity   # mirrored ring, see EventBuffer
+        self._ts = np.zeros(size, dtype="datetime64[ns]")
+        self._location = np.zeros(size, dtype=np.int32)
+        self._flags = np.zeros(size, dtype=np.uint8)
+        self._incident = np.zeros(size, dtype=np.int16)
+        self._speed = np.zeros(size, dtype=np.float32)
+        self._congestion = np.zeros(size, dtype=np.float32)
+        self._write = 0
+        self._size = 0
+        self.next_seq = 0   # sequence number of the next alert appended
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._write = 0
+        self._size = 0
+
+    def append(self, ts, location, flags, incident, speed, congestion):
+        """Append the flagged rows (arrays already filtered to flags != 0)"""
+        n = len(flags)
+        if n == 0:
+            return
+        self.next_seq += n
+        if n > self.capacity:
+            ts, location, flags = ts[-self.capacity:], location[-self.capacity:], flags[-self.capacity:]
+            incident, speed, congestion = incident[-self.capacity:], speed[-self.capacity:], congestion[-self.capacity:]
+            n = self.capacity
+        slots = (self._write + np.arange(n)) % self.capacity
+        for arr, values in ((self._ts, ts), (self._location, location), (self._flags, flags),
+                            (self._incident, incident), (self._speed, speed), (self._congestion, congestion)):
+            arr[slots] = values
+            arr[slots + self.capacity] = values
+        self._write = (self._write + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def _window(self, last=None):
+        first = (self._write - self._size) % self.capacity
+        count = self._size if last is None else min(last, self._size)
+        return slice(first + self._size - count, first + self._size)
+
+    def count_since(self, seq):
+        """Number of alerts appended after sequence number `seq` that are still retained"""
+        return min(max(self.next_seq - seq, 0), self._size)
+
+    def frame(self, buffer, last=None):
+        """Decoded DataFrame of the newest `last` alerts (all retained if None), oldest first"""
+        w = self._window(last)
+        flags, incident = self._flags[w], self._incident[w]
+        # Few distinct (flags, incident) pairs - build each text once
+        pairs, inverse = np.unique(flags.astype(np.int32) * 65536 + incident, return_inverse=True)
+        texts = np.array([describe(p // 65536, buffer.incidents.values[p % 65536]) for p in pairs], dtype=object)
+        names = np.array([loc["name"] for loc in buffer.locations], dtype=object)
+        return pd.DataFrame({
+            "timestamp": self._ts[w],
+            "location": names[self._location[w]],
+            "event": texts[inverse.ravel()],
+            "speed": self._speed[w],
+            "congestion": self._congestion[w],
+        })
+
+    def type_counts(self):
+        """Count of alerts by their first alert type (for the bar chart)"""
+        flags = self._flags[self._window()]
+        counts = {}
+        for value, n in zip(*np.unique(flags, return_counts=True)):
+            label = first_label(int(value))
+            counts[label] = counts.get(label, 0) + int(n)
+        return pd.Series(counts, dtype=np.int64).sort_values(ascending=False)
@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+# ----------------------------
+# Columnar ring buffer for dashboard events
+# ----------------------------
+# Fixed-capacity, NumPy-backed circular buffer holding the most recent
+# traffic events. Appends are O(1); once full, the oldest event is
+# overwritten. Every slot is written twice (at i and i + capacity), so the
+# retained events are always one contiguous slice of each column array (in
+# arrival order) and views never need to stitch two halves together.
+# Arrival order is usually time order, but merged Event Hub partitions and
+# replays can deliver older events late; the buffer remembers the last event
+# that arrived out of order so time lookups only binary search when every
+# retained event is in time order.
+
+NUMERIC_COLUMNS = {
+    "VehicleCount": np.int32,
+    "AverageSpeedKMH": np.float64,
+    "CongestionPercentage": np.float64,
+    "IsRushHour": np.bool_,
+    "RushFactor": np.float32,
+}
+
+# Categorical event fields stored as small integer codes
+CATEGORY_COLUMNS = {
+    "DominantVehicleType": "vehicle_types",
+    "WeatherCondition": "weather_conditions",
+    "TrafficIncident": "incidents",
+}
+
+
+def _to_datetime64(value):
+    """Event ts / Timestamp (datetime or ISO string) -> naive UTC datetime64[ns]"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "ns")
+
+
+class _Codebook:
+    """String <-> small int mapping that grows when new values appear"""
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.codes = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+
+class EventBuffer:
+    def __init__(self, capacity, locations, vehicle_types, weather_conditions, incidents):
+        self.capacity = int(capacity)
+        self.locations = [dict(loc) for loc in locations]
+        self.location_codes = {loc["id"]: i for i, loc in enumerate(self.locations)}
+        self.vehicle_types = _Codebook(vehicle_types)
+        self.weather_conditions = _Codebook(weather_conditions)
+        self.incidents = _Codebook(incidents)
+
+        size = 2 * self.capacity
+        self._ts = np.zeros(size, dtype="datetime64[ns]")
+        self._location = np.zeros(size, dtype=np.int32)
+        self._numeric = {name: np.zeros(size, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        self._category = {name: np.zeros(size, dtype=np.int16) for name in CATEGORY_COLUMNS}
+        self._write = 0   # next slot in [0, capacity)
+        self._size = 0
+        self.total_appended = 0
+        self._last_disorder = -1   # total_appended index of the last event older than the one before it
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def empty(self):
+        return self._size == 0
+
+    def clear(self):
+        self._write = 0
+        self._size = 0
+
+    # ---- ingest ----
+    def location_code(self, event):
+        code = self.location_codes.get(event["LocationID"])
+        if code is None:
+            # Unknown sensor (e.g. from a live stream) - register it on the fly
+            code = len(self.locations)
+            self.locations.append({
+                "id": event["LocationID"], "name": event["LocationName"],
+                "lat": float(event["Latitude"]), "lon": float(event["Longitude"]),
+            })
+            self.location_codes[event["LocationID"]] = code
+        return code
+
+    def _newest_ts(self):
+        return self._ts[(self._write - 1) % self.capacity] if self._size else None
+
+    def append(self, event):
+        i, j = self._write, self._write + self.capacity
+        ts = _to_datetime64(event.get("ts") or event["Timestamp"])
+        if self._size and ts < self._newest_ts():
+            self._last_disorder = self.total_appended
+        self._ts[i] = self._ts[j] = ts
+        loc = self.location_code(event)
+        self._location[i] = self._location[j] = loc
+        for name, arr in self._numeric.items():
+            arr[i] = arr[j] = event[name]
+        for name, book in CATEGORY_COLUMNS.items():
+            code = getattr(self, book).encode(event[name])
+            arr = self._category[name]
+            arr[i] = arr[j] = code
+        self._write = (self._write + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total_appended += 1
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def _encode_unique(self, values, encode):
+        """Per-row codes for a string array, calling encode once per distinct value"""
+        uniq, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+        return np.array([encode(value, i) for value, i in zip(uniq.tolist(), first.tolist())],
+                        dtype=np.int32)[inverse.reshape(-1)]
+
+    def extend_columns(self, columns):
+        """
+        Vectorized extend from decoded columns (see hub_consumer.decode_bodies):
+        "ts" datetime64, LocationID (+ optional LocationName / Latitude /
+        Longitude for unseen sensors), the numeric columns and the category
+        columns as strings. Returns the number of events appended
+        """
+        n = len(columns["ts"])
+        if n == 0:
+            return 0
+        keep = slice(max(0, n - self.capacity), n)   # only the newest `capacity` can survive
+        ids = columns["LocationID"][keep]
+        names, lats, lons = (columns.get(key) for key in ("LocationName", "Latitude", "Longitude"))
+
+        def location(loc_id, i):
+            i += keep.start
+            return self.location_code({
+                "LocationID": loc_id,
+                "LocationName": names[i] if names is not None else loc_id,
+                "Latitude": lats[i] if lats is not None else 0.0,
+                "Longitude": lons[i] if lons is not None else 0.0,
+            })
+
+        ts = np.asarray(columns["ts"][keep], dtype="datetime64[ns]")
+        steps_back = np.flatnonzero(ts[1:] < ts[:-1]) + 1
+        if len(steps_back):
+            self._last_disorder = self.total_appended + keep.start + int(steps_back[-1])
+        elif keep.start == 0 and self._size and ts[0] < self._newest_ts():
+            self._last_disorder = self.total_appended
+
+        rows = (self._write + np.arange(keep.stop - keep.start)) % self.capacity
+        slots = np.concatenate([rows, rows + self.capacity])
+
+        def put(arr, values):
+            arr[slots] = np.tile(values, 2)
+
+        put(self._ts, ts)
+        put(self._location, self._encode_unique(ids, location))
+        for name, arr in self._numeric.items():
+            put(arr, columns[name][keep])
+        for name, book in CATEGORY_COLUMNS.items():
+            codebook = getattr(self, book)
+            put(self._category[name],
+                self._encode_unique(columns[name][keep], lambda value, _: codebook.encode(value)))
+        count = len(rows)
+        self._write = (self._write + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+        self.total_appended += n
+        return n
+
+    # ---- views (no copies: slices of the mirrored arrays) ----
+    def _window(self, start=0):
+        first = (self._write - self._size) % self.capacity
+        return slice(first + start, first + self._size)
+
+    def ts(self, start=0):
+        return self._ts[self._window(start)]
+
+    def column(self, name, start=0):
+        """Chronological view of one column from position `start` onward"""
+        window = self._window(start)
+        if name == "ts":
+            return self._ts[window]
+        if name == "LocationCode":
+            return self._location[window]
+        if name in self._numeric:
+            return self._numeric[name][window]
+        return self._category[name][window]
+
+    @property
+    def in_time_order(self):
+        """True if the retained events are sorted by ts"""
+        return self._last_disorder <= self.total_appended - self._size
+
+    def since(self, cutoff):
+        """
+        Selection of the retained events at/after cutoff, for indexing
+        column() views: a slice when the events are in time order (binary
+        search), otherwise a boolean mask
+        """
+        if cutoff is None:
+            return slice(None)
+        cutoff = _to_datetime64(cutoff)
+        if self.in_time_order:
+            return slice(int(np.searchsorted(self.ts(), cutoff, side="left")), None)
+        return self.ts() >= cutoff
+
+    def frame(self, start=0):
+        """DataFrame view of the retained events from position `start` onward"""
+        window = self._window(start)
+        loc_codes = self._location[window]
+        names = [loc["name"] for loc in self.locations]
+        data = {
+            "ts": self._ts[window],
+            "LocationID": pd.Categorical.from_codes(loc_codes, [loc["id"] for loc in self.locations]),
+            # Categories must be unique; fall back to plain strings if two sensors share a name
+            "LocationName": (pd.Categorical.from_codes(loc_codes, names) if len(set(names)) == len(names)
+                             else np.array(names, dtype=object)[loc_codes]),
+        }
+        for name, arr in self._numeric.items():
+            data[name] = arr[window]
+        for name, book in CATEGORY_COLUMNS.items():
+            data[name] = pd.Categorical.from_codes(self._category[name][window], getattr(self, book).values)
+        return pd.DataFrame(data, copy=False)
+
+    def event_at(self, position):
+        """Decode one retained event (position -1 = newest) back into a dict"""
+        if position < 0:
+            position += self._size
+        k = self._window().start + position
+        loc = self.locations[self._location[k]]
+        ts = pd.Timestamp(self._ts[k]).tz_localize("UTC").to_pydatetime()
+        event = {
+            "Timestamp": ts.isoformat(timespec="seconds"),
+            "ts": ts,
+            "LocationID": loc["id"],
+            "LocationName": loc["name"],
+            "Latitude": float(loc["lat"]),
+            "Longitude": float(loc["lon"]),
+        }
+        for name, arr in self._numeric.items():
+            event[name] = arr[k].item()
+        for name, book in CATEGORY_COLUMNS.items():
+            event[name] = getattr(self, book).values[self._category[name][k]]
+        return event
+
+    def latest(self):
+        return self.event_at(-1)
+
+    def latest_per_location(self):
+        """Newest event per location as a DataFrame (one row per location seen)"""
+        codes = self.column("LocationCode")
+        # First occurrence in the reversed codes = last occurrence in time
+        _, rev_idx = np.unique(codes[::-1], return_index=True)
+        positions = len(codes) - 1 - rev_idx
+        rows = [self.event_at(int(p)) for p in positions]
+        return pd.DataFrame(rows)
@@ -0,0 +1,351 @@
+import queue
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from alerts import describe, first_label
+
+# ----------------------------
+# Persistent history for the dashboard (SQLite)
+# ----------------------------
+# The in-memory EventBuffer / Rollups only cover what was ingested since the
+# server started. HistoryStore persists every ingested batch on a writer
+# thread (the ingest lock is never held during disk I/O):
+#   events        raw events as integer codes, indexed on (epoch, location)
+#   minute_stats  per-minute per-location aggregates, upserted incrementally
+#   minute_mix    per-minute per-location vehicle type counts
+#   alerts        flagged events, indexed on (epoch, location)
+# Time range and location filters become WHERE clauses on those indexes, so
+# a query touches only the matching rows; charts over days read the minute
+# tables (one row per location-minute) rather than raw events.
+# Stored location / category codes belong to the database, not the process:
+# buffer codes are translated on write, so a sensor registered in a different
+# order after a restart keeps the code its history was written under.
+# With a retention period the writer deletes rows older than that (measured
+# from the newest event written, so replays of old days are kept too) about
+# once per PRUNE_EVERY_SECONDS of event time.
+
+WRITE_QUEUE_BATCHES = 256   # ingest blocks if the writer falls this far behind
+PRUNE_EVERY_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    epoch        INTEGER NOT NULL,
+    location     INTEGER NOT NULL,
+    vehicles     INTEGER NOT NULL,
+    speed        REAL    NOT NULL,
+    congestion   REAL    NOT NULL,
+    vehicle_type INTEGER NOT NULL,
+    weather      INTEGER NOT NULL,
+    incident     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_events_epoch_location ON events (epoch, location);
+
+CREATE TABLE IF NOT EXISTS minute_stats (
+    minute      INTEGER NOT NULL,
+    location    INTEGER NOT NULL,
+    events      INTEGER NOT NULL,
+    vehicle_sum REAL    NOT NULL,
+    speed_sum   REAL    NOT NULL,
+    speed_min   REAL    NOT NULL,
+    speed_max   REAL    NOT NULL,
+    cong_sum    REAL    NOT NULL,
+    cong_max    REAL    NOT NULL,
+    PRIMARY KEY (minute, location)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS minute_mix (
+    minute       INTEGER NOT NULL,
+    location     INTEGER NOT NULL,
+    vehicle_type INTEGER NOT NULL,
+    events       INTEGER NOT NULL,
+    PRIMARY KEY (minute, location, vehicle_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS alerts (
+    epoch      INTEGER NOT NULL,
+    location   INTEGER NOT NULL,
+    flags      INTEGER NOT NULL,
+    incident   INTEGER NOT NULL,
+    speed      REAL    NOT NULL,
+    congestion REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_alerts_epoch_location ON alerts (epoch, location);
+
+CREATE TABLE IF NOT EXISTS locations (
+    code INTEGER PRIMARY KEY, id TEXT NOT NULL, name TEXT, lat REAL, lon REAL
+);
+CREATE TABLE IF NOT EXISTS codes (
+    kind TEXT NOT NULL, code INTEGER NOT NULL, value TEXT NOT NULL,
+    PRIMARY KEY (kind, code)
+);
+"""
+
+UPSERT_MINUTE_STATS = """
+INSERT INTO minute_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (minute, location) DO UPDATE SET
+    events = events + excluded.events,
+    vehicle_sum = vehicle_sum + excluded.vehicle_sum,
+    speed_sum = speed_sum + excluded.speed_sum,
+    speed_min = MIN(speed_min, excluded.speed_min),
+    speed_max = MAX(speed_max, excluded.speed_max),
+    cong_sum = cong_sum + excluded.cong_sum,
+    cong_max = MAX(cong_max, excluded.cong_max)
+"""
+
+UPSERT_MINUTE_MIX = """
+INSERT INTO minute_mix VALUES (?, ?, ?, ?)
+ON CONFLICT (minute, location, vehicle_type) DO UPDATE SET events = events + excluded.events
+"""
+
+CODE_KINDS = ("vehicle_types", "weather_conditions", "incidents")
+
+
+def _minute_groups(epoch, loc, vehicles, speed, cong, n_locations):
+    """Per (minute, location) aggregates of one batch"""
+    key = (epoch // 60) * n_locations + loc
+    groups, inverse = np.unique(key, return_inverse=True)
+    inverse = inverse.ravel()
+    k = len(groups)
+    speed_min = np.full(k, np.inf)
+    speed_max = np.full(k, -np.inf)
+    cong_max = np.full(k, -np.inf)
+    np.minimum.at(speed_min, inverse, speed)
+    np.maximum.at(speed_max, inverse, speed)
+    np.maximum.at(cong_max, inverse, cong)
+    return zip(
+        (groups // n_locations).tolist(), (groups % n_locations).tolist(),
+        np.bincount(inverse, minlength=k).tolist(),
+        np.bincount(inverse, vehicles, minlength=k).tolist(),
+        np.bincount(inverse, speed, minlength=k).tolist(),
+        speed_min.tolist(), speed_max.tolist(),
+        np.bincount(inverse, cong, minlength=k).tolist(),
+        cong_max.tolist(),
+    )
+
+
+class HistoryStore:
+    def __init__(self, path, retention_days=None):
+        self.path = str(path)
+        self.retention_seconds = int(retention_days * 86400) if retention_days else None
+        self._next_prune = None
+        self._write_conn = self._connect()
+        self._write_conn.executescript(SCHEMA)
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=WRITE_QUEUE_BATCHES)
+        # kind -> {value: stored code} (locations keyed by LocationID), loaded from the database
+        self._stored = {"locations": dict(self._write_conn.execute("SELECT id, code FROM locations"))}
+        for kind in CODE_KINDS:
+            self._stored[kind] = dict(self._write_conn.execute(
+                "SELECT value, code FROM codes WHERE kind = ?", [kind]))
+        self._to_stored = {kind: np.zeros(0, dtype=np.int64) for kind in self._stored}   # buffer code -> stored code
+        self.rows_written = 0
+        self.error = None
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")   # readers never wait for the writer
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---- writes (called from the ingest thread, executed on the writer thread) ----
+    def sync_codes(self, buffer):
+        """Map buffer codes that appeared since the last call to stored codes, queueing new code rows"""
+        updates = []
+        for kind, values in [("locations", buffer.locations)] + [(k, getattr(buffer, k).values) for k in CODE_KINDS]:
+            known = len(self._to_stored[kind])
+            if len(values) <= known:
+                continue
+            stored, codes, rows = self._stored[kind], [], []
+            for value in values[known:]:
+                key = value["id"] if kind == "locations" else value
+                code = stored.get(key)
+                if code is None:
+                    code = stored[key] = max(stored.values(), default=-1) + 1
+                    rows.append((code, key, value.get("name"), value.get("lat"), value.get("lon"))
+                                if kind == "locations" else (kind, code, value))
+                codes.append(code)
+            self._to_stored[kind] = np.concatenate([self._to_stored[kind], np.array(codes, dtype=np.int64)])
+            if rows:
+                updates.append(("locations" if kind == "locations" else "codes", rows))
+        if updates:
+            self._queue.put(("codes", updates))
+
+    def append(self, epoch, loc, vehicles, speed, cong, vtype, weather, incident, alert_mask, flags):
+        """Queue one ingested batch; arrays are copied so ring buffer views may be reused"""
+        if len(epoch) == 0:
+            return
+        to_stored = self._to_stored
+        columns = [np.array(epoch), to_stored["locations"][loc], np.array(vehicles), np.array(speed), np.array(cong),
+                   to_stored["vehicle_types"][vtype], to_stored["weather_conditions"][weather],
+                   to_stored["incidents"][incident]]
+        self._queue.put(("batch", (columns, np.array(alert_mask), np.array(flags))))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is on disk"""
+        done = threading.Event()
+        self._queue.put(("marker", done))
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == "marker":
+                    payload.set()
+                elif kind == "codes":
+                    with self._write_conn:
+                        for table, rows in payload:
+                            placeholders = ", ".join("?" * len(rows[0]))
+                            self._write_conn.executemany(
+                                f"INSERT INTO {table} VALUES ({placeholders})", rows)
+                else:
+                    self._write_batch(*payload)
+            except Exception as err:   # keep the writer (and the dashboard) running; show it in the UI
+                self.error = f"{type(err).__name__}: {err}"
+
+    def _write_batch(self, columns, alert_mask, flags):
+        epoch, loc, vehicles, speed, cong, vtype, weather, incident = columns
+        if len(epoch) == 0:
+            return
+        n_locations = int(loc.max()) + 1
+        with self._write_conn:
+            self._write_conn.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                zip(*(c.tolist() for c in columns)))
+            self._write_conn.executemany(
+                UPSERT_MINUTE_STATS, _minute_groups(epoch, loc, vehicles, speed, cong, n_locations))
+            mix_key = ((epoch // 60) * n_locations + loc) * 256 + vtype
+            mix, counts = np.unique(mix_key, return_counts=True)
+            self._write_conn.executemany(UPSERT_MINUTE_MIX, zip(
+                (mix // 256 // n_locations).tolist(), (mix // 256 % n_locations).tolist(),
+                (mix % 256).tolist(), counts.tolist()))
+            if alert_mask.any():
+                self._write_conn.executemany(
+                    "INSERT INTO alerts VALUES (?, ?, ?, ?, ?, ?)",
+                    zip(epoch[alert_mask].tolist(), loc[alert_mask].tolist(), flags[alert_mask].tolist(),
+                        incident[alert_mask].tolist(), speed[alert_mask].tolist(), cong[alert_mask].tolist()))
+        self.rows_written += len(epoch)
+        newest = int(epoch.max())
+        if self.retention_seconds and (self._next_prune is None or newest >= self._next_prune):
+            self._next_prune = newest + PRUNE_EVERY_SECONDS
+            self._prune(newest - self.retention_seconds)
+
+    def _prune(self, before_epoch):
+        """Delete history older than before_epoch"""
+        with self._write_conn:
+            self._write_conn.execute("DELETE FROM events WHERE epoch < ?", (before_epoch,))
+            self._write_conn.execute("DELETE FROM alerts WHERE epoch < ?", (before_epoch,))
+            self._write_conn.execute("DELETE FROM minute_stats WHERE minute < ?", (before_epoch // 60,))
+            self._write_conn.execute("DELETE FROM minute_mix WHERE minute < ?", (before_epoch // 60,))
+
+    # ---- queries (locations filter by LocationID) ----
+    def _where(self, time_column, start, end, locations, scale=1):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f"{time_column} >= ?")
+            params.append(int(start) // scale)
+        if end is not None:
+            clauses.append(f"{time_column} <= ?")
+            params.append(int(end) // scale)
+        if locations:
+            clauses.append(f"location IN ({', '.join('?' * len(locations))})")
+            params.extend(self._stored["locations"].get(loc_id, -1) for loc_id in locations)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _query(self, sql, params):
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def span(self):
+        """(first, last) epoch stored, or (None, None)"""
+        return tuple(self._query("SELECT MIN(minute) * 60, MAX(minute) * 60 + 59 FROM minute_stats", [])[0])
+
+    @staticmethod
+    def bucket_for(start, end):
+        """Chart bucket size for a time range (minute data -> at most a few hundred points)"""
+        span = (end - start) if start is not None and end is not None else None
+        if span is not None and span <= 6 * 3600:
+            return 60
+        if span is not None and span <= 3 * 86400:
+            return 300
+        return 3600
+
+    def timeseries(self, start=None, end=None, locations=None, bucket_seconds=None):
+        """Same columns as Rollups.timeseries, from the minute table"""
+        if bucket_seconds is None:
+            bucket_seconds = self.bucket_for(start, end)
+        minutes_per_bucket = max(1, bucket_seconds // 60)
+        where, params = self._where("minute", start, end, locations, scale=60)
+        rows = self._query(
+            f"SELECT (minute / {minutes_per_bucket}) * {minutes_per_bucket * 60} AS bucket, "
+            "SUM(events), SUM(vehicle_sum), SUM(speed_sum), MIN(speed_min), MAX(speed_max), "
+            f"SUM(cong_sum), MAX(cong_max) FROM minute_stats{where} GROUP BY bucket ORDER BY bucket",
+            params)
+        data = np.array(rows, dtype=np.float64).reshape(-1, 8)
+        count = data[:, 1]
+        return pd.DataFrame({
+            "ts": data[:, 0].astype(np.int64).astype("datetime64[s]"),
+            "Events": count.astype(np.int64),
+            "VehicleCount": data[:, 2] / count,
+            "AverageSpeedKMH": data[:, 3] / count,
+            "MinSpeedKMH": data[:, 4],
+            "MaxSpeedKMH": data[:, 5],
+            "AvgCongestion": data[:, 6] / count,
+            "MaxCongestion": data[:, 7],
+        })
+
+    def vehicle_mix(self, start=None, end=None, locations=None):
+        """{vehicle type code: event count}"""
+        where, params = self._where("minute", start, end, locations, scale=60)
+        return dict(self._query(
+            f"SELECT vehicle_type, SUM(events) FROM minute_mix{where} GROUP BY vehicle_type", params))
+
+    def location_congestion(self, start=None, end=None, locations=None):
+        """{location code: (event count, mean congestion)}"""
+        where, params = self._where("minute", start, end, locations, scale=60)
+        rows = self._query(
+            f"SELECT location, SUM(events), SUM(cong_sum) / SUM(events) FROM minute_stats{where} "
+            "GROUP BY location", params)
+        return {code: (count, mean) for code, count, mean in rows}
+
+    def codes(self, kind):
+        return [value for _, value in self._query(
+            "SELECT code, value FROM codes WHERE kind = ? ORDER BY code", [kind])]
+
+    def location_names(self):
+        return dict(self._query("SELECT code, name FROM locations", []))
+
+    def alert_frame(self, start=None, end=None, locations=None, limit=1000):
+        """Newest `limit` alerts in range, same columns as AlertLog.frame, oldest first"""
+        where, params = self._where("epoch", start, end, locations)
+        rows = self._query(
+            f"SELECT epoch, location, flags, incident, speed, congestion FROM alerts{where} "
+            "ORDER BY epoch DESC LIMIT ?", params + [int(limit)])[::-1]
+        names = self.location_names()
+        incidents = self.codes("incidents")
+        return pd.DataFrame({
+            "timestamp": np.array([r[0] for r in rows], dtype=np.int64).astype("datetime64[s]"),
+            "location": [names.get(r[1]) for r in rows],
+            "event": [describe(r[2], incidents[r[3]] if r[3] < len(incidents) else r[3]) for r in rows],
+            "speed": [r[4] for r in rows],
+            "congestion": [r[5] for r in rows],
+        })
+
+    def alert_count(self, start=None, end=None, locations=None):
+        where, params = self._where("epoch", start, end, locations)
+        return self._query(f"SELECT COUNT(*) FROM alerts{where}", params)[0][0]
+
+    def alert_type_counts(self, start=None, end=None, locations=None):
+        """Alerts by first alert type (same shape as AlertLog.type_counts)"""
+        where, params = self._where("epoch", start, end, locations)
+        counts = {}
+        for flags, n in self._query(f"SELECT flags, COUNT(*) FROM alerts{where} GROUP BY flags", params):
+            label = first_label(flags)
+            counts[label] = counts.get(label, 0) + n
+        return pd.Series(counts, dtype=np.int64).sort_values(ascending=False)
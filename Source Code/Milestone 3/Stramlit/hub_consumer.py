@@ -0,0 +1,361 @@
+import itertools
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from event_buffer import CATEGORY_COLUMNS, NUMERIC_COLUMNS
+
+# ----------------------------
+# Event Hub consumer helpers (dashboard "Event Hub" source)
+# ----------------------------
+# - decode_bodies(): one bulk decode per partition batch into NumPy columns
+#   (EventBuffer.extend_columns), for JSON events and CTW1 wire micro-batches
+# - LocalCheckpointStore: last ingested offset per partition in SQLite, so a
+#   restarted dashboard resumes where it stopped instead of re-reading history
+# - FakeEventHub: in-process partitioned hub with producer and consumer
+#   clients shaped like the Azure SDK ones, for running the source offline
+#
+#   python hub_consumer.py   # self-check: fake hub -> source -> buffer, restart, resume
+
+# Milestone 1 wire format (compact CTW1 micro-batches)
+SIMULATOR_DIR = Path(__file__).resolve().parent.parent.parent / "Milestone 1"
+WIRE_MAGIC = b"CTW1"
+
+TEXT_COLUMNS = ("LocationID", "LocationName") + tuple(CATEGORY_COLUMNS)
+FLOAT_COLUMNS = ("Latitude", "Longitude")
+
+
+def _wire_format():
+    if str(SIMULATOR_DIR) not in sys.path:
+        sys.path.insert(0, str(SIMULATOR_DIR))
+    import wire_format
+    return wire_format
+
+
+def body_bytes(event):
+    """Raw payload of an EventData (the SDK yields the AMQP body in sections)"""
+    body = event.body
+    return body if isinstance(body, (bytes, bytearray)) else b"".join(body)
+
+
+def _json_columns(events):
+    columns = {
+        "ts": pd.to_datetime([e.get("ts") or e["Timestamp"] for e in events], utc=True, format="ISO8601")
+                .tz_localize(None).to_numpy(dtype="datetime64[ns]"),
+    }
+    for name in TEXT_COLUMNS:
+        columns[name] = np.array([e[name] for e in events], dtype=object)
+    for name in FLOAT_COLUMNS:
+        columns[name] = np.array([e[name] for e in events], dtype=np.float64)
+    for name, dtype in NUMERIC_COLUMNS.items():
+        columns[name] = np.array([e[name] for e in events], dtype=dtype)
+    return columns
+
+
+def _wire_columns(data, wire):
+    records = wire.decode_records(data)
+    return {
+        "ts": records["epoch"].astype(np.int64).astype("datetime64[s]").astype("datetime64[ns]"),
+        "LocationID": np.array([f"LOC{n:03d}" for n in records["location"].tolist()], dtype=object),
+        "VehicleCount": records["vehicles"].astype(np.int32),
+        "AverageSpeedKMH": records["speed"] / 100.0,
+        "CongestionPercentage": records["congestion"] / 100.0,
+        "IsRushHour": (records["flags"] & wire.FLAG_RUSH_HOUR) != 0,
+        "RushFactor": (records["rush_factor"] / 100.0).astype(np.float32),
+        "DominantVehicleType": np.array(wire.VEHICLE_TYPE_CODES, dtype=object)[records["vehicle_type"]],
+        "WeatherCondition": np.array(wire.WEATHER_CODES, dtype=object)[records["weather"]],
+        "TrafficIncident": np.array(wire.INCIDENT_CODES, dtype=object)[records["incident"]],
+    }
+
+
+def concat_columns(parts):
+    """Join decoded column dicts; columns missing from a part are dropped"""
+    parts = [p for p in parts if len(p["ts"])]
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return {"ts": np.array([], dtype="datetime64[ns]")}
+    keys = set.intersection(*(set(p) for p in parts))
+    return {key: np.concatenate([p[key] for p in parts]) for key in keys}
+
+
+def decode_bodies(bodies):
+    """
+    Decode a partition batch of message bodies into columns
+    JSON events are parsed with one json.loads per batch; CTW1 bodies are
+    zero-copy record views. Returns (columns, undecodable message count)
+    """
+    json_bodies, parts, bad = [], [], 0
+    for body in bodies:
+        if body[:4] == WIRE_MAGIC:
+            try:
+                parts.append(_wire_columns(body, _wire_format()))
+            except ValueError:
+                bad += 1
+        else:
+            json_bodies.append(body)
+    if json_bodies:
+        try:
+            events = json.loads(b"[" + b",".join(json_bodies) + b"]")
+        except ValueError:
+            # One bad message: fall back to per-message parsing and skip it
+            events = []
+            for body in json_bodies:
+                try:
+                    events.append(json.loads(body))
+                except ValueError:
+                    bad += 1
+        try:
+            parts.insert(0, _json_columns(events))
+        except (KeyError, TypeError, ValueError):
+            good = []
+            for event in events:
+                try:
+                    _json_columns([event])
+                    good.append(event)
+                except (KeyError, TypeError, ValueError):
+                    bad += 1
+            parts.insert(0, _json_columns(good))
+    return concat_columns(parts), bad
+
+
+# ---- checkpoints ----
+class LocalCheckpointStore:
+    """Per-partition (offset, sequence number) of the last ingested event"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    namespace TEXT NOT NULL,
+                    eventhub_name TEXT NOT NULL,
+                    consumer_group TEXT NOT NULL,
+                    partition_id TEXT NOT NULL,
+                    offset TEXT,
+                    sequence_number INTEGER,
+                    updated_at REAL,
+                    PRIMARY KEY (namespace, eventhub_name, consumer_group, partition_id)
+                )""")
+
+    def list_checkpoints(self, namespace, eventhub_name, consumer_group):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT partition_id, offset, sequence_number FROM checkpoints "
+                "WHERE namespace = ? AND eventhub_name = ? AND consumer_group = ?",
+                (namespace, eventhub_name, consumer_group)).fetchall()
+        return {pid: {"offset": offset, "sequence_number": seq} for pid, offset, seq in rows}
+
+    def update_checkpoints(self, namespace, eventhub_name, consumer_group, positions):
+        """positions: {partition_id: (offset, sequence_number)}, written in one transaction"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, eventhub_name, consumer_group, partition_id) DO UPDATE SET "
+                "offset = excluded.offset, sequence_number = excluded.sequence_number, "
+                "updated_at = excluded.updated_at",
+                [(namespace, eventhub_name, consumer_group, pid, str(offset), seq, now)
+                 for pid, (offset, seq) in positions.items()])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ---- in-process fake hub ----
+class FakeEventData:
+    def __init__(self, body, offset, sequence_number, partition_key=None):
+        self.body = body
+        self.offset = str(offset)
+        self.sequence_number = sequence_number
+        self.partition_key = partition_key
+
+    def body_as_str(self, encoding="utf-8"):
+        return self.body.decode(encoding)
+
+
+class FakeEventHub:
+    """
+    Partitioned in-memory log: producer() sends like EventHubProducerClient
+    (keyed by partition_key, else round robin), consumer() receives like
+    EventHubConsumerClient.receive_batch with offset starting positions
+    """
+
+    def __init__(self, partitions=4, namespace="fake-hub.local", eventhub_name="traffic-events"):
+        self.partition_ids = [str(i) for i in range(partitions)]
+        self.namespace = namespace
+        self.eventhub_name = eventhub_name
+        self._log = {pid: [] for pid in self.partition_ids}
+        self._cond = threading.Condition()
+        self._round_robin = itertools.cycle(self.partition_ids)
+
+    def publish(self, bodies, partition_id=None, partition_key=None):
+        with self._cond:
+            for body in bodies:
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+                pid = partition_id
+                if pid is None:
+                    pid = (self.partition_ids[zlib.crc32(partition_key.encode()) % len(self.partition_ids)]
+                           if partition_key is not None else next(self._round_robin))
+                log = self._log[pid]
+                # Offsets are byte positions like the real service; sequence numbers count from 0
+                offset = 0 if not log else int(log[-1].offset) + len(log[-1].body)
+                log.append(FakeEventData(body, offset, len(log), partition_key))
+            self._cond.notify_all()
+
+    def partition_size(self, partition_id):
+        return len(self._log[partition_id])
+
+    def producer(self):
+        return _FakeHubProducer(self)
+
+    def consumer(self):
+        return FakeConsumerClient(self)
+
+
+class _FakeHubBatch(list):
+    def __init__(self, partition_id=None, partition_key=None):
+        super().__init__()
+        self.partition_id = partition_id
+        self.partition_key = partition_key
+
+    def add(self, event):
+        self.append(event)
+
+
+class _FakeHubProducer:
+    def __init__(self, hub):
+        self.hub = hub
+
+    def get_partition_ids(self):
+        return list(self.hub.partition_ids)
+
+    def create_batch(self, partition_id=None, partition_key=None, **kwargs):
+        return _FakeHubBatch(partition_id, partition_key)
+
+    def send_batch(self, batch, partition_id=None, partition_key=None, **kwargs):
+        bodies = [body_bytes(e) if hasattr(e, "body") else e for e in batch]
+        self.hub.publish(bodies, getattr(batch, "partition_id", None) or partition_id,
+                         getattr(batch, "partition_key", None) or partition_key)
+
+    def close(self):
+        pass
+
+
+class FakeConsumerClient:
+    def __init__(self, hub):
+        self.hub = hub
+        self.eventhub_name = hub.eventhub_name
+        self.fully_qualified_namespace = hub.namespace
+        self._closed = threading.Event()
+
+    def get_partition_ids(self):
+        return list(self.hub.partition_ids)
+
+    def _start_index(self, log, starting_position, inclusive):
+        if starting_position in (None, "@latest"):
+            return len(log)
+        if starting_position in ("-1", -1):
+            return 0
+        if isinstance(starting_position, int):  # sequence number
+            return starting_position + (0 if inclusive else 1)
+        offsets = [int(e.offset) for e in log]
+        index = int(np.searchsorted(offsets, int(starting_position)))
+        if index < len(log) and offsets[index] == int(starting_position) and not inclusive:
+            index += 1
+        return index
+
+    def receive_batch(self, on_event_batch, partition_id=None, starting_position=None,
+                      starting_position_inclusive=False, max_batch_size=300, max_wait_time=None,
+                      **kwargs):
+        log = self.hub._log[partition_id]
+        context = _FakePartitionContext(partition_id, self)
+        with self.hub._cond:
+            position = self._start_index(log, starting_position, starting_position_inclusive)
+        while not self._closed.is_set():
+            with self.hub._cond:
+                if position >= len(log):
+                    self.hub._cond.wait(timeout=max_wait_time or 0.1)
+                events = log[position:position + max_batch_size]
+            position += len(events)
+            if events or max_wait_time is not None:
+                on_event_batch(context, events)
+
+    def close(self):
+        self._closed.set()
+        with self.hub._cond:
+            self.hub._cond.notify_all()
+
+
+class _FakePartitionContext:
+    def __init__(self, partition_id, client):
+        self.partition_id = partition_id
+        self.eventhub_name = client.eventhub_name
+        self.fully_qualified_namespace = client.fully_qualified_namespace
+
+
+# ---- self-check ----
+def self_check(events=20_000, partitions=4):
+    """Simulator -> fake hub -> EventHubSource -> worker, then restart and resume"""
+    import tempfile
+    from ingest import EventHubSource, IngestWorker
+    from event_buffer import EventBuffer
+    from rollups import Rollups
+
+    if str(SIMULATOR_DIR) not in sys.path:
+        sys.path.insert(0, str(SIMULATOR_DIR))
+    import python_traffic_simulator as sim
+    wire = _wire_format()
+
+    hub = FakeEventHub(partitions)
+    batch = sim.generate_traffic_batch(events, rng=1, interval_seconds=0.01)
+    payloads = [json.dumps(e) for e in sim.batch_to_events(batch)]
+    half = events // 2
+    hub.publish(payloads[:half])
+    # A few compact wire micro-batches ride along with the JSON events
+    hub.publish([wire.encode_events(sim.batch_to_events(sim.generate_traffic_batch(500, rng=2)))])
+
+    def run(checkpoints, expect):
+        buffer = EventBuffer(10 * events, sim.LOCATIONS, sim.VEHICLE_TYPES,
+                             sim.WEATHER_CONDITIONS, sim.TRAFFIC_INCIDENTS)
+        worker = IngestWorker(buffer, Rollups(len(sim.LOCATIONS), len(sim.VEHICLE_TYPES)))
+        source = EventHubSource(eventhub_name=hub.eventhub_name, checkpoint_path=checkpoints,
+                                starting_position="-1", client_factory=hub.consumer)
+        started = time.perf_counter()
+        worker.start(source)
+        while worker.events_ingested < expect and time.perf_counter() - started < 30 and not worker.error:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        time.sleep(0.3)   # anything beyond `expect` would be a re-read
+        worker.stop()
+        return worker, elapsed
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoints = str(Path(directory) / "checkpoints.db")
+        first, elapsed = run(checkpoints, half + 500)
+        print(f"first run: {first.events_ingested:,} events from {partitions} partitions "
+              f"in {elapsed:.2f} s ({first.events_ingested / elapsed:,.0f} events/s), error={first.error}")
+        hub.publish(payloads[half:])
+        second, _ = run(checkpoints, events - half)
+        print(f"restart: {second.events_ingested:,} new events (expected {events - half:,}), "
+              f"error={second.error}")
+        ok = (first.events_ingested == half + 500 and second.events_ingested == events - half
+              and first.error is None and second.error is None)
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(self_check())
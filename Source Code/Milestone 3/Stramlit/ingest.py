@@ -0,0 +1,294 @@
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from alerts import AlertLog, detect_batch
+from location_state import LocationState
+
+# ----------------------------
+# Background ingest for the dashboard
+# ----------------------------
+# A single worker thread pulls events from a source (local generator, file
+# replay or Event Hub) into the shared EventBuffer + Rollups at full rate,
+# independent of Streamlit reruns. UI reruns only take the lock briefly to
+# read a snapshot of what has been ingested so far.
+
+MAX_ALERTS_KEEP = 100_000
+
+# Replay engine lives with the simulator (Milestone 1)
+SIMULATOR_DIR = Path(__file__).resolve().parent.parent.parent / "Milestone 1"
+
+
+# ---- sources: each yields lists of event dicts (or decoded columns) until stop is set ----
+class LocalGeneratorSource:
+    """Calls the dashboard's generator `rate` times per second"""
+    name = "Local simulator"
+
+    def __init__(self, generate, rate=1000, tick=0.1):
+        self.generate = generate
+        self.rate = rate
+        self.tick = tick
+
+    def batches(self, stop):
+        owed = 0.0
+        last = time.monotonic()
+        while not stop.is_set():
+            now = time.monotonic()
+            owed += (now - last) * self.rate
+            last = now
+            n = int(owed)
+            if n:
+                owed -= n
+                stamp = datetime.now(timezone.utc)
+                yield [self.generate(stamp) for _ in range(n)]
+            stop.wait(self.tick)
+
+
+class FileReplaySource:
+    """Replays a JSONL / Parquet capture with time compression (speedup 0 = unbounded)"""
+    name = "File replay"
+
+    def __init__(self, path, speedup=0, chunk_size=5000, loop=False):
+        self.path = path
+        self.speedup = speedup
+        self.chunk_size = chunk_size
+        self.loop = loop
+
+    def batches(self, stop):
+        if str(SIMULATOR_DIR) not in sys.path:
+            sys.path.insert(0, str(SIMULATOR_DIR))
+        from replay import read_event_chunks, paced
+
+        while not stop.is_set():
+            for events in paced(read_event_chunks(self.path, self.chunk_size), self.speedup, stop=stop):
+                yield events
+                if stop.is_set():
+                    return
+            if not self.loop:
+                return
+
+
+class EventHubSource:
+    """
+    Receives events from all Event Hub partitions concurrently
+    Each partition has its own receive thread that decodes a whole batch
+    into columns (hub_consumer.decode_bodies). Once the worker has ingested
+    a batch, the last offset per partition goes to the local checkpoint
+    store, so a restarted dashboard resumes after the last ingested event
+    instead of at starting_position ("@latest" or "-1" = from the start)
+    client_factory() returns a consumer client (default: from connection_str)
+    """
+    name = "Event Hub"
+
+    def __init__(self, connection_str=None, eventhub_name=None, consumer_group="$Default", max_batch=1000,
+                 checkpoint_path=None, starting_position="@latest", client_factory=None):
+        self.connection_str = connection_str
+        self.eventhub_name = eventhub_name
+        self.consumer_group = consumer_group
+        self.max_batch = max_batch
+        self.checkpoint_path = checkpoint_path
+        self.starting_position = starting_position
+        self.client_factory = client_factory
+        self.undecodable = 0        # messages skipped because they could not be decoded
+
+    def _client(self):
+        if self.client_factory is not None:
+            return self.client_factory()
+        from azure.eventhub import EventHubConsumerClient
+
+        return EventHubConsumerClient.from_connection_string(
+            self.connection_str, consumer_group=self.consumer_group, eventhub_name=self.eventhub_name)
+
+    def batches(self, stop):
+        from hub_consumer import LocalCheckpointStore, body_bytes, concat_columns, decode_bodies
+
+        client = self._client()
+        store = LocalCheckpointStore(self.checkpoint_path) if self.checkpoint_path else None
+        scope = (getattr(client, "fully_qualified_namespace", ""), self.eventhub_name, self.consumer_group)
+        checkpoints = store.list_checkpoints(*scope) if store else {}
+        received = queue.Queue(maxsize=100)   # per run: a restart must not replay leftovers
+        errors = []
+
+        def on_event_batch(partition_context, events):
+            if not events:
+                return
+            columns, bad = decode_bodies([body_bytes(e) for e in events])
+            item = (partition_context.partition_id, columns, bad,
+                    events[-1].offset, events[-1].sequence_number)
+            while not stop.is_set():   # backpressure: wait for the worker, but never past stop
+                try:
+                    received.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def receive(partition_id):
+            checkpoint = checkpoints.get(partition_id)
+            try:
+                client.receive_batch(
+                    on_event_batch=on_event_batch, partition_id=partition_id,
+                    starting_position=checkpoint["offset"] if checkpoint else self.starting_position,
+                    starting_position_inclusive=False,
+                    max_batch_size=self.max_batch, max_wait_time=1)
+            except Exception as err:
+                if not stop.is_set():
+                    errors.append(err)
+
+        receivers = [threading.Thread(target=receive, args=(pid,), daemon=True,
+                                      name=f"eventhub-partition-{pid}")
+                     for pid in client.get_partition_ids()]
+        for receiver in receivers:
+            receiver.start()
+        positions = {}
+        try:
+            while not stop.is_set():
+                if errors:
+                    raise errors[0]
+                try:
+                    items = [received.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+                while len(items) < len(receivers) * 4:   # merge whatever else is already waiting
+                    try:
+                        items.append(received.get_nowait())
+                    except queue.Empty:
+                        break
+                for partition_id, _, bad, offset, sequence_number in items:
+                    self.undecodable += bad
+                    positions[partition_id] = (offset, sequence_number)
+                columns = concat_columns([columns for _, columns, _, _, _ in items])
+                if len(columns["ts"]):   # nothing decodable: no batch, but move past it
+                    yield columns
+                # The worker has ingested the batch by the time the generator resumes
+                if store:
+                    store.update_checkpoints(*scope, positions)
+                positions = {}
+        finally:
+            # The worker only abandons the generator after ingesting when it is stopping
+            if store and positions and stop.is_set():
+                store.update_checkpoints(*scope, positions)
+            client.close()
+            for receiver in receivers:
+                receiver.join(timeout=2)
+            if store:
+                store.close()
+
+
+# ---- worker ----
+class IngestWorker:
+    def __init__(self, buffer, rollups, max_alerts=MAX_ALERTS_KEEP):
+        self.buffer = buffer
+        self.rollups = rollups
+        self.lock = threading.RLock()
+        self.alerts = AlertLog(max_alerts)
+        self.latest = LocationState(len(buffer.locations))
+        self.version = 0            # bumped on every ingested batch
+        self.history = None         # optional HistoryStore (persistent copy of every batch)
+        self.events_ingested = 0
+        self.source = None
+        self.error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._rate = deque(maxlen=50)   # (monotonic time, events_ingested)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, source=None):
+        if source is not None and source is not self.source:
+            self.stop()
+            self.source = source
+        if self.running or self.source is None:
+            return
+        self._stop = threading.Event()
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="dashboard-ingest", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def reset(self):
+        with self.lock:
+            self.buffer.clear()
+            self.rollups.clear()
+            self.alerts.clear()
+            self.latest.clear()
+            self.version += 1
+
+    def _run(self):
+        try:
+            for batch in self.source.batches(self._stop):
+                if batch:
+                    self.ingest(batch)
+                if self._stop.is_set():
+                    break
+        except Exception as err:  # surface source failures in the UI instead of dying silently
+            self.error = f"{type(err).__name__}: {err}"
+
+    @property
+    def alert_seq(self):
+        """Total alerts ever raised (for "new since" checks)"""
+        return self.alerts.next_seq
+
+    def ingest(self, events):
+        """events: list of event dicts, or decoded columns (see EventBuffer.extend_columns)"""
+        with self.lock:
+            buf = self.buffer
+            if isinstance(events, dict):
+                count = buf.extend_columns(events)
+            else:
+                count = len(events)
+                buf.extend(events)
+            if count == 0:
+                return
+            n = min(count, buf.capacity)
+            # Read the just-written columns back from the buffer (views, no copies)
+            start = len(buf) - n
+            ts = buf.column("ts", start)
+            loc = buf.column("LocationCode", start)
+            speed = buf.column("AverageSpeedKMH", start)
+            cong = buf.column("CongestionPercentage", start)
+            incident = buf.column("TrafficIncident", start)
+            epoch = ts.astype("datetime64[s]").astype(np.int64)
+            vehicles = buf.column("VehicleCount", start)
+            vtype = buf.column("DominantVehicleType", start)
+            self.rollups.add_arrays(epoch, loc, vehicles, speed, cong, vtype)
+            self.latest.update(loc, epoch, vehicles, speed, cong)
+            flags = detect_batch(speed, cong, incident, buf.incidents.encode("None"))
+            hit = flags != 0
+            self.alerts.append(ts[hit], loc[hit], flags[hit], incident[hit], speed[hit], cong[hit])
+            if self.history is not None:
+                self.history.sync_codes(buf)
+                self.history.append(epoch, loc, vehicles, speed, cong, vtype,
+                                    buf.column("WeatherCondition", start), incident, hit, flags)
+            self.events_ingested += count
+            self.version += 1
+            self._rate.append((time.monotonic(), self.events_ingested))
+
+    def alerts_since(self, seq, last=None):
+        """
+        (count, DataFrame of the newest `last`, next seq) for alerts raised
+        at/after sequence number `seq`; pass next seq to the following call
+        """
+        with self.lock:
+            count = self.alerts.count_since(seq)
+            shown = count if last is None else min(count, last)
+            return count, self.alerts.frame(self.buffer, last=shown), self.alerts.next_seq
+
+    def events_per_second(self):
+        with self.lock:
+            if len(self._rate) < 2:
+                return 0.0
+            (t0, n0), (t1, n1) = self._rate[0], self._rate[-1]
+        return (n1 - n0) / (t1 - t0) if t1 > t0 else 0.0
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Latest reading per location (Map tab)
+# ----------------------------
+# One row per sensor, indexed by location code and overwritten on ingest
+# with the newest event of each batch. version changes only when a batch
+# lands, so the map can be cached on it; colors and radii are computed for
+# all locations at once.
+
+COLOR_ALPHA = 200
+
+
+class LocationState:
+    def __init__(self, n_locations=0):
+        self.version = 0
+        self._alloc(n_locations)
+
+    def _alloc(self, n):
+        self.seen = np.zeros(n, dtype=bool)
+        self.epoch = np.zeros(n, dtype=np.int64)
+        self.vehicles = np.zeros(n, dtype=np.int32)
+        self.speed = np.zeros(n, dtype=np.float64)
+        self.congestion = np.zeros(n, dtype=np.float64)
+
+    def _grow(self, n):
+        old = (self.seen, self.epoch, self.vehicles, self.speed, self.congestion)
+        size = len(self.seen)
+        self._alloc(max(n, 2 * size))
+        for new, arr in zip((self.seen, self.epoch, self.vehicles, self.speed, self.congestion), old):
+            new[:size] = arr
+
+    def clear(self):
+        self.seen[:] = False
+        self.version += 1
+
+    def update(self, loc, epoch, vehicles, speed, congestion):
+        """Apply a batch (arrays in arrival order): newest event per location wins"""
+        if len(loc) == 0:
+            return
+        top = int(loc.max()) + 1
+        if top > len(self.seen):
+            self._grow(top)
+        # First occurrence in the reversed batch = last occurrence in time
+        codes, rev_idx = np.unique(loc[::-1], return_index=True)
+        last = len(loc) - 1 - rev_idx
+        newer = ~self.seen[codes] | (epoch[last] >= self.epoch[codes])
+        codes, last = codes[newer], last[newer]
+        self.seen[codes] = True
+        self.epoch[codes] = epoch[last]
+        self.vehicles[codes] = vehicles[last]
+        self.speed[codes] = speed[last]
+        self.congestion[codes] = congestion[last]
+        self.version += 1
+
+    def map_frame(self, locations):
+        """Seen locations with position, readings, fill color columns and radius"""
+        codes = np.nonzero(self.seen[:len(locations)])[0]
+        cong = self.congestion[codes]
+        return pd.DataFrame({
+            "LocationName": [locations[i]["name"] for i in codes],
+            "Latitude": np.array([locations[i]["lat"] for i in codes], dtype=np.float64),
+            "Longitude": np.array([locations[i]["lon"] for i in codes], dtype=np.float64),
+            "VehicleCount": self.vehicles[codes],
+            "AverageSpeedKMH": self.speed[codes],
+            "CongestionPercentage": cong,
+            "color_r": np.minimum(255, (cong * 2.5).astype(np.int64)),
+            "color_g": 50,
+            "color_b": 150,
+            "radius": (cong + 5) * 20,
+        })
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# Time-bucket rollups for the Analytics tab
+# ----------------------------
+# Incremental per-location aggregates at 1-second, 1-minute and 5-minute
+# resolution, updated on ingest. Each level is a ring of buckets: a slot is
+# reset the first time an event for a newer bucket lands on it. Queries pick
+# the finest level whose retention still covers the requested window, so a
+# chart scans at most a few hundred buckets whatever the window length.
+
+# (bucket seconds, buckets retained)
+ROLLUP_LEVELS = (
+    (1, 360),     # 1s buckets  -> last 5 minutes (+ margin)
+    (60, 70),     # 1m buckets  -> last hour
+    (300, 300),   # 5m buckets  -> last 24 hours
+)
+
+
+class _Level:
+    def __init__(self, bucket_seconds, n_buckets, n_locations, n_vehicle_types):
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = n_buckets
+        self.bucket_id = np.full(n_buckets, -1, dtype=np.int64)
+        self.n_locations = 0
+        self.n_vehicle_types = 0
+        self._alloc(n_locations, n_vehicle_types)
+
+    def _alloc(self, n_locations, n_vehicle_types):
+        """(Re)allocate per-location / per-type arrays, keeping existing data"""
+        def grow(old, shape, fill, dtype):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:, :old.shape[1]] = old
+            return new
+
+        n, L, V = self.n_buckets, n_locations, n_vehicle_types
+        if L > self.n_locations:
+            first = self.n_locations == 0
+            self.count = grow(None if first else self.count, (n, L), 0, np.int32)
+            self.speed_sum = grow(None if first else self.speed_sum, (n, L), 0.0, np.float64)
+            self.speed_min = grow(None if first else self.speed_min, (n, L), np.inf, np.float64)
+            self.speed_max = grow(None if first else self.speed_max, (n, L), -np.inf, np.float64)
+            self.cong_sum = grow(None if first else self.cong_sum, (n, L), 0.0, np.float64)
+            self.cong_min = grow(None if first else self.cong_min, (n, L), np.inf, np.float64)
+            self.cong_max = grow(None if first else self.cong_max, (n, L), -np.inf, np.float64)
+            self.vehicle_sum = grow(None if first else self.vehicle_sum, (n, L), 0.0, np.float64)
+            self.n_locations = L
+        if V > self.n_vehicle_types:
+            first = self.n_vehicle_types == 0
+            self.vtype_count = grow(None if first else self.vtype_count, (n, V), 0, np.int32)
+            self.n_vehicle_types = V
+
+    def ensure(self, n_locations, n_vehicle_types):
+        if n_locations > self.n_locations or n_vehicle_types > self.n_vehicle_types:
+            self._alloc(max(n_locations, self.n_locations), max(n_vehicle_types, self.n_vehicle_types))
+
+    def _reset(self, slots, buckets):
+        self.bucket_id[slots] = buckets
+        self.count[slots] = 0
+        self.speed_sum[slots] = 0.0
+        self.speed_min[slots] = np.inf
+        self.speed_max[slots] = -np.inf
+        self.cong_sum[slots] = 0.0
+        self.cong_min[slots] = np.inf
+        self.cong_max[slots] = -np.inf
+        self.vehicle_sum[slots] = 0.0
+        self.vtype_count[slots] = 0
+
+    def add(self, epoch, loc, vehicles, speed, cong, vtype):
+        bucket = int(epoch) // self.bucket_seconds
+        s = bucket % self.n_buckets
+        current = self.bucket_id[s]
+        if bucket < current:
+            return  # older than what this slot now holds - already aged out
+        if bucket != current:
+            self._reset(s, bucket)
+        self.count[s, loc] += 1
+        self.speed_sum[s, loc] += speed
+        self.cong_sum[s, loc] += cong
+        self.vehicle_sum[s, loc] += vehicles
+        if speed < self.speed_min[s, loc]: self.speed_min[s, loc] = speed
+        if speed > self.speed_max[s, loc]: self.speed_max[s, loc] = speed
+        if cong < self.cong_min[s, loc]: self.cong_min[s, loc] = cong
+        if cong > self.cong_max[s, loc]: self.cong_max[s, loc] = cong
+        self.vtype_count[s, vtype] += 1
+
+    def add_arrays(self, epoch, loc, vehicles, speed, cong, vtype):
+        bucket = epoch.astype(np.int64) // self.bucket_seconds
+        # Only the newest n_buckets buckets of the batch can be retained
+        keep = bucket > bucket.max() - self.n_buckets
+        slots = bucket % self.n_buckets
+        keep &= bucket >= self.bucket_id[slots]
+        if not keep.all():
+            bucket, slots = bucket[keep], slots[keep]
+            loc, vehicles, speed, cong, vtype = loc[keep], vehicles[keep], speed[keep], cong[keep], vtype[keep]
+        stale = self.bucket_id[slots] != bucket
+        if stale.any():
+            stale_slots, first = np.unique(slots[stale], return_index=True)
+            self._reset(stale_slots, bucket[stale][first])
+
+        np.add.at(self.count, (slots, loc), 1)
+        np.add.at(self.speed_sum, (slots, loc), speed)
+        np.add.at(self.cong_sum, (slots, loc), cong)
+        np.add.at(self.vehicle_sum, (slots, loc), vehicles)
+        np.minimum.at(self.speed_min, (slots, loc), speed)
+        np.maximum.at(self.speed_max, (slots, loc), speed)
+        np.minimum.at(self.cong_min, (slots, loc), cong)
+        np.maximum.at(self.cong_max, (slots, loc), cong)
+        np.add.at(self.vtype_count, (slots, vtype), 1)
+
+    def select(self, since_epoch=None):
+        """Slots holding buckets that start at/after since_epoch, oldest first"""
+        valid = self.bucket_id >= 0
+        if since_epoch is not None:
+            valid &= self.bucket_id >= int(since_epoch) // self.bucket_seconds
+        slots = np.nonzero(valid)[0]
+        return slots[np.argsort(self.bucket_id[slots])]
+
+    def clear(self):
+        self.bucket_id[:] = -1
+
+
+class Rollups:
+    def __init__(self, n_locations, n_vehicle_types, levels=ROLLUP_LEVELS):
+        self.levels = [_Level(sec, n, n_locations, n_vehicle_types) for sec, n in levels]
+
+    def clear(self):
+        for level in self.levels:
+            level.clear()
+
+    # ---- ingest ----
+    def add(self, epoch, loc, vehicles, speed, cong, vtype):
+        """One event: epoch seconds, location code, vehicle count, speed, congestion, vehicle type code"""
+        for level in self.levels:
+            level.ensure(loc + 1, vtype + 1)
+            level.add(epoch, loc, vehicles, speed, cong, vtype)
+
+    def add_arrays(self, epoch, loc, vehicles, speed, cong, vtype):
+        """Vectorized add for a batch of events (same fields as add, as arrays)"""
+        if len(epoch) == 0:
+            return
+        for level in self.levels:
+            level.ensure(int(loc.max()) + 1, int(vtype.max()) + 1)
+            level.add_arrays(epoch, loc, vehicles, speed, cong, vtype)
+
+    # ---- queries ----
+    def level_for(self, window_seconds):
+        """Finest level whose retention covers the window (coarsest for 'All')"""
+        if window_seconds is not None:
+            for level in self.levels:
+                if level.bucket_seconds * level.n_buckets >= window_seconds:
+                    return level
+        return self.levels[-1]
+
+    def _slots(self, window_seconds, now_epoch):
+        level = self.level_for(window_seconds)
+        since = None if window_seconds is None else now_epoch - window_seconds
+        return level, level.select(since)
+
+    def timeseries(self, window_seconds, now_epoch):
+        """Per-bucket totals across locations: ts, Events, VehicleCount, AverageSpeedKMH (+min/max)"""
+        level, slots = self._slots(window_seconds, now_epoch)
+        count = level.count[slots].sum(axis=1)
+        has = count > 0
+        slots, count = slots[has], count[has]
+        with np.errstate(invalid="ignore"):
+            return pd.DataFrame({
+                "ts": (level.bucket_id[slots] * level.bucket_seconds).astype("datetime64[s]"),
+                "Events": count,
+                "VehicleCount": level.vehicle_sum[slots].sum(axis=1) / count,
+                "AverageSpeedKMH": level.speed_sum[slots].sum(axis=1) / count,
+                "MinSpeedKMH": level.speed_min[slots].min(axis=1),
+                "MaxSpeedKMH": level.speed_max[slots].max(axis=1),
+                "AvgCongestion": level.cong_sum[slots].sum(axis=1) / count,
+                "MaxCongestion": level.cong_max[slots].max(axis=1),
+            })
+
+    def vehicle_mix(self, window_seconds, now_epoch):
+        """Event count per vehicle type code over the window"""
+        level, slots = self._slots(window_seconds, now_epoch)
+        return level.vtype_count[slots].sum(axis=0)
+
+    def location_congestion(self, window_seconds, now_epoch):
+        """(event count, mean congestion) per location code over the window"""
+        level, slots = self._slots(window_seconds, now_epoch)
+        count = level.count[slots].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = level.cong_sum[slots].sum(axis=0) / count
+        return count, mean
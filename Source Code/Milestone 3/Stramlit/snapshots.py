@@ -0,0 +1,133 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# ----------------------------
+# Shared, versioned snapshots of the ingest worker (all browser sessions)
+# ----------------------------
+# Every viewer used to lock the worker and recompute the same overview,
+# rollup windows and alert tables on each autorefresh. The publisher builds
+# one Snapshot per worker version (at most every min_interval seconds) and
+# hands the same object to every session, so N viewers cost one build.
+# Snapshots are treated as immutable: arrays are read-only and frames must
+# not be modified; anything derived from one (charts, history queries) is
+# memoized on it with memo() so it is also computed once per version.
+
+# In-memory windows prepared for the Analytics tab (None = All)
+ANALYTICS_WINDOWS = (5 * 60, 60 * 60, 24 * 60 * 60, None)
+RECENT_SECONDS = 5 * 60  # Overview "last 5m" metrics
+VIEWER_TIMEOUT = 30.0    # A session counts as watching for this long after a read
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+
+class Snapshot:
+    def __init__(self, version, worker, alerts_rows):
+        self.version = version
+        self.taken_at = datetime.now(timezone.utc)
+        now_epoch = self.taken_at.timestamp()
+        buf = worker.buffer
+        self.locations = buf.locations
+        self.total_events = len(buf)
+        self.ingest_rate = worker.events_per_second()
+
+        # Overview
+        self.latest = None
+        self.recent_n = 0
+        if self.total_events:
+            self.latest = buf.latest()
+            recent = buf.since(self.taken_at - timedelta(seconds=RECENT_SECONDS))
+            speed = buf.column("AverageSpeedKMH")[recent]
+            cong = buf.column("CongestionPercentage")[recent]
+            self.recent_n = len(speed)
+            self.recent_speed = speed.mean() if self.recent_n else self.latest["AverageSpeedKMH"]
+            self.recent_cong = cong.mean() if self.recent_n else self.latest["CongestionPercentage"]
+
+        # Analytics: window seconds -> (bucket seconds, series, vehicle names/counts, location names/means)
+        self.analytics = {}
+        rollups = worker.rollups
+        for window in ANALYTICS_WINDOWS:
+            vcounts = _freeze(rollups.vehicle_mix(window, now_epoch))
+            loc_count, loc_cong = rollups.location_congestion(window, now_epoch)
+            seen = np.nonzero(loc_count)[0]
+            self.analytics[window] = (
+                rollups.level_for(window).bucket_seconds,
+                rollups.timeseries(window, now_epoch),
+                tuple(buf.vehicle_types.values[:len(vcounts)]),
+                vcounts,
+                tuple(buf.locations[i]["name"] for i in seen),
+                _freeze(loc_cong[seen]),
+            )
+
+        # Alerts and map
+        self.alert_total = len(worker.alerts)
+        self.alerts = worker.alerts.frame(buf, last=alerts_rows)
+        self.alert_type_counts = worker.alerts.type_counts()
+        self.map_version = worker.latest.version
+        self.map_frame = worker.latest.map_frame(buf.locations)
+
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+    def memo(self, key, build):
+        """build() once per snapshot and key; concurrent sessions share the result"""
+        with self._memo_lock:
+            if key not in self._memo:
+                self._memo[key] = build()
+            return self._memo[key]
+
+
+class SnapshotPublisher:
+    """Hands out the current Snapshot, rebuilding it when the worker has moved on"""
+
+    def __init__(self, worker, min_interval=0.5, alerts_rows=1000):
+        self.worker = worker
+        self.min_interval = min_interval
+        self.alerts_rows = alerts_rows
+        self.builds = 0
+        self._snapshot = None
+        self._built_at = 0.0
+        self._build_lock = threading.Lock()
+        self._viewers = {}
+
+    def _build(self):
+        with self.worker.lock:
+            snapshot = Snapshot(self.worker.version, self.worker, self.alerts_rows)
+        self._snapshot, self._built_at = snapshot, time.monotonic()
+        self.builds += 1
+        return snapshot
+
+    def current(self, viewer=None, force=False):
+        if viewer is not None:
+            self._viewers[viewer] = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and not force:
+            if (snapshot.version == self.worker.version
+                    or time.monotonic() - self._built_at < self.min_interval):
+                return snapshot
+            # Stale: one session rebuilds, the others keep showing the previous version
+            if not self._build_lock.acquire(blocking=False):
+                return snapshot
+        else:
+            self._build_lock.acquire()
+        try:
+            latest = self._snapshot
+            if not force and latest is not snapshot and latest.version == self.worker.version:
+                return latest  # built by another session while we waited
+            return self._build()
+        finally:
+            self._build_lock.release()
+
+    def viewers(self):
+        """Sessions that read a snapshot within VIEWER_TIMEOUT seconds"""
+        cutoff = time.monotonic() - VIEWER_TIMEOUT
+        for viewer, seen in list(self._viewers.items()):
+            if seen < cutoff:
+                self._viewers.pop(viewer, None)
+        return len(self._viewers)
@@ -1,17 +1,26 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import random
-from datetime import datetime, timezone, timedelta
-import pydeck as pdk
-import plotly.express as px
-from streamlit_autorefresh import st_autorefresh
+import uuid
+from datetime import datetime, timezone
+from event_buffer import EventBuffer
+from rollups import Rollups
+from ingest import IngestWorker, LocalGeneratorSource, FileReplaySource, EventHubSource
+from location_state import COLOR_ALPHA
+from snapshots import SnapshotPublisher
+# pydeck, plotly, streamlit_autorefresh and the history store are imported
+# where they are used, so they load only once a tab or mode needs them
 
 # ----------------------------
 # Settings / Constants
 # ----------------------------
 SIM_DEFAULT_INTERVAL = 1  # seconds
-MAX_EVENTS_KEEP = 5000
+SIM_DEFAULT_RATE = 100  # generated events per second (background ingest)
+ALERTS_TABLE_ROWS = 1000  # newest alerts listed in the Alerts tab
+MAX_EVENTS_KEEP = 1_000_000  # ring buffer capacity (oldest events are overwritten)
+HISTORY_DB_PATH = "traffic_history.db"  # persistent event / alert history (SQLite)
+HISTORY_RETENTION_DAYS = 30  # older history is deleted while recording
+EVENTHUB_CHECKPOINT_PATH = "eventhub_checkpoints.db"  # last ingested offset per partition (SQLite)
 
 LOCATIONS = [
     {"id": "LOC001", "name": "Tahrir Square", "lat": 30.0444, "lon": 31.2357, "cap": 120},
@@ -88,20 +97,6 @@ def generate_realistic_traffic_data(now=None):
     }
     return event
 
-def detect_anomaly(event):
-    alerts = []
-    if event["AverageSpeedKMH"] < 10:
-        alerts.append("Low speed")
-    if event["AverageSpeedKMH"] > 100:
-        alerts.append("High speed")
-    if event["CongestionPercentage"] > 120:
-        alerts.append("Over capacity")
-    elif event["CongestionPercentage"] > 85:
-        alerts.append("High congestion")
-    if event["TrafficIncident"] != "None":
-        alerts.append(f"Incident: {event['TrafficIncident']}")
-    return alerts
-
 # ----------------------------
 # Streamlit UI
 # ----------------------------
@@ -112,49 +107,98 @@ st.markdown("Real-time simulator — Cairo traffic (Map, Analytics, Alerts).")
 with st.sidebar:
     st.header("Controls")
     interval = st.slider("Refresh interval (seconds)", 1, 5, value=SIM_DEFAULT_INTERVAL)
+    source_name = st.selectbox("Data source", ["Local simulator", "File replay", "Event Hub"])
+    if source_name == "Local simulator":
+        sim_rate = st.slider("Simulator rate (events/sec)", 1, 5000, value=SIM_DEFAULT_RATE)
+    elif source_name == "File replay":
+        replay_path = st.text_input("Capture path (.jsonl / .parquet)")
+        replay_speedup = st.number_input("Replay speed-up (0 = unbounded)", min_value=0.0, value=60.0, step=10.0)
+        replay_loop = st.checkbox("Loop replay", False)
+    else:
+        eh_conn_str = st.text_input("Event Hub connection string", type="password")
+        eh_name = st.text_input("Event Hub name", "traffic-events")
+        eh_group = st.text_input("Consumer group", "$Default")
+        eh_checkpoints = st.text_input("Checkpoint file (resume after restart)", EVENTHUB_CHECKPOINT_PATH)
+        eh_start = st.selectbox("Start from (no checkpoint yet)", ["Latest", "Earliest"])
+    st.caption("Source settings apply on Start / Resume.")
     run_sim = st.button("Start / Resume")
     stop_sim = st.button("Stop")
     reset_data = st.button("Reset Data")
     st.markdown("---")
+    history_path = st.text_input("History database (SQLite)", HISTORY_DB_PATH)
+    # Recording is a property of the shared worker; reading is per session
+    start_recording = st.button("Start recording history")
+    stop_recording = st.button("Stop recording history")
+    read_history = st.checkbox("Show stored history", False)
+    st.markdown("---")
     st.markdown("Display Tabs")
     show_overview = st.checkbox("Overview", True)
     show_map = st.checkbox("Map", True)
     show_analytics = st.checkbox("Analytics", True)
     show_alerts = st.checkbox("Alerts", True)
 
-if "df" not in st.session_state: st.session_state.df = pd.DataFrame()
-if "running" not in st.session_state: st.session_state.running = False
-if "alerts" not in st.session_state: st.session_state.alerts = []
+def new_event_buffer():
+    return EventBuffer(MAX_EVENTS_KEEP, LOCATIONS, VEHICLE_TYPES, WEATHER_CONDITIONS, TRAFFIC_INCIDENTS)
+
+# One ingest worker per server process, shared by every browser session
+@st.cache_resource
+def get_ingest_worker():
+    return IngestWorker(new_event_buffer(), Rollups(len(LOCATIONS), len(VEHICLE_TYPES)))
+
+# Versioned read-only snapshots of the worker, built once per version for all sessions
+@st.cache_resource
+def get_snapshot_publisher():
+    return SnapshotPublisher(get_ingest_worker(), alerts_rows=ALERTS_TABLE_ROWS)
+
+# One history store per database file, shared like the worker
+@st.cache_resource
+def get_history_store(path):
+    from history_store import HistoryStore
+    return HistoryStore(path, retention_days=HISTORY_RETENTION_DAYS)
+
+def make_source():
+    if source_name == "Local simulator":
+        return LocalGeneratorSource(generate_realistic_traffic_data, rate=sim_rate)
+    if source_name == "File replay":
+        return FileReplaySource(replay_path, speedup=replay_speedup, loop=replay_loop)
+    return EventHubSource(eh_conn_str, eh_name, consumer_group=eh_group, checkpoint_path=eh_checkpoints or None,
+                          starting_position="-1" if eh_start == "Earliest" else "@latest")
+
+worker = get_ingest_worker()
+publisher = get_snapshot_publisher()
+if "alert_seq" not in st.session_state: st.session_state.alert_seq = worker.alert_seq
+if "viewer_id" not in st.session_state: st.session_state.viewer_id = uuid.uuid4().hex
+if start_recording or stop_recording:
+    with worker.lock:
+        worker.history = get_history_store(history_path) if start_recording else None
+recording = worker.history
+history = get_history_store(history_path) if read_history else None
+st.sidebar.caption(f"Recording history to {recording.path}" if recording is not None else "History recording is off.")
 
 if reset_data:
-    st.session_state.df = pd.DataFrame()
-    st.session_state.alerts = []
+    worker.reset()
     st.success("Data reset.")
-if run_sim: st.session_state.running = True
-if stop_sim: st.session_state.running = False
+if run_sim: worker.start(make_source())
+if stop_sim: worker.stop()
+snap = publisher.current(st.session_state.viewer_id, force=bool(reset_data))
+if worker.error:
+    st.error(f"Ingest stopped: {worker.error}")
+if recording is not None and recording.error:
+    st.warning(f"History writes failing: {recording.error}")
 
 # ----------------------------
-# Local Simulator with Autorefresh
+# Background ingest with Autorefresh
 # ----------------------------
-if st.session_state.running:
-    ev = generate_realistic_traffic_data()
-    df = st.session_state.df
-    st.session_state.df = pd.concat([df, pd.DataFrame([ev])], ignore_index=True)
-    if len(st.session_state.df) > MAX_EVENTS_KEEP:
-        st.session_state.df = st.session_state.df.iloc[-MAX_EVENTS_KEEP:].reset_index(drop=True)
-
-    detected = detect_anomaly(ev)
-    if detected:
-        st.session_state.alerts.append({
-            "timestamp": ev["Timestamp"],
-            "location": ev["LocationName"],
-            "event": ", ".join(detected),
-            "raw": ev
-        })
-        for alert_text in detected:
-            st.toast(f"⚠️ {ev['LocationName']}: {alert_text}", icon="⚠️")
+if worker.running:
+    # Toast only the alerts raised since this session last looked
+    n_new, new_alerts, st.session_state.alert_seq = worker.alerts_since(st.session_state.alert_seq, last=5)
+    for alert in new_alerts.itertuples():
+        st.toast(f"⚠️ {alert.location}: {alert.event}", icon="⚠️")
+    if n_new > len(new_alerts):
+        st.toast(f"⚠️ {n_new - len(new_alerts)} more alerts — see the Alerts tab", icon="⚠️")
 
     # Autorefresh every interval seconds
+    from streamlit_autorefresh import st_autorefresh
     st_autorefresh(interval=interval*1000, key="traffic_timer")
 
 # ----------------------------
@@ -173,18 +217,16 @@ if show_overview:
     tab = tab_objs[tabs.index("Overview")]
     with tab:
         st.subheader("Overview — Live Snapshot")
-        df = st.session_state.df
-        if df.empty:
+        if not snap.total_events:
             st.info("No data yet. Click **Start / Resume**.")
         else:
-            latest = df.iloc[-1]
+            latest = snap.latest
             col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Total Events", len(df))
-            now = datetime.now(timezone.utc)
-            recent = df[pd.to_datetime(df["ts"]) >= now - timedelta(minutes=5)]
-            col2.metric("Events (last 5m)", len(recent))
-            col3.metric("Avg Speed (last 5m)", round(recent["AverageSpeedKMH"].mean() if not recent.empty else latest["AverageSpeedKMH"],2))
-            col4.metric("Avg Congestion (last 5m %)", round(recent["CongestionPercentage"].mean() if not recent.empty else latest["CongestionPercentage"],2))
+            col1.metric("Total Events", snap.total_events)
+            col2.metric("Events (last 5m)", snap.recent_n)
+            col3.metric("Avg Speed (last 5m)", round(snap.recent_speed,2))
+            col4.metric("Avg Congestion (last 5m %)", round(snap.recent_cong,2))
+            st.caption(f"Ingest rate: {snap.ingest_rate:,.0f} events/sec")
             st.json({
                 "time": latest["Timestamp"],
                 "location": latest["LocationName"],
@@ -195,77 +237,129 @@ if show_overview:
             })
 
 # ---------- Map ----------
+# Built only when the per-location state changes; reruns without new data hit the cache
+# (_points is not hashed - the snapshot's map version identifies it)
+@st.cache_data(max_entries=4, show_spinner=False)
+def build_map_deck(state_version, _points):
+    points = _points
+    if points.empty:
+        return None
+    import pydeck as pdk
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=points,
+        get_position='[Longitude, Latitude]',
+        get_fill_color=f'[color_r, color_g, color_b, {COLOR_ALPHA}]',
+        get_radius='radius',
+        pickable=True,
+        auto_highlight=True
+    )
+    view_state = pdk.ViewState(latitude=points["Latitude"].mean(), longitude=points["Longitude"].mean(), zoom=11, pitch=30)
+    return pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip={"text":"{LocationName}\nCongestion: {CongestionPercentage}%\nVehicles: {VehicleCount}"})
+
 if show_map:
     tab = tab_objs[tabs.index("Map")]
     with tab:
         st.subheader("Map")
-        df = st.session_state.df
-        if df.empty:
+        deck = build_map_deck(snap.map_version, snap.map_frame)
+        if deck is None:
             st.info("No location points yet.")
         else:
-            latest_per_loc = df.sort_values("ts").groupby("LocationID").last().reset_index()
-            latest_per_loc["color_score"] = latest_per_loc["CongestionPercentage"]
-            midpoint = (latest_per_loc["Latitude"].mean(), latest_per_loc["Longitude"].mean())
-            
-            # Create color mapping function instead of inline expression
-            def get_color(congestion_pct):
-                intensity = min(255, int(congestion_pct * 2.5))
-                return [intensity, 50, 150, 200]
-            
-            latest_per_loc["fill_color"] = latest_per_loc["CongestionPercentage"].apply(get_color)
-            
-            layer = pdk.Layer(
-                "ScatterplotLayer",
-                data=latest_per_loc,
-                get_position='[Longitude, Latitude]',
-                get_fill_color='fill_color',  # Use pre-computed column instead of expression
-                get_radius='(CongestionPercentage+5) * 20',
-                pickable=True,
-                auto_highlight=True
-            )
-            view_state = pdk.ViewState(latitude=midpoint[0], longitude=midpoint[1], zoom=11, pitch=30)
-            r = pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip={"text":"{LocationName}\nCongestion: {CongestionPercentage}%\nVehicles: {VehicleCount}"})
-            st.pydeck_chart(r)
+            st.pydeck_chart(deck)
 
 # ---------- Analytics ----------
 if show_analytics:
     tab = tab_objs[tabs.index("Analytics")]
     with tab:
         st.subheader("Analytics")
-        df = st.session_state.df
-        if df.empty:
+        if not snap.total_events and history is None:
             st.info("No data yet.")
         else:
-            window = st.radio("Time window", ["Last 5 minutes", "Last 1 hour", "Last 24 hours", "All"], index=0, horizontal=True)
-            now = datetime.now(timezone.utc)
-            if window == "Last 5 minutes": cutoff = now - timedelta(minutes=5)
-            elif window == "Last 1 hour": cutoff = now - timedelta(hours=1)
-            elif window == "Last 24 hours": cutoff = now - timedelta(hours=24)
-            else: cutoff = df["ts"].min()
-            filtered = df[pd.to_datetime(df["ts"]) >= cutoff]
-            if not filtered.empty:
-                st.plotly_chart(px.line(filtered, x="ts", y="VehicleCount", title="VehicleCount"), use_container_width=True)
-                st.plotly_chart(px.line(filtered, x="ts", y="AverageSpeedKMH", title="AverageSpeedKMH"), use_container_width=True)
-                vdist = filtered["DominantVehicleType"].value_counts().reset_index()
-                vdist.columns = ["VehicleType","Count"]
-                st.plotly_chart(px.pie(vdist, names="VehicleType", values="Count", title="Vehicle types"), use_container_width=True)
-                toploc = filtered.groupby("LocationName")["CongestionPercentage"].mean().sort_values(ascending=False).reset_index()
-                st.dataframe(toploc.head(10))
+            windows = ["Last 5 minutes", "Last 1 hour", "Last 24 hours"]
+            if history is not None: windows.append("Last 7 days")
+            window = st.radio("Time window", windows + ["All"], index=0, horizontal=True)
+            # Charts read pre-aggregated buckets (1s / 1m / 5m) instead of raw events
+            if window == "Last 5 minutes": window_sec = 5 * 60
+            elif window == "Last 1 hour": window_sec = 60 * 60
+            elif window == "Last 24 hours": window_sec = 24 * 60 * 60
+            elif window == "Last 7 days": window_sec = 7 * 24 * 60 * 60
+            else: window_sec = None
+            loc_filter = []
+            if history is not None:
+                picked = st.multiselect("Locations", [loc["name"] for loc in snap.locations], key="analytics_locations")
+                loc_filter = [loc["id"] for loc in snap.locations if loc["name"] in picked]
+            now_epoch = snap.taken_at.timestamp()
+            # Beyond the in-memory minute window (or filtered by location) read the persisted history
+            if history is not None and (window_sec is None or window_sec > 60 * 60 or loc_filter):
+                def history_window():
+                    start = None if window_sec is None else now_epoch - window_sec
+                    bucket_sec = history.bucket_for(start, now_epoch)
+                    series = history.timeseries(start, now_epoch, loc_filter, bucket_sec)
+                    mix = history.vehicle_mix(start, now_epoch, loc_filter)
+                    vnames = history.codes("vehicle_types")
+                    vcounts = [mix.get(code, 0) for code in range(len(vnames))]
+                    by_loc = history.location_congestion(start, now_epoch, loc_filter)
+                    names = history.location_names()
+                    loc_names = [names.get(code) for code in by_loc]
+                    loc_means = [mean for _, mean in by_loc.values()]
+                    return bucket_sec, series, vnames, vcounts, loc_names, loc_means
+                # Queried once per snapshot and selection, whichever session asks first
+                view = ("history", window_sec, tuple(loc_filter))
+                bucket_sec, series, vnames, vcounts, loc_names, loc_means = snap.memo(view, history_window)
+            else:
+                view = ("live", window_sec)
+                bucket_sec, series, vnames, vcounts, loc_names, loc_means = snap.analytics[window_sec]
+            if series.empty:
+                st.info("No data in this window.")
+            else:
+                def analytics_charts():
+                    import plotly.express as px
+                    vdist = pd.DataFrame({"VehicleType": vnames, "Count": vcounts})
+                    toploc = pd.DataFrame({
+                        "LocationName": loc_names,
+                        "CongestionPercentage": loc_means,
+                    }).sort_values("CongestionPercentage", ascending=False).reset_index(drop=True)
+                    return (px.line(series, x="ts", y="VehicleCount", title="VehicleCount"),
+                            px.line(series, x="ts", y="AverageSpeedKMH", title="AverageSpeedKMH"),
+                            px.pie(vdist, names="VehicleType", values="Count", title="Vehicle types"),
+                            toploc.head(10))
+                vehicles_fig, speed_fig, mix_fig, toploc = snap.memo(("charts",) + view, analytics_charts)
+                st.caption(f"Bucket size: {bucket_sec}s")
+                st.plotly_chart(vehicles_fig, use_container_width=True)
+                st.plotly_chart(speed_fig, use_container_width=True)
+                st.plotly_chart(mix_fig, use_container_width=True)
+                st.dataframe(toploc)
 
 # ---------- Alerts ----------
 if show_alerts:
     tab = tab_objs[tabs.index("Alerts")]
     with tab:
         st.subheader("Alerts & Anomalies")
-        alerts_df = pd.DataFrame(st.session_state.alerts)
+        alert_range = "Live"
+        if history is not None:
+            alert_range = st.radio("Range", ["Live", "Last 24 hours", "Last 7 days", "All history"], horizontal=True)
+        if alert_range == "Live":
+            total_alerts, alerts_df, type_counts = snap.alert_total, snap.alerts, snap.alert_type_counts
+            scope = "retained"
+        else:
+            picked = st.multiselect("Locations", [loc["name"] for loc in snap.locations], key="alert_locations")
+            locs = [loc["id"] for loc in snap.locations if loc["name"] in picked]
+            days = {"Last 24 hours": 1, "Last 7 days": 7}.get(alert_range)
+            start = None if days is None else snap.taken_at.timestamp() - days * 86400
+            total_alerts, alerts_df, type_counts = snap.memo(
+                ("alerts", alert_range, tuple(locs)),
+                lambda: (history.alert_count(start, None, locs),
+                         history.alert_frame(start, None, locs, limit=ALERTS_TABLE_ROWS),
+                         history.alert_type_counts(start, None, locs)))
+            scope = "stored"
         if alerts_df.empty:
             st.info("No alerts detected yet.")
         else:
-            st.dataframe(alerts_df.sort_values("timestamp", ascending=False).reset_index(drop=True))
-            for idx, row in alerts_df.iterrows():
-                st.toast(f"⚠️ {row['location']}: {row['event']}", icon="⚠️")
-            alerts_df["type_simple"] = alerts_df["event"].apply(lambda s: s.split(",")[0] if isinstance(s,str) else s)
-            st.bar_chart(alerts_df["type_simple"].value_counts())
+            st.caption(f"Showing newest {len(alerts_df):,} of {total_alerts:,} {scope} alerts")
+            st.dataframe(alerts_df.iloc[::-1].reset_index(drop=True))
+            st.bar_chart(type_counts)
 
 st.markdown("---")
-st.caption("Local Simulator running — live traffic events with Alerts popup.")
\ No newline at end of file
+st.caption(f"{worker.source.name if worker.source else 'No source'} — "
+           f"{'running' if worker.running else 'stopped'} — live traffic events with Alerts popup. "
+           f"Snapshot v{snap.version} shared by {publisher.viewers()} viewer(s).")
\ No newline at end of file